@@ -6,24 +6,35 @@ import os
 import shutil
 import tempfile
 import time
-from typing import Any, Dict
+from contextlib import aclosing
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, File, HTTPException, Request, UploadFile, status
-from fastapi.concurrency import run_in_threadpool
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from sse_starlette.sse import EventSourceResponse
 
 from app.api.schemas import (
+    BatchQueryItem,
+    BatchQueryRequest,
+    DocumentInfo,
     DocumentRef,
+    DocumentsResponse,
     HealthResponse,
+    JobResponse,
     QueryRequest,
     QueryResponse,
     UploadResponse,
 )
 from app.deps import AppState
-from app.streaming import build_prompt, stream_answer_tokens
-from llama_modular_rag.config import RETRIEVAL_TOP_K
-from llama_modular_rag.llm_setup import get_llama_tokenizer
-from llama_modular_rag.retrieval import context_builder
+from app.metrics import render_metrics
+from app.singleflight import Flight, Producer, normalize_query
+from app.streaming import build_prompt, disconnect_probe, stream_answer_tokens
+from llama_modular_rag.data_loader import list_doc_ids, read_doc_meta
+from llama_modular_rag.doc_pool import DocumentLease, lease_key
+from llama_modular_rag.metrics import CONTENT_TYPE, REQUEST_SECONDS
+from llama_modular_rag.retrieval import context_builder, retrieve_documents
+from llama_modular_rag.tracing import Trace, optional_span, start_trace
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api")
@@ -35,142 +46,286 @@ def _state(request: Request) -> AppState:
     return request.app.state.rag
 
 
+def _target_doc_ids(state: AppState, payload: QueryRequest | BatchQueryRequest) -> List[str]:
+    """요청이 검색할 doc_id 목록을 확정한다. 워밍업 중이면 503, 문서가 없으면 409, 모르는 문서면 404."""
+    if not state.warmed.is_set():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="모델 워밍업 중입니다. 잠시 후 다시 시도하세요.",
+            headers={"Retry-After": "5"},
+        )
+    doc_ids = state.resolve_doc_ids(payload.doc_id, payload.doc_ids)
+    if not doc_ids:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="문서가 활성화되지 않았습니다. 먼저 PDF를 업로드하세요.",
+        )
+    missing = [d for d in doc_ids if not state.docs.exists(d)]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"문서를 찾을 수 없습니다: {', '.join(missing)}",
+        )
+    return doc_ids
+
+
+async def _finish_trace(trace: Optional[Trace], **fields: Any) -> Optional[Dict[str, Any]]:
+    if trace is None:
+        return None
+    return await run_in_threadpool(trace.finish, **fields)
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health(request: Request) -> HealthResponse:
     state = _state(request)
     return HealthResponse(
-        status="ok",
+        status=state.phase,
         ready=state.ready,
-        doc_id=state.doc_id,
-        doc_name=state.doc_name,
+        doc_id=state.default_doc_id,
+        doc_name=state.default_doc_name,
+        indexing=state.jobs.active_count > 0,
+        startup_ms=state.startup.phases_ms(),
+        warmup_error=state.warmup_error,
     )
 
 
-@router.post("/query", response_model=QueryResponse)
-async def query(request: Request, payload: QueryRequest) -> QueryResponse:
+@router.get("/metrics")
+async def metrics(request: Request) -> Response:
+    """Prometheus 텍스트 형식 지표 (단계별 지연 히스토그램, 캐시·엔진·문서 풀 상태, RSS)."""
+    return Response(render_metrics(_state(request)), media_type=CONTENT_TYPE)
+
+
+@router.get("/docs", response_model=DocumentsResponse)
+async def documents(request: Request) -> DocumentsResponse:
+    """인덱싱된 문서 목록과 메모리 풀 상태."""
     state = _state(request)
-    if not state.ready:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="문서가 활성화되지 않았습니다. 먼저 PDF를 업로드하세요.",
-        )
 
-    started = time.perf_counter()
+    def _collect() -> List[DocumentInfo]:
+        return [
+            DocumentInfo(
+                doc_id=doc_id,
+                doc_name=(
+                    getattr(state.docs.get_loaded(doc_id), "doc_name", None)
+                    or read_doc_meta(doc_id).get("doc_name")
+                    or doc_id[:12]
+                ),
+                loaded=state.docs.get_loaded(doc_id) is not None,
+                default=doc_id == state.default_doc_id,
+            )
+            for doc_id in list_doc_ids()
+        ]
 
-    cached = state.cache.get_cached_result(state.doc_id, payload.query)
-    if cached:
-        return _to_response(payload.query, cached, cached=True, started=started)
+    return DocumentsResponse(
+        documents=await run_in_threadpool(_collect), pool=state.docs.stats()
+    )
 
-    async with state.lock:
-        cached = state.cache.get_cached_result(state.doc_id, payload.query)
-        if cached:
-            return _to_response(payload.query, cached, cached=True, started=started)
 
-        result: Dict[str, Any] = await run_in_threadpool(
-            state.graph.invoke, {"query": payload.query}
-        )
-        state.cache.cache_result(state.doc_id, payload.query, result)
+def _flight_key(doc_ids: List[str], payload: QueryRequest) -> Tuple[str, str, bool]:
+    """single-flight 키: 같은 문서 묶음에 같은 쿼리·같은 캐시 모드면 생성 하나를 나눠 쓴다."""
+    return lease_key(doc_ids), normalize_query(payload.query), payload.semantic_cache
+
+
+def _lease_or_404(state: AppState, doc_ids: List[str]) -> DocumentLease:
+    try:
+        return state.docs.lease(doc_ids)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail=f"문서를 찾을 수 없습니다: {exc}")
+
+
+def _graph_producer(
+    state: AppState, doc_ids: List[str], payload: QueryRequest, trace: Optional[Trace]
+) -> Producer:
+    """REST 경로 producer: 캐시를 보고, 없으면 LangGraph로 답변 전체를 만든다.
+
+    대여부터 반납까지 한 스레드에서 끝내므로 producer가 취소돼도 문서를 쓰는 중에 반납하지 않는다.
+    """
+
+    def run() -> Tuple[Dict[str, Any], bool]:
+        # 요청 내내 같은 문서를 쓰도록 빌려 둔다 (풀에서 내려가지 않음, 필요하면 디스크에서 로드).
+        with optional_span(trace, "문서 대여"):
+            lease = _lease_or_404(state, doc_ids)
+        try:
+            with optional_span(trace, "캐시 조회"):
+                cached = state.cache.get_cached_result(
+                    lease.key, payload.query, semantic=payload.semantic_cache
+                )
+            if cached:
+                return cached, True
+
+            # 생성은 GenerationEngine이 다른 요청과 배치로 묶어 처리하므로 락 없이 호출한다.
+            # 그래프 노드는 상태에 trace가 있을 때만 span을 남긴다.
+            graph_input: Dict[str, Any] = {"query": payload.query}
+            if trace is not None:
+                graph_input["trace"] = trace
+            result: Dict[str, Any] = lease.graph.invoke(graph_input)
+            result.pop("trace", None)
+            with optional_span(trace, "캐시 저장"):
+                state.cache.cache_result(lease.key, payload.query, result)
+            return result, False
+        finally:
+            state.docs.release(lease)
+
+    async def produce(flight: Flight) -> None:
+        result, cached = await run_in_threadpool(run)
+        flight.finish(result, cached=cached)
+
+    return produce
+
+
+def _stream_producer(
+    state: AppState, doc_ids: List[str], payload: QueryRequest, trace: Optional[Trace]
+) -> Producer:
+    """SSE 경로 producer: 참조 문서를 먼저 알리고, 캐시에 없으면 답변을 토큰 단위로 흘린다."""
+    user_query = payload.query
+
+    async def produce(flight: Flight) -> None:
+        with optional_span(trace, "문서 대여"):
+            lease = await run_in_threadpool(_lease_or_404, state, doc_ids)
+        try:
+            with optional_span(trace, "문서 검색"):
+                docs = await run_in_threadpool(retrieve_documents, lease.vectorstore, user_query)
+            flight.set_documents(docs)
+
+            with optional_span(trace, "캐시 조회"):
+                cached = await run_in_threadpool(
+                    state.cache.get_cached_result,
+                    lease.key,
+                    user_query,
+                    semantic=payload.semantic_cache,
+                )
+            if cached:
+                flight.finish(cached, cached=True)
+                return
+
+            # 첫 호출의 토크나이저 로드, token_count 없는 예전 청크의 토큰화가 루프를 막지 않도록.
+            with optional_span(trace, "컨텍스트 생성"):
+                ctx_state = await run_in_threadpool(
+                    context_builder, {"query": user_query, "documents": docs}
+                )
+            prompt = build_prompt(ctx_state.get("context", ""), user_query)
 
-    return _to_response(payload.query, result, cached=False, started=started)
+            # aclosing: producer가 취소되면 stream_answer_tokens의 finally(생성 취소)가 즉시 실행된다.
+            with optional_span(trace, "답변 생성"):
+                async with aclosing(stream_answer_tokens(prompt, trace)) as tokens:
+                    async for token in tokens:
+                        flight.append(token)
+
+            result = {"query": user_query, "answer": "".join(flight.chunks), "documents": docs}
+            with optional_span(trace, "캐시 저장"):
+                await run_in_threadpool(state.cache.cache_result, lease.key, user_query, result)
+            flight.finish(result)
+        finally:
+            state.docs.release(lease)
+
+    return produce
+
+
+@router.post("/query", response_model=QueryResponse)
+async def query(request: Request, payload: QueryRequest) -> QueryResponse:
+    """답변 전체를 한 번에 반환한다. 같은 쿼리가 진행 중이면 그 결과를 함께 기다린다."""
+    state = _state(request)
+    doc_ids = _target_doc_ids(state, payload)
+    # 엔진·배치 모듈은 torch를 끌어오므로 부팅 때가 아니라 워밍업이 끝난 뒤에 import한다
+    # (워밍업 스레드가 import하는 도중에 다른 스레드가 같은 모듈을 import하면 깨질 수 있다).
+    from llama_modular_rag.engine import GenerationTimeout
+    started = time.perf_counter()
+    trace = start_trace(payload.trace)
+
+    producer = _graph_producer(state, doc_ids, payload, trace)
+    try:
+        async with state.inflight.subscribe(_flight_key(doc_ids, payload), producer) as (
+            flight,
+            leader,
+        ):
+            with optional_span(None if leader else trace, "합류 대기"):
+                result = await flight.wait()
+    except GenerationTimeout as exc:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(exc))
+
+    record = await _finish_trace(
+        trace,
+        endpoint="query",
+        cached=flight.cached,
+        coalesced=not leader,
+        query=payload.query,
+        doc_ids=doc_ids,
+    )
+    return _to_response(
+        payload.query,
+        result,
+        cached=flight.cached,
+        coalesced=not leader,
+        started=started,
+        doc_ids=doc_ids,
+        trace=record,
+    )
 
 
 @router.post("/query/stream")
 async def query_stream(request: Request, payload: QueryRequest) -> EventSourceResponse:
-    """SSE로 답변 토큰을 스트리밍한다.
+    """SSE로 답변 토큰을 스트리밍한다. 같은 쿼리가 진행 중이면 그 스트림을 처음부터 재생한다.
 
     이벤트 종류:
         ``docs``  — 검색된 참조 문서 (한 번)
         ``token`` — 답변의 디코드 청크
-        ``done``  — 종료 신호 (cached, elapsed_ms)
+        ``done``  — 종료 신호 (cached, coalesced, elapsed_ms, 추적된 요청이면 trace_id·spans)
         ``error`` — 처리 중 예외
     """
     state = _state(request)
-    if not state.ready:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="문서가 활성화되지 않았습니다. 먼저 PDF를 업로드하세요.",
-        )
-
+    doc_ids = _target_doc_ids(state, payload)
     started = time.perf_counter()
     user_query = payload.query
-    doc_id = state.doc_id  # type: ignore[assignment]
+    trace = start_trace(payload.trace)
+    # 스트림(200)을 열기 전에 문서를 한 번 빌려 본다. 디스크에 있어도 열 수 없는 문서는
+    # /api/query와 같이 404가 된다. 연 문서는 풀에 남으므로 producer의 대여는 적중한다.
+    state.docs.release(await run_in_threadpool(_lease_or_404, state, doc_ids))
+
+    async def done_event(cached: bool, coalesced: bool) -> Dict[str, str]:
+        elapsed = time.perf_counter() - started
+        REQUEST_SECONDS.labels("stream", "true" if cached else "false").observe(elapsed)
+        data: Dict[str, Any] = {
+            "cached": cached,
+            "coalesced": coalesced,
+            "elapsed_ms": int(elapsed * 1000),
+        }
+        record = await _finish_trace(
+            trace,
+            endpoint="stream",
+            cached=cached,
+            coalesced=coalesced,
+            query=user_query,
+            doc_ids=doc_ids,
+        )
+        if record is not None:
+            data.update(trace_id=record["trace_id"], spans=record["spans"])
+        return {"event": "done", "data": json.dumps(data, ensure_ascii=False)}
 
     async def event_gen():
+        # 스트림이 실제로 시작될 때 구독한다. 마지막 구독자가 떠나면 생성이 취소된다.
+        producer = _stream_producer(state, doc_ids, payload, trace)
+        disconnected = disconnect_probe(request.is_disconnected)
         try:
-            docs = await run_in_threadpool(
-                state.vectorstore.similarity_search, user_query, RETRIEVAL_TOP_K
-            )
-            doc_payload = [
-                {"page_content": d.page_content, "metadata": dict(d.metadata or {})}
-                for d in docs
-            ]
-            yield {"event": "docs", "data": json.dumps(doc_payload, ensure_ascii=False)}
-
-            cached = state.cache.get_cached_result(doc_id, user_query)
-            if cached:
-                yield {
-                    "event": "token",
-                    "data": json.dumps(cached.get("answer", ""), ensure_ascii=False),
-                }
-                yield {
-                    "event": "done",
-                    "data": json.dumps(
-                        {
-                            "cached": True,
-                            "elapsed_ms": int((time.perf_counter() - started) * 1000),
-                        }
-                    ),
-                }
-                return
-
-            async with state.lock:
-                cached = state.cache.get_cached_result(doc_id, user_query)
-                if cached:
-                    yield {
-                        "event": "token",
-                        "data": json.dumps(cached.get("answer", ""), ensure_ascii=False),
-                    }
-                    yield {
-                        "event": "done",
-                        "data": json.dumps(
-                            {
-                                "cached": True,
-                                "elapsed_ms": int((time.perf_counter() - started) * 1000),
+            async with state.inflight.subscribe(_flight_key(doc_ids, payload), producer) as (
+                flight,
+                leader,
+            ):
+                with optional_span(None if leader else trace, "합류 대기"):
+                    async for kind, value in flight.events():
+                        if kind == "docs":
+                            doc_payload = [
+                                {"page_content": d.page_content, "metadata": dict(d.metadata or {})}
+                                for d in value
+                            ]
+                            yield {
+                                "event": "docs",
+                                "data": json.dumps(doc_payload, ensure_ascii=False),
                             }
-                        ),
-                    }
-                    return
-
-                ctx_state = context_builder({"query": user_query, "documents": docs})
-                prompt = build_prompt(ctx_state.get("context", ""), user_query)
-
-                # 토크나이저는 lazy-load (첫 요청 시만 로드 비용)
-                _ = get_llama_tokenizer()
-
-                full_text_parts: list[str] = []
-                async for token in stream_answer_tokens(prompt):
-                    if await request.is_disconnected():
-                        logger.info("클라이언트 연결 종료, 송신 중단")
-                        return
-                    full_text_parts.append(token)
-                    yield {"event": "token", "data": json.dumps(token, ensure_ascii=False)}
-
-                full_text = "".join(full_text_parts)
-                state.cache.cache_result(
-                    doc_id,
-                    user_query,
-                    {"query": user_query, "answer": full_text, "documents": docs},
-                )
-
-            yield {
-                "event": "done",
-                "data": json.dumps(
-                    {
-                        "cached": False,
-                        "elapsed_ms": int((time.perf_counter() - started) * 1000),
-                    }
-                ),
-            }
+                            continue
+                        if await disconnected():
+                            logger.info("클라이언트 연결 종료, 구독 해제")
+                            return
+                        yield {"event": "token", "data": json.dumps(value, ensure_ascii=False)}
+                yield await done_event(cached=flight.cached, coalesced=not leader)
         except Exception as exc:  # noqa: BLE001
             logger.exception("스트리밍 중 오류")
             yield {"event": "error", "data": json.dumps({"detail": str(exc)})}
@@ -178,13 +333,58 @@ async def query_stream(request: Request, payload: QueryRequest) -> EventSourceRe
     return EventSourceResponse(event_gen())
 
 
-@router.post("/upload", response_model=UploadResponse)
+@router.post("/query/batch")
+async def query_batch(request: Request, payload: BatchQueryRequest) -> StreamingResponse:
+    """여러 쿼리를 한 번에 처리해 NDJSON(:class:`BatchQueryItem` 한 줄씩)으로 스트리밍한다.
+
+    캐시에 있는 쿼리가 먼저 나오고, 나머지는 생성이 끝나는 순서대로 나온다. 개별 생성
+    실패는 그 줄의 ``error``로 알리고 배치는 계속된다.
+    """
+    state = _state(request)
+    doc_ids = _target_doc_ids(state, payload)
+    from llama_modular_rag.batch import answer_batch
+
+    async def lines():
+        lease = None
+        try:
+            lease = await run_in_threadpool(state.docs.lease, doc_ids)
+            results = answer_batch(
+                lease.vectorstore,
+                payload.queries,
+                cache=state.cache,
+                cache_key=lease.key,
+                semantic=payload.semantic_cache,
+            )
+            async for item in iterate_in_threadpool(results):
+                line = BatchQueryItem(
+                    index=item.index,
+                    query=item.query,
+                    answer=item.answer.strip(),
+                    documents=[
+                        DocumentRef(page_content=d.page_content, metadata=dict(d.metadata or {}))
+                        for d in item.documents
+                    ],
+                    cached=item.cached,
+                    elapsed_ms=item.elapsed_ms,
+                    error=item.error,
+                )
+                yield line.model_dump_json() + "\n"
+        finally:
+            if lease is not None:
+                state.docs.release(lease)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.post("/upload", response_model=UploadResponse, status_code=status.HTTP_202_ACCEPTED)
 async def upload(request: Request, file: UploadFile = File(...)) -> UploadResponse:
+    """PDF를 받아 인제스트 작업을 등록하고 바로 반환한다. 진행 상황은 ``/api/jobs/{job_id}``."""
     if not file.filename or not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="PDF 파일만 업로드 가능합니다.")
 
     tmp_dir = tempfile.mkdtemp(prefix="rag_upload_")
-    tmp_path = os.path.join(tmp_dir, os.path.basename(file.filename))
+    doc_name = os.path.basename(file.filename)
+    tmp_path = os.path.join(tmp_dir, doc_name)
     bytes_written = 0
     try:
         with open(tmp_path, "wb") as out:
@@ -196,23 +396,43 @@ async def upload(request: Request, file: UploadFile = File(...)) -> UploadRespon
                         detail=f"파일이 {MAX_UPLOAD_BYTES // (1024 * 1024)}MB 한도를 초과합니다.",
                     )
                 out.write(chunk)
-
-        state = _state(request)
-        async with state.lock:
-            await run_in_threadpool(state.attach_pdf, tmp_path)
-        return UploadResponse(
-            doc_id=state.doc_id or "",
-            doc_name=state.doc_name or file.filename,
-        )
-    finally:
+    except BaseException:
         shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    state = _state(request)
+    # 임시 디렉터리는 작업이 끝난 뒤 작업 쪽에서 지운다.
+    job = state.jobs.submit(
+        tmp_path,
+        doc_name,
+        lambda path, progress: state.attach_pdf(path, doc_name=doc_name, progress=progress),
+        cleanup_dir=tmp_dir,
+    )
+    return UploadResponse(job_id=job.job_id, doc_name=doc_name, status=job.status)
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(request: Request, job_id: str) -> JobResponse:
+    job = _state(request).jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return JobResponse(**job.as_dict())
 
 
 def _to_response(
-    query_text: str, result: Dict[str, Any], *, cached: bool, started: float
+    query_text: str,
+    result: Dict[str, Any],
+    *,
+    cached: bool,
+    started: float,
+    coalesced: bool = False,
+    doc_ids: List[str],
+    trace: Optional[Dict[str, Any]] = None,
 ) -> QueryResponse:
     docs = result.get("documents") or []
-    elapsed_ms = int((time.perf_counter() - started) * 1000)
+    elapsed = time.perf_counter() - started
+    REQUEST_SECONDS.labels("query", "true" if cached else "false").observe(elapsed)
+    elapsed_ms = int(elapsed * 1000)
     return QueryResponse(
         query=query_text,
         answer=(result.get("answer") or "").strip(),
@@ -221,5 +441,9 @@ def _to_response(
             for d in docs
         ],
         cached=cached,
+        coalesced=coalesced,
         elapsed_ms=elapsed_ms,
+        doc_ids=doc_ids,
+        trace_id=trace["trace_id"] if trace else None,
+        spans=trace["spans"] if trace else None,
     )
@@ -1,17 +1,33 @@
 from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+from llama_modular_rag.config import BATCH_MAX_QUERIES, QUERY_MAX_DOCS
 
 
 class HealthResponse(BaseModel):
+    # "warming"(부팅 워밍업 중, 쿼리는 503) / "ready" / "degraded"(워밍업 실패)
     status: str
+    # 워밍업이 끝났고 기본 문서가 있어 바로 쿼리할 수 있는지
     ready: bool
     doc_id: Optional[str] = None
     doc_name: Optional[str] = None
+    # 백그라운드 인제스트 작업이 대기 중이거나 실행 중인지
+    indexing: bool = False
+    # 끝난 워밍업 단계별 시간 (ms, 예: "import:torch", "load:llm", "prefill")
+    startup_ms: Dict[str, float] = Field(default_factory=dict)
+    warmup_error: Optional[str] = None
 
 
 class QueryRequest(BaseModel):
     query: str = Field(..., min_length=1, max_length=2000)
+    # 검색할 문서. 없으면 가장 최근에 업로드된 문서. doc_ids를 주면 여러 문서를 함께 검색한다.
+    doc_id: Optional[str] = None
+    doc_ids: Optional[List[str]] = Field(default=None, min_length=1, max_length=QUERY_MAX_DOCS)
+    # False면 정확히 같은 쿼리만 캐시 히트로 인정한다 (유사 쿼리 조회 생략).
+    semantic_cache: bool = True
+    # 단계 타이밍 추적. None이면 RAG_TRACE_SAMPLE 비율로 샘플링, True/False면 강제로 켜거나 끈다.
+    trace: Optional[bool] = None
 
 
 class DocumentRef(BaseModel):
@@ -19,15 +35,86 @@ class DocumentRef(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_QUERIES)
+    doc_id: Optional[str] = None
+    doc_ids: Optional[List[str]] = Field(default=None, min_length=1, max_length=QUERY_MAX_DOCS)
+    semantic_cache: bool = True
+
+    @field_validator("queries")
+    @classmethod
+    def _check_queries(cls, queries: List[str]) -> List[str]:
+        for query in queries:
+            if not 1 <= len(query) <= 2000:
+                raise ValueError("각 쿼리는 1–2000자여야 합니다.")
+        return queries
+
+
+class TraceSpan(BaseModel):
+    name: str
+    # 요청 시작 기준 밀리초 (time.monotonic)
+    start_ms: float
+    end_ms: float
+
+
 class QueryResponse(BaseModel):
     query: str
     answer: str
     documents: List[DocumentRef] = Field(default_factory=list)
     cached: bool = False
+    # 같은 쿼리로 진행 중이던 다른 요청의 생성 결과를 나눠 받았는지
+    coalesced: bool = False
     elapsed_ms: int = 0
+    doc_ids: List[str] = Field(default_factory=list)
+    # 추적된 요청에만 채워진다.
+    trace_id: Optional[str] = None
+    spans: Optional[List[TraceSpan]] = None
+
+
+class BatchQueryItem(BaseModel):
+    """``/api/query/batch`` NDJSON 한 줄. 생성이 끝나는 순서로 오므로 ``index``로 입력과 맞춘다."""
+
+    index: int
+    query: str
+    answer: str = ""
+    documents: List[DocumentRef] = Field(default_factory=list)
+    cached: bool = False
+    # 배치 시작부터 이 결과가 나올 때까지
+    elapsed_ms: int = 0
+    error: Optional[str] = None
 
 
 class UploadResponse(BaseModel):
+    job_id: str
+    doc_name: str
+    status: str
+
+
+class DocumentInfo(BaseModel):
     doc_id: str
     doc_name: str
-    chunks_indexed: bool = True
+    loaded: bool = False
+    default: bool = False
+
+
+class DocumentsResponse(BaseModel):
+    documents: List[DocumentInfo] = Field(default_factory=list)
+    pool: Dict[str, Any] = Field(default_factory=dict)
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    doc_name: str
+    status: str  # queued / running / succeeded / failed
+    doc_id: Optional[str] = None
+    pages_total: int = 0
+    pages_parsed: int = 0
+    chunks_embedded: int = 0
+    pages_per_s: float = 0.0
+    chunks_per_s: float = 0.0
+    chunks_reused: int = 0  # 청크 임베딩 캐시에서 가져온 청크 수
+    reuse_ratio: float = 0.0
+    embed_saved_s: float = 0.0  # 재사용으로 아낀 임베딩 시간 (추정)
+    error: Optional[str] = None
+    created_at: float
+    finished_at: Optional[float] = None
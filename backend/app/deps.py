@@ -1,41 +1,95 @@
 """FastAPI 앱 전역 상태 컨테이너.
 
-LLM/벡터스토어/그래프는 단일 프로세스 내에서 단 하나만 존재해야 한다.
-모든 추론 요청은 :pyattr:`AppState.lock`을 통해 직렬화된다.
+LLM은 단일 프로세스 내에서 단 하나만 존재해야 한다.
+추론 요청은 :class:`~llama_modular_rag.engine.GenerationEngine`이 배치로 묶어 처리하고,
+업로드는 :class:`~app.jobs.IngestJobManager`의 백그라운드 작업으로 인덱싱된다.
+문서(벡터스토어 + 그래프)는 :class:`~llama_modular_rag.doc_pool.DocumentPool`이 최근 사용
+순으로 여러 개를 메모리에 들고 있고, 요청은 쓰는 동안 문서를 빌려 가므로 내려가지 않는다.
+동시에 들어온 같은 쿼리는 :class:`~app.singleflight.SingleFlight`가 생성 하나로 합친다.
+부팅 직후에는 :func:`~llama_modular_rag.startup.warmup`이 끝날 때까지 ``warming`` 단계다.
 """
 from __future__ import annotations
 
-import asyncio
 import logging
 import os
+import threading
 from dataclasses import dataclass, field
-from typing import Any, Optional
+from typing import Callable, List, Optional
 
-from llama_modular_rag.caching import QueryCache
-from llama_modular_rag.data_loader import create_vectorstore_from_pdf
+from app.jobs import IngestJobManager
+from app.singleflight import SingleFlight
+from llama_modular_rag.caching import SemanticQueryCache
+from llama_modular_rag.data_loader import (
+    IngestStats,
+    create_vectorstore_from_pdf,
+    open_sparse_index,
+    store_backend,
+    vectorstore_nbytes,
+)
+from llama_modular_rag.doc_pool import DocumentPool, LoadedDocument
 from llama_modular_rag.graph_builder import build_rag_graph
+from llama_modular_rag.sparse_index import with_lexical
+from llama_modular_rag.startup import StartupProfiler
 
 logger = logging.getLogger(__name__)
 
 
 @dataclass
 class AppState:
-    cache: QueryCache = field(default_factory=QueryCache)
-    vectorstore: Optional[Any] = None
-    graph: Optional[Any] = None
-    doc_id: Optional[str] = None
-    doc_name: Optional[str] = None
-    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    cache: SemanticQueryCache = field(default_factory=SemanticQueryCache)
+    jobs: IngestJobManager = field(default_factory=IngestJobManager)
+    docs: DocumentPool = field(default_factory=DocumentPool)
+    inflight: SingleFlight = field(default_factory=SingleFlight)
+    # 쿼리에 doc_id가 없을 때 쓰는 문서 (가장 최근에 업로드된 문서).
+    default_doc_id: Optional[str] = None
+    default_doc_name: Optional[str] = None
+    # 부팅 워밍업 단계별 시간과 완료 신호. 워밍업을 끄면 lifespan이 바로 set한다.
+    startup: StartupProfiler = field(default_factory=StartupProfiler)
+    warmed: threading.Event = field(default_factory=threading.Event)
+    warmup_error: Optional[str] = None
+
+    @property
+    def phase(self) -> str:
+        """``warming`` → ``ready`` (워밍업이 실패했으면 ``degraded`` — 모델은 첫 요청이 다시 올린다)."""
+        if not self.warmed.is_set():
+            return "warming"
+        return "degraded" if self.warmup_error else "ready"
 
     @property
     def ready(self) -> bool:
-        return self.graph is not None and self.doc_id is not None
-
-    def attach_pdf(self, pdf_path: str) -> None:
-        """동기 호출: PDF로 벡터스토어를 만들고 그래프를 구축한다."""
-        vectorstore, doc_id = create_vectorstore_from_pdf(pdf_path)
-        self.vectorstore = vectorstore
-        self.doc_id = doc_id
-        self.doc_name = os.path.basename(pdf_path)
-        self.graph = build_rag_graph(vectorstore)
-        logger.info("문서 활성화: %s (doc_id=%s)", self.doc_name, doc_id[:12])
+        """워밍업이 끝났고 쿼리할 기본 문서가 있다."""
+        return self.warmed.is_set() and self.default_doc_id is not None
+
+    def resolve_doc_ids(
+        self, doc_id: Optional[str] = None, doc_ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """요청이 지정한 문서 목록. 아무것도 없으면 기본 문서 (그것도 없으면 빈 목록)."""
+        if doc_ids:
+            return list(dict.fromkeys(doc_ids))
+        if doc_id:
+            return [doc_id]
+        return [self.default_doc_id] if self.default_doc_id else []
+
+    def attach_pdf(
+        self,
+        pdf_path: str,
+        doc_name: Optional[str] = None,
+        progress: Optional[Callable[[IngestStats], None]] = None,
+    ) -> str:
+        """동기 호출: PDF로 벡터스토어와 그래프를 모두 만든 뒤 풀에 넣고 기본 문서로 지정한다."""
+        # 워밍업이 올리는 중인 토크나이저·임베딩 싱글톤(lru_cache)을 한 번 더 로드하지 않도록 기다린다.
+        self.warmed.wait()
+        vectorstore, doc_id = create_vectorstore_from_pdf(pdf_path, progress=progress)
+        sparse = open_sparse_index(doc_id, vectorstore)
+        document = LoadedDocument(
+            doc_id=doc_id,
+            doc_name=doc_name or os.path.basename(pdf_path),
+            vectorstore=vectorstore,
+            graph=build_rag_graph(with_lexical(vectorstore, [(None, sparse)])),
+            nbytes=vectorstore_nbytes(doc_id, store_backend(vectorstore)),
+            sparse=sparse,
+        )
+        self.docs.add(document)
+        self.default_doc_id, self.default_doc_name = doc_id, document.doc_name
+        logger.info("문서 활성화: %s (doc_id=%s)", document.doc_name, doc_id[:12])
+        return doc_id
@@ -0,0 +1,120 @@
+"""백그라운드 인제스트 작업.
+
+업로드 요청은 작업을 등록하고 바로 반환한다. 작업은 전용 스레드 하나에서 순서대로
+실행되며, 인덱싱이 끝난 뒤에만 활성 문서를 교체하므로 그동안 쿼리는 이전 문서로
+계속 처리된다.
+"""
+from __future__ import annotations
+
+import logging
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from llama_modular_rag.data_loader import IngestStats
+
+logger = logging.getLogger(__name__)
+
+# 조회용으로 보관하는 완료 작업 수. 넘치면 오래된 것부터 잊는다.
+MAX_RETAINED_JOBS = 100
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+@dataclass
+class IngestJob:
+    job_id: str
+    doc_name: str
+    status: str = QUEUED
+    doc_id: Optional[str] = None
+    pages_total: int = 0
+    pages_parsed: int = 0
+    chunks_embedded: int = 0
+    pages_per_s: float = 0.0
+    chunks_per_s: float = 0.0
+    chunks_reused: int = 0
+    reuse_ratio: float = 0.0
+    embed_saved_s: float = 0.0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def _progress(self, stats: IngestStats) -> None:
+        self.pages_total = stats.pages_total
+        self.pages_parsed = stats.pages_parsed
+        self.chunks_embedded = stats.chunks_embedded
+        self.pages_per_s = round(stats.pages_per_s, 2)
+        self.chunks_per_s = round(stats.chunks_per_s, 2)
+        self.chunks_reused = stats.chunks_reused
+        self.reuse_ratio = round(stats.reuse_ratio, 4)
+        self.embed_saved_s = round(stats.embed_saved_s, 3)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+# (pdf 경로, 진행 콜백) → 활성화된 doc_id
+IngestFn = Callable[[str, Callable[[IngestStats], None]], str]
+
+
+class IngestJobManager:
+    """작업 등록·조회와 단일 워커 스레드 실행."""
+
+    def __init__(self, max_retained: int = MAX_RETAINED_JOBS) -> None:
+        self.max_retained = max_retained
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 임베딩 모델·CPU를 두고 서로 경쟁하지 않도록 인제스트는 한 번에 하나씩.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+
+    def submit(
+        self, pdf_path: str, doc_name: str, ingest: IngestFn, cleanup_dir: Optional[str] = None
+    ) -> IngestJob:
+        """작업을 등록하고 즉시 반환한다. ``cleanup_dir``은 작업이 끝나면 지운다."""
+        job = IngestJob(job_id=uuid.uuid4().hex, doc_name=doc_name)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.max_retained:
+                oldest = next(iter(self._jobs.values()))
+                if oldest.status in (QUEUED, RUNNING):
+                    break
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, job, pdf_path, ingest, cleanup_dir)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    @property
+    def active_count(self) -> int:
+        with self._lock:
+            return sum(j.status in (QUEUED, RUNNING) for j in self._jobs.values())
+
+    def _run(
+        self, job: IngestJob, pdf_path: str, ingest: IngestFn, cleanup_dir: Optional[str]
+    ) -> None:
+        job.status = RUNNING
+        try:
+            job.doc_id = ingest(pdf_path, job._progress)
+            job.status = SUCCEEDED
+            logger.info("인제스트 작업 완료: %s (%s)", job.job_id[:8], job.doc_name)
+        except Exception as exc:  # noqa: BLE001  작업 상태로 보고한다
+            logger.exception("인제스트 작업 실패: %s (%s)", job.job_id[:8], job.doc_name)
+            job.error = str(exc) or type(exc).__name__
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            if cleanup_dir:
+                shutil.rmtree(cleanup_dir, ignore_errors=True)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
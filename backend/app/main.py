@@ -3,17 +3,22 @@ from __future__ import annotations
 
 import logging
 import os
+import sys
+import threading
 from contextlib import asynccontextmanager
 
 from llama_modular_rag.config import init_runtime
 
 # 라우터/모델 로딩보다 먼저 환경변수와 torch 스레드 수를 적용해야 한다.
+# torch·transformers·langgraph·chromadb는 여기서 import하지 않는다 — 워밍업 스레드가 올린다.
 init_runtime()
 
 from fastapi import FastAPI  # noqa: E402
 
 from app.api.routes import router  # noqa: E402
 from app.deps import AppState  # noqa: E402
+from llama_modular_rag.config import INFERENCE_WORKERS, WARMUP_ENABLED  # noqa: E402
+from llama_modular_rag.startup import warmup  # noqa: E402
 
 logging.basicConfig(
     level=os.getenv("LOG_LEVEL", "INFO"),
@@ -22,23 +27,55 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _warmup(state: AppState) -> None:
+    """워밍업 스레드. 실패해도 서비스는 열고(``degraded``) 모델은 첫 요청이 다시 올린다."""
+    try:
+        warmup(state.startup)
+        logger.info("워밍업 완료: %s", state.startup.phases_ms())
+    except Exception as exc:  # noqa: BLE001  health로 보고한다
+        logger.exception("워밍업 실패")
+        state.warmup_error = str(exc) or type(exc).__name__
+    finally:
+        state.warmed.set()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     state = AppState()
     app.state.rag = state
 
+    # 모델 로드는 기다리지 않는다 — 포트를 바로 열고 그동안 /api/health는 warming, 쿼리는 503.
+    if WARMUP_ENABLED:
+        threading.Thread(target=_warmup, args=(state,), name="startup-warmup", daemon=True).start()
+    else:
+        state.warmed.set()
+        if INFERENCE_WORKERS > 0:
+            from llama_modular_rag.engine import get_generation_engine
+
+            # 워커 프로세스가 모델을 여는 동안 API는 계속 부팅한다.
+            get_generation_engine()
+
     default_pdf = os.getenv("RAG_DEFAULT_PDF")
     if default_pdf and os.path.exists(default_pdf):
-        try:
-            state.attach_pdf(default_pdf)
-            logger.info("기본 PDF 로드 완료: %s", default_pdf)
-        except Exception:
-            logger.exception("기본 PDF 로드 실패: %s", default_pdf)
+        # 업로드와 같은 인제스트 작업으로 — 워밍업이 끝난 뒤 인덱싱하고 health의 indexing에 잡힌다.
+        state.jobs.submit(
+            default_pdf,
+            os.path.basename(default_pdf),
+            lambda path, progress: state.attach_pdf(path, progress=progress),
+        )
     else:
         logger.info("기본 PDF 미설정 또는 존재하지 않음 — /api/upload 후 활성화됩니다")
 
     yield
 
+    state.jobs.shutdown()
+    state.docs.close()
+    engine_module = sys.modules.get("llama_modular_rag.engine")
+    if INFERENCE_WORKERS > 0 and engine_module is not None:
+        if engine_module.get_generation_engine.cache_info().currsize:
+            engine_module.get_generation_engine().shutdown()
+            engine_module.get_generation_engine.cache_clear()
+
 
 app = FastAPI(title="Llama 3.2 Modular RAG", version="0.1.0", lifespan=lifespan)
 app.include_router(router)
@@ -0,0 +1,127 @@
+"""``/api/metrics``의 스크레이프 시점 값.
+
+히스토그램은 :mod:`llama_modular_rag.metrics`가 요청 경로에서 모으고, 여기서는 캐시·엔진·
+문서 풀·single-flight·청크 임베딩 캐시가 이미 들고 있는 카운터와 프로세스 RSS를 읽어 함께 내보낸다.
+"""
+from __future__ import annotations
+
+import os
+import sys
+from typing import List
+
+import psutil
+
+from app.deps import AppState
+from llama_modular_rag.metrics import Sample, render
+
+_PROCESS = psutil.Process(os.getpid())
+
+
+def _cache_samples(state: AppState) -> List[Sample]:
+    stats = state.cache.stats()
+    store = stats["store"]
+    doc = "쿼리 캐시 적중 수 (memory/disk = 정확 일치 저장소, semantic = 유사 쿼리)"
+    samples = [
+        Sample("rag_cache_hits_total", doc, "counter", store["memory_hits"], {"tier": "memory"}),
+        Sample("rag_cache_hits_total", doc, "counter", store["disk_hits"], {"tier": "disk"}),
+        Sample("rag_cache_hits_total", doc, "counter", stats["semantic_hits"], {"tier": "semantic"}),
+    ]
+    miss_doc = "쿼리 캐시 미스 수 (exact = 정확 일치 저장소, all = 유사 쿼리까지 본 뒤 최종 미스)"
+    samples += [
+        Sample("rag_cache_misses_total", miss_doc, "counter", store["misses"], {"tier": "exact"}),
+        Sample("rag_cache_misses_total", miss_doc, "counter", stats["misses"], {"tier": "all"}),
+        Sample("rag_cache_entries", "디스크 쿼리 캐시 항목 수", "gauge", store["disk_entries"]),
+    ]
+    return samples
+
+
+def _engine_samples() -> List[Sample]:
+    # 엔진을 처음 만드는 일(모델 로드)도, torch를 끌어오는 엔진 모듈 import도 스크레이프가 일으키지 않는다.
+    engine_module = sys.modules.get("llama_modular_rag.engine")
+    if engine_module is None or engine_module.get_generation_engine.cache_info().currsize == 0:
+        return []
+    stats = engine_module.get_generation_engine().stats()
+    samples = [
+        Sample("rag_engine_queue_depth", "prefill을 기다리는 생성 요청 수", "gauge", stats["queue_depth"]),
+        Sample("rag_engine_active_sequences", "decode 배치에 있는 시퀀스 수", "gauge", stats["active"]),
+        Sample("rag_engine_generated_tokens_total", "생성한 토큰 수", "counter", stats["total_tokens"]),
+        Sample("rag_engine_decode_steps_total", "decode forward 횟수", "counter", stats["total_steps"]),
+        Sample("rag_engine_cancelled_total", "취소된 생성 요청 수", "counter", stats["cancelled"]),
+        Sample("rag_engine_timed_out_total", "deadline을 넘긴 생성 요청 수", "counter", stats["timed_out"]),
+    ]
+    if stats["prefix_cache"]:
+        prefix = stats["prefix_cache"]
+        samples += [
+            Sample("rag_prefix_cache_bytes", "prefix KV 캐시 사용 바이트", "gauge", prefix["used_bytes"]),
+            Sample(
+                "rag_prefix_cache_saved_tokens_total",
+                "prefix KV 캐시로 prefill을 건너뛴 토큰 수",
+                "counter",
+                prefix["saved_tokens"],
+            ),
+        ]
+    if "workers" in stats:  # 추론 워커 풀
+        samples += [
+            Sample(
+                "rag_inference_workers_ready",
+                "요청을 받을 수 있는 추론 워커 프로세스 수",
+                "gauge",
+                sum(1 for w in stats["workers"] if w["ready"] and not w["failed"]),
+            ),
+            Sample(
+                "rag_inference_worker_restarts_total",
+                "죽어서 다시 띄운 추론 워커 수",
+                "counter",
+                stats["restarts"],
+            ),
+        ]
+    return samples
+
+
+def _embedding_cache_samples() -> List[Sample]:
+    # 청크 임베딩 캐시는 첫 인제스트 때 열린다 — 스크레이프가 파일을 열지 않는다.
+    module = sys.modules.get("llama_modular_rag.embedding_cache")
+    if module is None or module.get_embedding_cache.cache_info().currsize == 0:
+        return []
+    stats = module.get_embedding_cache().stats()
+    doc = "청크 임베딩 캐시 조회 수 (hit = 다시 임베딩하지 않음)"
+    return [
+        Sample("rag_embedding_cache_entries", "청크 임베딩 캐시 항목 수", "gauge", stats["entries"]),
+        Sample("rag_embedding_cache_lookups_total", doc, "counter", stats["hits"], {"result": "hit"}),
+        Sample(
+            "rag_embedding_cache_lookups_total", doc, "counter", stats["misses"], {"result": "miss"}
+        ),
+    ]
+
+
+def render_metrics(state: AppState) -> str:
+    pool = state.docs.stats()
+    samples = _cache_samples(state) + _engine_samples() + _embedding_cache_samples()
+    samples += [
+        Sample("rag_doc_pool_documents", "메모리에 올라온 문서 수", "gauge", pool["loaded"]),
+        Sample("rag_doc_pool_bytes", "문서 풀 메모리 근사치 (바이트)", "gauge", pool["used_bytes"]),
+        Sample("rag_warmup_complete", "부팅 워밍업이 끝났으면 1 (실패해도 1)", "gauge", int(state.warmed.is_set())),
+        Sample("rag_ingest_jobs_active", "진행 중인 인덱싱 작업 수", "gauge", state.jobs.active_count),
+        Sample("rag_singleflight_inflight", "진행 중인 single-flight 생성 수", "gauge", state.inflight.inflight),
+        Sample(
+            "rag_singleflight_requests_total",
+            "쿼리 요청 수 (started = 생성을 띄움, joined = 진행 중인 생성에 합류)",
+            "counter",
+            state.inflight.started,
+            {"role": "started"},
+        ),
+        Sample(
+            "rag_singleflight_requests_total",
+            "쿼리 요청 수 (started = 생성을 띄움, joined = 진행 중인 생성에 합류)",
+            "counter",
+            state.inflight.joined,
+            {"role": "joined"},
+        ),
+        Sample(
+            "process_resident_memory_bytes",
+            "프로세스 RSS (바이트)",
+            "gauge",
+            _PROCESS.memory_info().rss,
+        ),
+    ]
+    return render(samples)
@@ -0,0 +1,179 @@
+"""동시에 들어온 같은 쿼리를 생성 하나로 합치기 (single-flight).
+
+키는 ``(문서 키, 정규화한 쿼리, 유사 캐시 사용 여부)``다. 키에 진행 중인 :class:`Flight`가
+없으면 첫 요청이 producer 태스크(문서 대여 → 검색 → 캐시 조회 → 생성 → 캐시 저장)를 띄우고,
+같은 키로 뒤따라온 요청은 검색·캐시 조회 없이 그 flight를 구독한다. flight는 참조 문서와
+토큰 청크를 재생 버퍼에 쌓아 두므로 늦게 합류한 SSE 구독자도 처음부터 받고, REST 요청은
+:meth:`Flight.wait`로 같은 결과를 기다린다.
+
+producer는 어느 요청에도 묶이지 않은 태스크라서 첫 요청의 연결이 끊겨도 나머지 구독자는
+계속 받는다. 구독자가 모두 떠나면 producer를 취소한다 (생성도 함께 취소된다). flight는
+producer가 캐시에 결과를 저장한 뒤에 등록에서 빠지므로, 그 뒤에 온 같은 쿼리는 캐시에서
+바로 응답한다.
+
+모든 조작은 이벤트 루프 스레드에서만 일어나므로 락을 쓰지 않는다.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import unicodedata
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+Producer = Callable[["Flight"], Awaitable[None]]
+
+
+def normalize_query(query: str) -> str:
+    """합칠 때 같은 쿼리로 보는 형태: NFKC, 앞뒤 공백 제거, 연속 공백 하나로."""
+    return " ".join(unicodedata.normalize("NFKC", query).split())
+
+
+class Flight:
+    """진행 중인 생성 하나. producer가 채우고 구독자는 처음부터 재생해 읽는다."""
+
+    def __init__(self, key: Hashable) -> None:
+        self.key = key
+        self.documents: Optional[List[Document]] = None
+        self.chunks: List[str] = []  # 재생 버퍼
+        self.result: Optional[Dict[str, Any]] = None
+        self.cached = False
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    # ------------------------------------------------------------- producer 쪽
+
+    def set_documents(self, documents: List[Document]) -> None:
+        self.documents = documents
+        self._notify()
+
+    def append(self, chunk: str) -> None:
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, result: Dict[str, Any], cached: bool = False) -> None:
+        """결과로 닫는다. 토큰을 흘리지 않은 경로(캐시 히트·그래프)는 답변 전체가 청크 하나가 된다."""
+        self.result, self.cached = result, cached
+        if self.documents is None:
+            self.documents = list(result.get("documents") or [])
+        if not self.chunks and result.get("answer"):
+            self.chunks.append(result["answer"])
+        self.done = True
+        self._notify()
+
+    def fail(self, error: BaseException) -> None:
+        if self.done:
+            return
+        self.error = error
+        self.done = True
+        self._notify()
+
+    def _notify(self) -> None:
+        # 기다리던 구독자를 모두 깨우고, 다음 변화는 새 이벤트로 알린다.
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    # ------------------------------------------------------------- 구독자 쪽
+
+    async def events(self) -> AsyncIterator[Tuple[str, Any]]:
+        """``("docs", 문서 목록)`` 한 번, 이어서 ``("token", 텍스트)``를 처음부터 yield한다.
+
+        producer가 실패했으면 그 예외를 다시 던진다.
+        """
+        sent_docs = False
+        position = 0
+        while True:
+            # 상태를 읽기 전에 이벤트를 잡아 둬야 yield하는 사이의 변화를 놓치지 않는다.
+            changed = self._changed
+            if not sent_docs and self.documents is not None:
+                sent_docs = True
+                yield "docs", self.documents
+            if position < len(self.chunks):
+                # 뒤처진 구독자(늦게 합류·느린 클라이언트)는 밀린 청크를 한 프레임으로 받는다.
+                text = "".join(self.chunks[position:])
+                position = len(self.chunks)
+                yield "token", text
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
+
+    async def wait(self) -> Dict[str, Any]:
+        """producer가 끝날 때까지 기다려 결과를 반환한다 (REST 경로)."""
+        while not self.done:
+            await self._changed.wait()
+        if self.error is not None:
+            raise self.error
+        assert self.result is not None
+        return self.result
+
+
+class SingleFlight:
+    """키별 진행 중인 :class:`Flight` 등록부."""
+
+    def __init__(self) -> None:
+        self._flights: Dict[Hashable, Flight] = {}
+        self.started = 0  # producer를 띄운 요청 수
+        self.joined = 0  # 진행 중인 flight에 합류한 요청 수
+
+    @property
+    def inflight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, int]:
+        return {"inflight": self.inflight, "started": self.started, "joined": self.joined}
+
+    @asynccontextmanager
+    async def subscribe(
+        self, key: Hashable, produce: Producer
+    ) -> AsyncIterator[Tuple[Flight, bool]]:
+        """``key``의 flight를 구독한다. ``(flight, 새로 띄웠는지)``를 넘긴다.
+
+        진행 중인 flight가 없을 때만 ``produce(flight)``를 태스크로 띄운다.
+        블록을 나갈 때 마지막 구독자였고 아직 안 끝났으면 producer를 취소한다.
+        """
+        flight = self._flights.get(key)
+        leader = flight is None
+        if flight is None:
+            flight = Flight(key)
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run(flight, produce))
+            self.started += 1
+        else:
+            self.joined += 1
+        flight.subscribers += 1
+        try:
+            yield flight, leader
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # 취소 중인 flight에 새 요청이 합류하지 않도록 먼저 등록에서 뺀다.
+                self._forget(flight)
+                assert flight.task is not None
+                flight.task.cancel()
+                logger.info("구독자가 모두 떠나 생성 취소: %r", flight.key)
+
+    async def _run(self, flight: Flight, produce: Producer) -> None:
+        try:
+            await produce(flight)
+            if not flight.done:
+                flight.fail(RuntimeError("producer가 결과 없이 끝났습니다."))
+        except BaseException as exc:
+            flight.fail(exc)
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            # 예외는 구독자가 받아 처리한다. 여기서 다시 던지면 아무도 await하지 않는 태스크 경고만 남는다.
+        finally:
+            self._forget(flight)
+
+    def _forget(self, flight: Flight) -> None:
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
@@ -1,67 +1,184 @@
 """SSE 토큰 스트리밍.
 
-`TextIteratorStreamer`로 토큰 단위 디코드 결과를 받고,
-백그라운드 스레드에서 ``model.generate``를 돌려 이벤트 루프를 막지 않는다.
+생성은 공유 :class:`~llama_modular_rag.engine.GenerationEngine`의 배치 decode 루프에서
+일어나고, 여기서는 요청별 핸들에서 디코드된 청크를 이벤트 루프로 넘긴다.
+
+청크마다 스레드 풀에서 블로킹 ``next()``를 기다리지 않고, 청크를 만드는 스레드가
+:class:`TokenBridge`에 밀어 넣는다. 브리지는 루프가 아직 깨지 않았을 때만
+``call_soon_threadsafe``를 부르므로, 루프가 바쁜 동안 쌓인 청크는 한 번의 깨우기로
+한꺼번에 넘어가 한 SSE 프레임이 된다.
 """
 from __future__ import annotations
 
 import asyncio
 import logging
-from threading import Thread
-from typing import AsyncIterator
+import threading
+import time
+from contextlib import aclosing
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, List, Optional
 
-from transformers import TextIteratorStreamer
+from fastapi.concurrency import run_in_threadpool
 
-from llama_modular_rag.config import MAX_NEW_TOKENS, TEMPERATURE, TOP_P
+from llama_modular_rag.config import (
+    STREAM_COALESCE_CHARS,
+    STREAM_COALESCE_MS,
+    STREAM_DISCONNECT_CHECK_MS,
+)
 from llama_modular_rag.generation import ANSWER_PROMPT_TEXT
-from llama_modular_rag.llm_setup import get_llama_model, get_llama_tokenizer
+from llama_modular_rag.tracing import Trace
 
-logger = logging.getLogger(__name__)
+if TYPE_CHECKING:
+    from llama_modular_rag.engine import GenerationHandle
 
-_DONE = object()
+logger = logging.getLogger(__name__)
 
 
 def build_prompt(context: str, query: str) -> str:
     return ANSWER_PROMPT_TEXT.format(context=context, query=query)
 
 
-async def stream_answer_tokens(prompt_text: str) -> AsyncIterator[str]:
-    """프롬프트 텍스트로부터 디코드된 텍스트 청크를 비동기로 yield한다."""
-    tokenizer = get_llama_tokenizer()
-    model = get_llama_model()
+class TokenBridge:
+    """생성 스레드 → 이벤트 루프 청크 전달.
 
-    streamer = TextIteratorStreamer(
-        tokenizer,
-        skip_prompt=True,
-        skip_special_tokens=True,
-        timeout=120.0,
-    )
+    :meth:`push`·:meth:`close`는 아무 스레드에서나 부르고, :meth:`batches`는 루프에서 읽는다.
+    버퍼가 비어 있다가 처음 청크가 들어올 때만 루프를 깨우고, 깨어난 루프는 그때까지 쌓인
+    청크를 리스트 하나로 :class:`asyncio.Queue`에 넣는다.
+    """
 
-    inputs = tokenizer(prompt_text, return_tensors="pt")
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._queue: "asyncio.Queue[List[str]]" = asyncio.Queue()
+        self._lock = threading.Lock()
+        self._buffer: List[str] = []
+        self._scheduled = False
+        self._closed = False
+        self.wakeups = 0  # call_soon_threadsafe 횟수 (벤치마크용)
 
-    generate_kwargs = dict(
-        **inputs,
-        max_new_tokens=MAX_NEW_TOKENS,
-        do_sample=True,
-        temperature=TEMPERATURE,
-        top_p=TOP_P,
-        repetition_penalty=1.1,
-        streamer=streamer,
-    )
+    def push(self, chunk: str) -> None:
+        with self._lock:
+            self._buffer.append(chunk)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._wake()
 
-    thread = Thread(target=model.generate, kwargs=generate_kwargs, daemon=True)
-    thread.start()
+    def close(self, *_: object) -> None:
+        """더 보낼 청크가 없음을 알린다. ``add_done_callback``에 그대로 넘길 수 있다."""
+        with self._lock:
+            self._closed = True
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._wake()
 
-    try:
+    def _wake(self) -> None:
+        self.wakeups += 1
+        try:
+            self._loop.call_soon_threadsafe(self._flush)
+        except RuntimeError:  # 루프가 이미 닫힘 — 받을 쪽이 없다
+            pass
+
+    def _flush(self) -> None:
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            closed = self._closed
+            self._scheduled = False
+        if batch:
+            self._queue.put_nowait(batch)
+        if closed:
+            self._queue.put_nowait([])  # 빈 리스트 = 끝
+
+    async def batches(self, max_delay: float = 0.0, max_chars: int = 0) -> AsyncIterator[str]:
+        """도착한 청크를 이어 붙여 yield한다.
+
+        ``max_delay``(초)가 0보다 크면 첫 청크 뒤 그만큼 더 모은다. 받은 텍스트가 이미
+        ``max_chars``자 이상이면 기다리지 않는다. 0이면 그때까지 도착한 청크만 합친다.
+        """
         while True:
-            chunk = await asyncio.to_thread(next, streamer, _DONE)
-            if chunk is _DONE:
-                break
-            if chunk:
-                yield chunk
+            batch = await self._queue.get()
+            if not batch:
+                return
+            text = "".join(batch)
+            finished = False
+            if max_delay > 0 and not (max_chars and len(text) >= max_chars):
+                # 청크마다 깨지 않고 한 번 자고 나서 그사이 쌓인 것을 모두 가져간다.
+                await asyncio.sleep(max_delay)
+                while not self._queue.empty():
+                    more = self._queue.get_nowait()
+                    if not more:
+                        finished = True
+                        break
+                    text += "".join(more)
+            if text:
+                yield text
+            if finished:
+                return
+
+
+async def relay_chunks(
+    handle: "GenerationHandle",
+    max_delay: float = STREAM_COALESCE_MS / 1000,
+    max_chars: int = STREAM_COALESCE_CHARS,
+) -> AsyncIterator[str]:
+    """``handle``의 청크를 :class:`TokenBridge`로 받아 (합쳐서) yield한다. 엔진 오류는 끝에 다시 던진다."""
+    bridge = TokenBridge(asyncio.get_running_loop())
+    handle.add_chunk_listener(bridge.push)
+    handle.add_done_callback(bridge.close)
+    async for text in bridge.batches(max_delay, max_chars):
+        yield text
+    if handle.error is not None:
+        raise handle.error
+
+
+async def stream_answer_tokens(
+    prompt_text: str, trace: Optional[Trace] = None
+) -> AsyncIterator[str]:
+    """프롬프트 텍스트로부터 디코드된 텍스트 청크를 비동기로 yield한다.
+
+    청크는 ``RAG_STREAM_COALESCE_MS``/``RAG_STREAM_COALESCE_CHARS`` 설정대로 합쳐진다.
+    ``trace``가 있으면 끝날 때 생성 구간(토큰화·대기열·prefill·decode) span을 남긴다.
+    """
+    from llama_modular_rag.engine import get_generation_engine  # torch는 첫 생성 때 (부팅 경로 밖)
+
+    started = time.monotonic()
+    # 엔진 생성(첫 호출이면 모델 로드)과 프롬프트 토큰화는 블로킹이라 스레드 풀에서 하고, 루프에서는
+    # 대기열에 넣기만 한다. 그사이 취소되면 핸들이 아직 없으므로 정리할 생성도 없다.
+    # engine.stream()은 블로킹 이터레이터라 핸들을 직접 받아 청크를 밀어 받고 취소한다
+    # (생성 경로·샘플링 설정은 같다).
+    engine = await run_in_threadpool(get_generation_engine)
+    encoded = await run_in_threadpool(engine.tokenizer, prompt_text)
+    handle = engine.submit_ids(encoded["input_ids"])
+
+    try:
+        async with aclosing(relay_chunks(handle)) as chunks:
+            async for text in chunks:
+                yield text
     finally:
-        # generate 스레드가 max_new_tokens까지 자연 종료되도록 둔다.
-        # 클라이언트가 끊어도 generation은 끝까지 돌지만 SSE 송신은 중단됨.
-        thread.join(timeout=0.0)
-        if thread.is_alive():
-            logger.debug("generation 스레드가 백그라운드에서 계속 진행 중")
+        # 소비자가 사라지면(연결 종료·태스크 취소) 엔진이 다음 decode 스텝 전에 시퀀스를 뺀다.
+        if not handle.done:
+            handle.cancel()
+            logger.debug("request=%d 생성 취소 요청", handle.request_id)
+        if trace is not None:
+            trace.add_generation(handle, started, time.monotonic())
+
+
+def disconnect_probe(
+    is_disconnected: Callable[[], Awaitable[bool]],
+    interval: float = STREAM_DISCONNECT_CHECK_MS / 1000,
+) -> Callable[[], Awaitable[bool]]:
+    """``is_disconnected``를 최대 ``interval``초에 한 번만 실제로 부르는 확인 함수.
+
+    sse-starlette가 연결 종료 시 제너레이터를 취소하므로 이 확인은 보조 수단이다 — 프레임마다
+    ASGI receive를 기다리는 비용을 매번 치르지 않는다.
+    """
+    last = float("-inf")
+
+    async def check() -> bool:
+        nonlocal last
+        now = time.monotonic()
+        if now - last < interval:
+            return False
+        last = now
+        return await is_disconnected()
+
+    return check
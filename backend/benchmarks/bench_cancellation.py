@@ -0,0 +1,113 @@
+"""생성 취소 후 CPU가 얼마나 빨리 반환되는지 측정한다.
+
+동시 스트림 N개를 띄워 각각 몇 토큰을 받은 뒤 취소하고,
+``cancel()`` → 핸들 종료까지의 지연, 엔진 활성 시퀀스가 0이 되기까지의 시간,
+취소 직후 구간의 프로세스 CPU 사용률(코어 수 기준)을 보고한다.
+
+취소 보장을 확인한다: 모든 핸들이 ``cancel()`` 뒤 decode 한 스텝(취소 전 구간에서 잰 평균) +
+``--slack-ms`` 안에 끝나고, 취소 뒤 CPU 사용률이 ``--max-idle-cores`` 이하로 내려와야 한다.
+아니면 종료 코드 1.
+
+사용법 (backend/ 에서)::
+
+    python -m benchmarks.bench_cancellation --streams 4 --after-tokens 8
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+from llama_modular_rag.config import LLAMA_MODEL_PATH, LLM_PRECISION, init_runtime
+
+init_runtime()
+
+import psutil  # noqa: E402
+from transformers import AutoTokenizer  # noqa: E402
+
+from llama_modular_rag.engine import GenerationEngine, SamplingParams  # noqa: E402
+from llama_modular_rag.generation import ANSWER_PROMPT_TEXT  # noqa: E402
+from llama_modular_rag.llm_setup import load_llama_model  # noqa: E402
+
+
+def _cpu_cores_used(process: psutil.Process, window_s: float) -> float:
+    before = process.cpu_times()
+    time.sleep(window_s)
+    after = process.cpu_times()
+    busy = (after.user - before.user) + (after.system - before.system)
+    return busy / window_s
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=4)
+    parser.add_argument("--after-tokens", type=int, default=8)
+    parser.add_argument("--window", type=float, default=1.0, help="CPU 측정 구간(초)")
+    parser.add_argument("--model-path", default=LLAMA_MODEL_PATH)
+    parser.add_argument("--slack-ms", type=float, default=50.0, help="한 스텝에 더 허용하는 지연")
+    parser.add_argument(
+        "--max-idle-cores", type=float, default=0.2, help="취소 뒤 허용하는 CPU 사용 (코어 수)"
+    )
+    args = parser.parse_args(argv)
+
+    engine = GenerationEngine(
+        load_llama_model(LLM_PRECISION, args.model_path),
+        AutoTokenizer.from_pretrained(args.model_path),
+    )
+    # EOS로 먼저 끝나지 않게 해 취소만으로 종료되도록 한다.
+    engine.eos_token_ids = set()
+    params = SamplingParams(max_new_tokens=100_000)
+    prompt = ANSWER_PROMPT_TEXT.format(context="명동은 서울 중구에 있다.", query="명동 소개")
+    process = psutil.Process(os.getpid())
+
+    handles = [engine.submit(prompt, params, timeout=None) for _ in range(args.streams)]
+    while min(h.num_generated for h in handles) < args.after_tokens:
+        time.sleep(0.001)
+    steps_before = engine.stats()["total_steps"]
+    busy_during = _cpu_cores_used(process, args.window)
+    steps = engine.stats()["total_steps"] - steps_before
+    step_ms = args.window * 1000 / max(1, steps)
+
+    cancel_at = time.perf_counter()
+    latencies: List[float] = []
+    for handle in handles:
+        started = time.perf_counter()
+        handle.cancel()
+        handle.result()
+        latencies.append((time.perf_counter() - started) * 1000)
+    while engine.active_count:
+        time.sleep(0.0005)
+    drained_ms = (time.perf_counter() - cancel_at) * 1000
+    busy_after = _cpu_cores_used(process, args.window)
+
+    result: Dict[str, Any] = {
+        "streams": args.streams,
+        "cancel_to_done_ms_mean": round(statistics.mean(latencies), 3),
+        "cancel_to_done_ms_max": round(max(latencies), 3),
+        "decode_step_ms": round(step_ms, 3),
+        "all_cancelled_to_idle_ms": round(drained_ms, 3),
+        "cpu_cores_busy_during": round(busy_during, 2),
+        "cpu_cores_busy_after": round(busy_after, 2),
+        "engine": engine.stats(),
+    }
+    print(json.dumps(result, indent=2))
+    engine.shutdown()
+
+    failures = []
+    if max(latencies) > step_ms + args.slack_ms:
+        failures.append(
+            f"cancel → 종료 최대 {max(latencies):.1f}ms > 스텝 {step_ms:.1f}ms + {args.slack_ms:.0f}ms"
+        )
+    if busy_after > args.max_idle_cores:
+        failures.append(f"취소 뒤 CPU {busy_after:.2f}코어 > {args.max_idle_cores}코어")
+    for failure in failures:
+        print(f"실패: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""임베딩 백엔드(torch / onnx / onnx-int8) 처리량과 torch 대비 출력 일치도.
+
+문서별 torch 대비 코사인 유사도의 최솟값이 ``--min-cosine``(onnx) / ``--min-cosine-int8``
+(onnx-int8)보다 낮은 백엔드가 있으면 종료 코드 1로 끝난다 — 내보내기나 풀링이 어긋난 경우를 잡는다.
+
+사용법 (backend/ 에서)::
+
+    python -m benchmarks.bench_embeddings --backends torch onnx onnx-int8 --docs 512
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+from llama_modular_rag.config import EMBEDDING_MODEL_NAME, EMBEDDING_ONNX_DIR, init_runtime
+
+init_runtime()
+
+import numpy as np  # noqa: E402
+
+from llama_modular_rag.embeddings import load_embedding_model  # noqa: E402
+
+_WORDS = (
+    "명동 남산 서울 중구 관광객 장소 덕수궁 청계천 시장 미술관 성당 거리 음식 쇼핑 "
+    "역사 문화 공원 산책 야경 전통 골목 카페 박물관 광장 축제 교통 지하철 버스"
+).split()
+
+
+def _corpus(n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(_WORDS, k=rng.randint(8, 60))) for _ in range(n)]
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--docs", type=int, default=512)
+    parser.add_argument("--model-name", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--onnx-dir", default=EMBEDDING_ONNX_DIR)
+    parser.add_argument(
+        "--min-cosine", type=float, default=0.999, help="fp32 onnx의 torch 대비 최소 코사인"
+    )
+    parser.add_argument(
+        "--min-cosine-int8", type=float, default=0.98, help="onnx-int8의 torch 대비 최소 코사인"
+    )
+    args = parser.parse_args(argv)
+    thresholds = {"onnx": args.min_cosine, "onnx-int8": args.min_cosine_int8}
+
+    texts = _corpus(args.docs)
+    reference: np.ndarray | None = None
+    results: List[Dict[str, Any]] = []
+    for backend in dict.fromkeys(["torch", *args.backends]):
+        model = load_embedding_model(backend, args.model_name, args.onnx_dir)
+        model.embed_documents(texts[:8])  # 워밍업
+
+        started = time.perf_counter()
+        vectors = np.asarray(model.embed_documents(texts), dtype=np.float32)
+        elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for text in texts[:32]:
+            model.embed_query(text)
+        query_ms = (time.perf_counter() - started) * 1000 / min(32, len(texts))
+
+        if reference is None:
+            reference = vectors
+        cosine = (reference * vectors).sum(axis=1)
+        results.append(
+            {
+                "backend": backend,
+                "docs_per_s": round(len(texts) / elapsed, 1),
+                "query_ms": round(query_ms, 2),
+                "max_abs_diff": float(np.abs(reference - vectors).max()),
+                "min_cosine_vs_torch": round(float(cosine.min()), 6),
+            }
+        )
+
+    print(json.dumps([r for r in results if r["backend"] in args.backends], indent=2))
+
+    failed = [
+        r
+        for r in results
+        if r["backend"] in thresholds and r["min_cosine_vs_torch"] < thresholds[r["backend"]]
+    ]
+    for r in failed:
+        print(
+            f"불일치: {r['backend']} min_cosine_vs_torch={r['min_cosine_vs_torch']}"
+            f" < {thresholds[r['backend']]}",
+            file=sys.stderr,
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""연속 배칭 엔진의 동시 접속 수별 총 처리량(tokens/s) 벤치마크.
+
+사용법 (backend/ 에서)::
+
+    python -m benchmarks.bench_engine --clients 1 4 16 --max-new-tokens 64
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import time
+from typing import Any, Dict, List
+
+from llama_modular_rag.config import init_runtime
+
+init_runtime()
+
+from llama_modular_rag.engine import SamplingParams, get_generation_engine  # noqa: E402
+from llama_modular_rag.generation import ANSWER_PROMPT_TEXT  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+_CONTEXT = (
+    "문서 1:\n명동은 서울 중구에 위치한 대표적인 쇼핑 거리로, 명동성당과 남산서울타워가 가깝다.\n"
+    "문서 2:\n중구에는 덕수궁, 서울시립미술관, 청계천 등 외국인 관광객이 많이 찾는 명소가 있다.\n"
+)
+_QUERIES = [
+    "명동에 처음 온 외국인 관광객이 가볼만한 장소를 알려줘?",
+    "중구에서 역사적인 장소는 어디야?",
+    "청계천 근처에서 할 만한 것은?",
+    "명동성당은 어디에 있어?",
+]
+
+
+def _run(clients: int, params: SamplingParams) -> Dict[str, Any]:
+    engine = get_generation_engine()
+    prompts = [
+        ANSWER_PROMPT_TEXT.format(context=_CONTEXT, query=_QUERIES[i % len(_QUERIES)])
+        for i in range(clients)
+    ]
+
+    started = time.perf_counter()
+    handles = [engine.submit(p, params) for p in prompts]
+    for handle in handles:
+        handle.result()
+    elapsed = time.perf_counter() - started
+
+    tokens = sum(h.num_generated for h in handles)
+    return {
+        "clients": clients,
+        "tokens": tokens,
+        "seconds": round(elapsed, 3),
+        "tokens_per_s": round(tokens / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args(argv)
+
+    params = SamplingParams(max_new_tokens=args.max_new_tokens)
+
+    get_generation_engine().generate("워밍업", SamplingParams(max_new_tokens=4))
+    results = [_run(n, params) for n in args.clients]
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print(f"{'clients':>8} {'tokens':>8} {'seconds':>9} {'tokens/s':>10}")
+    for r in results:
+        print(f"{r['clients']:>8} {r['tokens']:>8} {r['seconds']:>9.2f} {r['tokens_per_s']:>10.2f}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,204 @@
+"""PDF 인제스트: 기존 일괄 경로 vs 파이프라인의 pages/s, chunks/s, 최대 RSS 증가분.
+
+모드마다 별도 프로세스에서 실행해 RSS가 서로 섞이지 않게 한다. ``--repeat``로 입력 PDF의
+페이지를 반복 이어 붙여 큰 문서를 흉내낼 수 있다.
+
+``cached`` 모드는 빈 청크 임베딩 캐시(임시 디렉터리)로 PDF를 한 번 인제스트한 뒤, 첫 쪽을 뺀
+개정판을 새 저장소에 다시 인제스트해 두 번째 실행의 시간·재사용 비율·아낀 임베딩 시간을 보고한다.
+
+사용법 (backend/ 에서)::
+
+    python -m benchmarks.bench_ingestion --pdf llama_modular_rag/PLAYGROUND_JUNGGU.pdf --repeat 50
+    python -m benchmarks.bench_ingestion --pdf llama_modular_rag/PLAYGROUND_JUNGGU.pdf --modes cached
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+
+# 파싱 워커는 spawn으로 뜨며 이 모듈을 다시 import한다. 무거운 import는 _worker 안에 둔다.
+from llama_modular_rag.config import EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME, INGEST_WORKERS
+
+MODES = ("legacy", "pipeline", "cached")
+
+
+class _PeakRSS:
+    """백그라운드에서 RSS를 주기적으로 재서 최대값을 기록한다."""
+
+    def __init__(self, interval_s: float = 0.02) -> None:
+        import psutil
+
+        self._process = psutil.Process(os.getpid())
+        self._interval_s = interval_s
+        self._stop = threading.Event()
+        self.baseline = self._process.memory_info().rss
+        self.peak = self.baseline
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval_s):
+            self.peak = max(self.peak, self._process.memory_info().rss)
+
+    def __enter__(self) -> "_PeakRSS":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def _repeat_pdf(pdf_path: str, repeat: int, out_dir: str) -> str:
+    from pypdf import PdfReader, PdfWriter
+
+    if repeat <= 1:
+        return pdf_path
+    reader = PdfReader(pdf_path)
+    writer = PdfWriter()
+    for _ in range(repeat):
+        for page in reader.pages:
+            writer.add_page(page)
+    out_path = os.path.join(out_dir, f"repeat{repeat}.pdf")
+    with open(out_path, "wb") as f:
+        writer.write(f)
+    return out_path
+
+
+def _revised_pdf(pdf_path: str, out_dir: str) -> str:
+    """첫 쪽을 뺀 개정판 (나머지 쪽은 그대로)."""
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(pdf_path)
+    writer = PdfWriter()
+    for page in reader.pages[1:] or reader.pages:
+        writer.add_page(page)
+    out_path = os.path.join(out_dir, "revised.pdf")
+    with open(out_path, "wb") as f:
+        writer.write(f)
+    return out_path
+
+
+def _worker(mode: str, pdf_path: str, backend: str, model_name: str, workers: int) -> Dict[str, Any]:
+    from llama_modular_rag.config import init_runtime
+
+    init_runtime()
+
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_community.vectorstores import Chroma
+
+    from llama_modular_rag.data_loader import ingest_pdf
+    from llama_modular_rag.embeddings import load_embedding_model
+
+    embeddings = load_embedding_model(backend, model_name)
+    embeddings.embed_documents(["워밍업"])
+    persist_dir = tempfile.mkdtemp(prefix="bench_ingest_")
+    extra: Dict[str, Any] = {}
+    if mode == "cached":
+        from llama_modular_rag.embedding_cache import (
+            CachedEmbeddings,
+            EmbeddingCache,
+            embedding_model_id,
+        )
+
+        cache = EmbeddingCache(
+            embedding_model_id(backend, model_name), tempfile.mkdtemp(prefix="bench_embcache_")
+        )
+        cold = Chroma(
+            persist_directory=persist_dir,
+            embedding_function=CachedEmbeddings(embeddings, cache),
+            collection_name="bench_cold",
+        )
+        cold_started = time.perf_counter()
+        ingest_pdf(pdf_path, cold, workers=workers)
+        extra["cold_elapsed_s"] = round(time.perf_counter() - cold_started, 2)
+        pdf_path = _revised_pdf(pdf_path, persist_dir)
+
+    with _PeakRSS() as rss:
+        started = time.perf_counter()
+        if mode == "legacy":
+            pages = PyPDFLoader(pdf_path).load()
+            # 토큰 분할 이전의 문자 단위 설정 그대로
+            splits = RecursiveCharacterTextSplitter(
+                chunk_size=256, chunk_overlap=30
+            ).split_documents(pages)
+            Chroma.from_documents(
+                documents=splits,
+                embedding=embeddings,
+                persist_directory=persist_dir,
+                collection_name="bench_legacy",
+            )
+            num_pages, num_chunks = len(pages), len(splits)
+        else:
+            vectorstore = Chroma(
+                persist_directory=persist_dir,
+                embedding_function=(
+                    CachedEmbeddings(embeddings, cache) if mode == "cached" else embeddings
+                ),
+                collection_name=f"bench_{mode}",
+            )
+            stats = ingest_pdf(pdf_path, vectorstore, workers=workers)
+            num_pages, num_chunks = stats.pages_parsed, stats.chunks_embedded
+            if mode == "cached":
+                extra.update(
+                    reuse_ratio=round(stats.reuse_ratio, 3),
+                    embed_s=round(stats.embed_s, 2),
+                    embed_saved_s=round(stats.embed_saved_s, 2),
+                )
+        elapsed = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "pages": num_pages,
+        "chunks": num_chunks,
+        "elapsed_s": round(elapsed, 2),
+        "pages_per_s": round(num_pages / elapsed, 2),
+        "chunks_per_s": round(num_chunks / elapsed, 2),
+        "peak_rss_delta_mb": round((rss.peak - rss.baseline) / 1024 / 1024, 1),
+        **extra,
+    }
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", required=True)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument(
+        "--modes", nargs="+", choices=MODES, default=["legacy", "pipeline"]
+    )
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--backend", default=EMBEDDING_BACKEND)
+    parser.add_argument("--model-name", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(_worker(args.worker, args.pdf, args.backend, args.model_name, args.workers)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = _repeat_pdf(args.pdf, args.repeat, tmp)
+        results = []
+        for mode in args.modes:
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_ingestion", "--worker", mode,
+                 "--pdf", pdf_path, "--workers", str(args.workers),
+                 "--backend", args.backend, "--model-name", args.model_name],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""추론 정밀도(fp32 / bf16 / int8)별 RSS, tokens/s, fp32 대비 품질 차이.
+
+모드마다 별도 프로세스에서 모델을 로드해 RSS가 서로 섞이지 않게 한다.
+품질 차이는 고정 프롬프트 셋에 대한 greedy 출력이 fp32와 얼마나 일치하는지로 본다.
+
+사용법 (backend/ 에서)::
+
+    python -m benchmarks.bench_precision --modes fp32 bf16 int8
+"""
+from __future__ import annotations
+
+import argparse
+import difflib
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+from llama_modular_rag.config import LLAMA_MODEL_PATH
+
+_PROMPTS = [
+    "명동에 처음 온 외국인 관광객이 가볼만한 장소를 알려줘?",
+    "서울 중구의 대표적인 전통 시장은 어디야?",
+    "덕수궁 돌담길은 어떤 곳이야?",
+    "청계천에서 밤에 할 수 있는 일은?",
+    "남산서울타워까지 가는 방법을 알려줘.",
+]
+
+
+def _worker(precision: str, model_path: str, max_new_tokens: int) -> Dict[str, Any]:
+    from llama_modular_rag.config import init_runtime
+
+    init_runtime()
+
+    import psutil
+    from transformers import AutoTokenizer
+
+    from llama_modular_rag.engine import GenerationEngine, SamplingParams
+    from llama_modular_rag.generation import ANSWER_PROMPT_TEXT
+    from llama_modular_rag.llm_setup import load_llama_model
+
+    process = psutil.Process(os.getpid())
+    rss_before = process.memory_info().rss
+    started = time.perf_counter()
+    model = load_llama_model(precision, model_path)
+    load_s = time.perf_counter() - started
+    rss_loaded = process.memory_info().rss
+
+    engine = GenerationEngine(model, AutoTokenizer.from_pretrained(model_path), max_batch_size=1)
+    params = SamplingParams(max_new_tokens=max_new_tokens, do_sample=False)
+    engine.generate("워밍업", SamplingParams(max_new_tokens=2, do_sample=False))
+
+    outputs: List[str] = []
+    tokens = 0
+    started = time.perf_counter()
+    for query in _PROMPTS:
+        handle = engine.submit(ANSWER_PROMPT_TEXT.format(context="", query=query), params)
+        outputs.append(handle.result())
+        tokens += handle.num_generated
+    elapsed = time.perf_counter() - started
+
+    return {
+        "precision": precision,
+        "load_s": round(load_s, 2),
+        "rss_mb": round(rss_loaded / 1024 / 1024, 1),
+        "model_rss_mb": round((rss_loaded - rss_before) / 1024 / 1024, 1),
+        "peak_rss_mb": round(process.memory_info().rss / 1024 / 1024, 1),
+        "tokens_per_s": round(tokens / elapsed, 2) if elapsed else 0.0,
+        "outputs": outputs,
+    }
+
+
+def _drift(reference: List[str], outputs: List[str]) -> Dict[str, float]:
+    exact = sum(a == b for a, b in zip(reference, outputs)) / len(reference)
+    similarity = sum(
+        difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(reference, outputs)
+    ) / len(reference)
+    return {"exact_match": round(exact, 3), "char_similarity": round(similarity, 3)}
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["fp32", "bf16", "int8"])
+    parser.add_argument("--model-path", default=LLAMA_MODEL_PATH)
+    parser.add_argument("--max-new-tokens", type=int, default=48)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(_worker(args.worker, args.model_path, args.max_new_tokens)))
+        return
+
+    results: List[Dict[str, Any]] = []
+    for mode in dict.fromkeys(["fp32", *args.modes]):
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_precision", "--worker", mode,
+             "--model-path", args.model_path, "--max-new-tokens", str(args.max_new_tokens)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    reference = results[0]["outputs"]
+    for r in results:
+        r.update(_drift(reference, r.pop("outputs")))
+    results = [r for r in results if r["precision"] in args.modes]
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""prefix KV 캐시 유무에 따른 TTFT와 hit ratio / 절약된 prefill 토큰 수.
+
+같은 컨텍스트에 대한 후속 질문 시나리오를 캐시 없이 한 번, 캐시를 켜고 한 번 돌린다.
+
+사용법 (backend/ 에서)::
+
+    python -m benchmarks.bench_prefix_cache --rounds 3
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+from llama_modular_rag.config import PREFIX_CACHE_BLOCK, init_runtime
+
+init_runtime()
+
+from llama_modular_rag.engine import GenerationEngine, SamplingParams  # noqa: E402
+from llama_modular_rag.generation import ANSWER_PROMPT_TEXT  # noqa: E402
+from llama_modular_rag.llm_setup import get_llama_model, get_llama_tokenizer  # noqa: E402
+from llama_modular_rag.prefix_cache import PrefixCache  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+_CONTEXTS = [
+    "문서 1:\n명동은 서울 중구에 위치한 대표적인 쇼핑 거리로, 명동성당과 남산서울타워가 가깝다. "
+    "거리에는 화장품 가게와 길거리 음식 노점이 늘어서 있어 외국인 관광객이 많이 찾는다.\n"
+    "문서 2:\n중구에는 덕수궁, 서울시립미술관, 청계천 등 역사와 문화를 함께 즐길 수 있는 명소가 있다.\n",
+    "문서 1:\n남대문시장은 600년 역사를 가진 전통 시장으로 의류, 잡화, 먹거리를 판매한다.\n"
+    "문서 2:\n서울로7017은 옛 고가도로를 보행길로 바꾼 공원으로 서울역과 회현동을 잇는다.\n",
+]
+_QUERIES = [
+    "명동에 처음 온 외국인 관광객이 가볼만한 장소를 알려줘?",
+    "여기서 먹을 만한 음식은 뭐야?",
+    "가족 여행으로 가기 좋은 곳은?",
+]
+
+
+def _ttft_ms(engine: GenerationEngine, prompt: str, params: SamplingParams) -> float:
+    started = time.perf_counter()
+    handle = engine.submit(prompt, params)
+    for _ in handle:
+        break
+    ttft = (time.perf_counter() - started) * 1000
+    handle.result()
+    return ttft
+
+
+def _run(prefix_cache: Optional[PrefixCache], rounds: int) -> Dict[str, Any]:
+    engine = GenerationEngine(
+        get_llama_model(), get_llama_tokenizer(), prefix_cache=prefix_cache
+    )
+    params = SamplingParams(max_new_tokens=4)
+    samples: List[float] = []
+    for _ in range(rounds):
+        for context in _CONTEXTS:
+            for query in _QUERIES:
+                prompt = ANSWER_PROMPT_TEXT.format(context=context, query=query)
+                samples.append(_ttft_ms(engine, prompt, params))
+    return {
+        "prefix_cache": prefix_cache is not None,
+        "requests": len(samples),
+        "ttft_ms_mean": round(statistics.mean(samples), 2),
+        "ttft_ms_p50": round(statistics.median(samples), 2),
+        "cache": prefix_cache.stats() if prefix_cache else None,
+    }
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--budget-mb", type=int, default=256)
+    args = parser.parse_args(argv)
+
+    results = [
+        _run(None, args.rounds),
+        _run(PrefixCache(args.budget_mb * 1024 * 1024, PREFIX_CACHE_BLOCK), args.rounds),
+    ]
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
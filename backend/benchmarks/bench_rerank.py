@@ -0,0 +1,144 @@
+"""cross-encoder 재순위의 종단 지연: 검색 → (재순위) → 컨텍스트 → 첫 토큰 / 전체 생성.
+
+세 가지 구성을 같은 쿼리로 비교한다.
+
+- ``top_k``   : 기존 경로. ``RETRIEVAL_TOP_K``개 검색
+- ``wide``    : 재순위 없이 k를 ``--candidates``로 올림 (``CONTEXT_MAX_TOKENS``까지 채움)
+- ``rerank``  : ``--candidates``개 검색 → cross-encoder 한 배치 → 상위 ``--top-n``개
+
+재순위 비용이 프롬프트 토큰 감소(prefill)로 상쇄되는지 보려는 것이므로 prefix KV 캐시는 끈다.
+재순위는 점수 캐시가 빈 첫 바퀴(cold)와 같은 쿼리를 다시 돈 바퀴(warm)를 따로 보고한다.
+
+사용법 (backend/ 에서)::
+
+    python -m benchmarks.bench_rerank --pdf <file> --candidates 12 --top-n 2
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+from llama_modular_rag.config import (
+    RERANK_CANDIDATES,
+    RERANK_TOP_N,
+    RETRIEVAL_TOP_K,
+    init_runtime,
+)
+
+init_runtime()
+
+from llama_modular_rag.data_loader import (  # noqa: E402
+    close_vectorstore,
+    create_vectorstore_from_pdf,
+    open_sparse_index,
+)
+from llama_modular_rag.engine import GenerationEngine, SamplingParams  # noqa: E402
+from llama_modular_rag.generation import ANSWER_PROMPT_TEXT  # noqa: E402
+from llama_modular_rag.llm_setup import get_llama_model, get_llama_tokenizer  # noqa: E402
+from llama_modular_rag.rerank import get_reranker  # noqa: E402
+from llama_modular_rag.retrieval import context_builder, document_retriever  # noqa: E402
+from llama_modular_rag.sparse_index import with_lexical  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+_QUERIES = [
+    "명동에 처음 온 외국인 관광객이 가볼만한 장소를 알려줘?",
+    "중구에서 아이와 함께 가기 좋은 곳은?",
+    "남대문시장에서 살 만한 것은 뭐야?",
+    "덕수궁 근처에 볼거리가 있어?",
+    "비 오는 날 실내에서 즐길 수 있는 곳을 추천해줘.",
+    "청계천 산책 코스를 알려줘.",
+]
+
+
+def _ms(samples: List[float]) -> Dict[str, float]:
+    return {"p50": round(statistics.median(samples), 1), "mean": round(statistics.mean(samples), 1)}
+
+
+def _run(
+    name: str,
+    retrieve: Callable[[str], List[Any]],
+    queries: List[str],
+    engine: GenerationEngine,
+    params: SamplingParams,
+) -> Dict[str, Any]:
+    tokenizer = get_llama_tokenizer()
+    retrieve_ms: List[float] = []
+    prompt_tokens: List[float] = []
+    ttft_ms: List[float] = []
+    total_ms: List[float] = []
+    for query in queries:
+        started = time.perf_counter()
+        docs = retrieve(query)
+        context = context_builder({"query": query, "documents": docs}).get("context", "")
+        prompt = ANSWER_PROMPT_TEXT.format(context=context, query=query)
+        retrieve_ms.append((time.perf_counter() - started) * 1000)
+        prompt_tokens.append(len(tokenizer(prompt)["input_ids"]))
+
+        handle = engine.submit(prompt, params, timeout=None)
+        for _ in handle:
+            ttft_ms.append((time.perf_counter() - started) * 1000)
+            break
+        handle.result()
+        total_ms.append((time.perf_counter() - started) * 1000)
+    return {
+        "config": name,
+        "retrieve_and_context_ms": _ms(retrieve_ms),
+        "prompt_tokens_mean": round(statistics.mean(prompt_tokens), 1),
+        "ttft_ms": _ms(ttft_ms),
+        "total_ms": _ms(total_ms),
+    }
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf", required=True, help="인덱싱할(또는 이미 인덱싱된) PDF")
+    parser.add_argument("--candidates", type=int, default=RERANK_CANDIDATES)
+    parser.add_argument("--top-n", type=int, default=RERANK_TOP_N)
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--queries", nargs="*", default=_QUERIES)
+    args = parser.parse_args(argv)
+
+    vectorstore, doc_id = create_vectorstore_from_pdf(args.pdf)
+    sparse = open_sparse_index(doc_id, vectorstore)
+    search = with_lexical(vectorstore, [(None, sparse)])
+    reranker = get_reranker()
+    engine = GenerationEngine(get_llama_model(), get_llama_tokenizer(), prefix_cache=None)
+    params = SamplingParams(max_new_tokens=args.max_new_tokens)
+
+    def retrieve(k: int) -> Callable[[str], List[Any]]:
+        return lambda query: document_retriever({"query": query}, search, k=k)["documents"]
+
+    def reranked(query: str) -> List[Any]:
+        docs = retrieve(args.candidates)(query)
+        return [doc for doc, _ in reranker.rerank(query, docs, args.top_n)]
+
+    # 모델 지연 로드·첫 실행 비용 제외
+    _run("warmup", reranked, args.queries[:1], engine, SamplingParams(max_new_tokens=2))
+    reranker._cache.clear()
+    reranker.hits = reranker.misses = 0
+
+    results = [
+        _run(f"top_k={RETRIEVAL_TOP_K}", retrieve(RETRIEVAL_TOP_K), args.queries, engine, params),
+        _run(f"wide k={args.candidates}", retrieve(args.candidates), args.queries, engine, params),
+        _run(
+            f"rerank {args.candidates}->{args.top_n} (cold)", reranked, args.queries, engine, params
+        ),
+        _run(
+            f"rerank {args.candidates}->{args.top_n} (warm)", reranked, args.queries, engine, params
+        ),
+    ]
+    engine.shutdown()
+    sparse.close()
+    close_vectorstore(vectorstore)
+    results.append({"rerank_cache": {"hits": reranker.hits, "misses": reranker.misses}})
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,140 @@
+"""BM25 희소 인덱스: 빌드 시간과 쿼리 지연(p50/p95) — 목표는 10만 청크에서 1ms 미만.
+
+한국어 음절로 만든 Zipf 분포 어휘에서 청크를 합성해 인덱스를 만들고 두 종류로 질의한다.
+
+- ``keyword``: 청크에서 가장 드문 단어(지명·고유명사 역할) + 같은 청크의 단어 1–3개
+- ``common``: 청크의 연속 단어 2–4개. Zipf 분포라 대부분 흔한 단어뿐이라 가지치기가 거의
+  안 되는 최악에 가까운 경우다.
+
+``top_k``(점수 계산 + 상위 k 선택)와 청크 디코드를 포함한 ``search``를 따로 잰다. 비교
+기준으로 모든 posting을 ``np.bincount``로 더하는 전수 계산의 지연도 재고, 두 결과의 상위 k
+점수가 같은지 확인한다.
+
+사용법 (backend/ 에서)::
+
+    python -m benchmarks.bench_sparse --chunks 100000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from llama_modular_rag.config import HYBRID_CANDIDATES
+from llama_modular_rag.sparse_index import SparseIndex, SparseIndexBuilder
+
+
+def _corpus(
+    chunks: int, vocab: int, chunk_chars: int, seed: int
+) -> Tuple[List[str], np.ndarray, List[str]]:
+    """(청크 본문, 청크별 단어 순위 행렬, 어휘). 순위가 클수록 드문 단어."""
+    rng = np.random.default_rng(seed)
+    syllables = np.array([chr(c) for c in range(0xAC00, 0xAC00 + 2000)])
+    words = ["".join(rng.choice(syllables, rng.integers(2, 5))) for _ in range(vocab)]
+    probs = 1.0 / np.arange(1, vocab + 1)
+    probs /= probs.sum()
+    # 청크 하나는 대략 chunk_chars자 (단어 평균 3자 + 공백).
+    per_chunk = max(1, chunk_chars // 4)
+    picks = rng.choice(vocab, size=(chunks, per_chunk), p=probs)
+    return [" ".join(words[i] for i in row) for row in picks], picks, words
+
+
+def _queries(
+    picks: np.ndarray, words: List[str], n: int, kind: str, rng: np.random.Generator
+) -> List[str]:
+    queries = []
+    for row in picks[rng.integers(0, len(picks), n)]:
+        if kind == "keyword":
+            others = rng.choice(row, int(rng.integers(1, 4)), replace=False)
+            chosen = [row.max(), *others]
+        else:
+            start = int(rng.integers(0, max(1, len(row) - 4)))
+            chosen = row[start:start + int(rng.integers(2, 5))]
+        queries.append(" ".join(words[i] for i in chosen))
+    return queries
+
+
+def _exhaustive_top_k(index: SparseIndex, query: str, k: int) -> np.ndarray:
+    """가지치기 없이 쿼리 term의 posting을 전부 더한 상위 k 점수."""
+    pos = index._query_terms(query)
+    if not len(pos):
+        return np.zeros(0)
+    spans = list(zip(index._indptr[pos].tolist(), index._indptr[pos + 1].tolist()))
+    docs = np.concatenate([index._postings[a:b] for a, b in spans])
+    weights = np.concatenate([index._weights[a:b] for a, b in spans])
+    scores = np.bincount(docs, weights=weights, minlength=index.count)
+    scores = scores[scores > 0]
+    return np.sort(scores)[::-1][:k]
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+    }
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--chunk-chars", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=HYBRID_CANDIDATES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    texts, picks, words = _corpus(args.chunks, args.vocab, args.chunk_chars, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    query_sets = {
+        kind: _queries(picks, words, args.queries, kind, rng) for kind in ("keyword", "common")
+    }
+
+    directory = tempfile.mkdtemp(prefix="bench_sparse_")
+    report: Dict[str, object] = {"chunks": args.chunks}
+    try:
+        started = time.perf_counter()
+        builder = SparseIndexBuilder(directory)
+        for start in range(0, len(texts), 4096):
+            builder.add(texts[start:start + 4096])
+        index = builder.save()
+        report["postings"] = len(index._postings)
+        report["build_s"] = round(time.perf_counter() - started, 2)
+        report["k"] = args.k
+
+        index.top_k(query_sets["keyword"][0], args.k)  # 첫 페이지 폴트 제외
+        for kind, queries in query_sets.items():
+            top_k_ms, search_ms, exhaustive_ms = [], [], []
+            mismatches = 0
+            for query in queries:
+                started = time.perf_counter()
+                _, scores = index.top_k(query, args.k)
+                top_k_ms.append((time.perf_counter() - started) * 1000)
+                started = time.perf_counter()
+                index.search(query, args.k)
+                search_ms.append((time.perf_counter() - started) * 1000)
+                started = time.perf_counter()
+                expected = _exhaustive_top_k(index, query, args.k)
+                exhaustive_ms.append((time.perf_counter() - started) * 1000)
+                if len(scores) != len(expected) or not np.allclose(scores, expected, rtol=1e-4):
+                    mismatches += 1
+            report[kind] = {
+                "top_k": _percentiles(top_k_ms),
+                "search_with_decode": _percentiles(search_ms),
+                "exhaustive_top_k": _percentiles(exhaustive_ms),
+                "mismatched_queries": mismatches,
+            }
+        index.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""prompt-lookup 추측 디코딩 유무에 따른 tokens/s와 초안 수락률.
+
+고정된 한국어 컨텍스트·질문 세트로 같은 모델을 공유하는 엔진 두 개(추측 끔 / 켬)를 차례로
+돌린다. 요청은 하나씩 보내므로(배치 1) 순수 decode 속도를 비교한다. greedy 모드에서는 두
+엔진의 출력이 같아야 하므로 일치 여부도 보고한다. prefix KV 캐시는 끈다.
+
+사용법 (backend/ 에서)::
+
+    python -m benchmarks.bench_speculative --draft 5 --ngram 3
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import time
+from typing import Any, Dict, List
+
+from llama_modular_rag.config import MAX_NEW_TOKENS, SPEC_NGRAM, init_runtime
+
+init_runtime()
+
+from llama_modular_rag.engine import GenerationEngine, SamplingParams  # noqa: E402
+from llama_modular_rag.generation import ANSWER_PROMPT_TEXT  # noqa: E402
+from llama_modular_rag.llm_setup import get_llama_model, get_llama_tokenizer  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+_CASES = [
+    (
+        "문서 1:\n명동은 서울 중구에 위치한 대표적인 쇼핑 거리로, 명동성당과 남산서울타워가 가깝다. "
+        "거리에는 화장품 가게와 길거리 음식 노점이 늘어서 있어 외국인 관광객이 많이 찾는다.\n"
+        "문서 2:\n명동성당은 1898년에 완공된 한국 최초의 벽돌조 고딕 양식 성당으로 사적으로 지정되어 있다.\n",
+        "명동에 처음 온 외국인 관광객이 가볼만한 장소를 알려줘?",
+    ),
+    (
+        "문서 1:\n남대문시장은 600년 역사를 가진 전통 시장으로 의류, 잡화, 먹거리를 판매한다. "
+        "새벽 시간에는 도매상인들이 몰려 활기를 띤다.\n"
+        "문서 2:\n서울로7017은 옛 고가도로를 보행길로 바꾼 공원으로 서울역과 회현동을 잇는다.\n",
+        "남대문시장은 어떤 곳이야?",
+    ),
+    (
+        "문서 1:\n덕수궁은 조선 시대의 궁궐로 석조전과 중화전이 있으며, 매일 수문장 교대식이 열린다.\n"
+        "문서 2:\n서울시립미술관은 덕수궁 돌담길 옆에 있으며 근현대 미술 전시를 무료로 볼 수 있다.\n",
+        "덕수궁 근처에서 볼 만한 것을 알려줘.",
+    ),
+    (
+        "문서 1:\n청계천은 광화문 청계광장에서 시작해 동대문을 지나 중랑천까지 이어지는 도심 하천이다. "
+        "산책로를 따라 광통교, 수표교 같은 옛 다리와 분수, 조형물이 있다.\n",
+        "청계천 산책 코스를 알려줘.",
+    ),
+    (
+        "문서 1:\n중구청 민원실은 평일 오전 9시부터 오후 6시까지 운영하며, 여권 발급은 2층 여권과에서 한다.\n"
+        "문서 2:\n주차는 중구청 지하 주차장을 이용할 수 있고 민원 처리 시 1시간 무료다.\n",
+        "중구청에서 여권을 만들려면 어디로 가야 해?",
+    ),
+]
+
+
+def _run(
+    engine: GenerationEngine, prompts: List[str], params: SamplingParams
+) -> Dict[str, Any]:
+    outputs: List[str] = []
+    tokens = 0
+    started = time.perf_counter()
+    for prompt in prompts:
+        handle = engine.submit(prompt, params, timeout=None)
+        outputs.append(handle.result())
+        tokens += handle.num_generated
+    elapsed = time.perf_counter() - started
+    stats = engine.stats()
+    return {
+        "draft_tokens": engine.draft_tokens,
+        "tokens": tokens,
+        "steps": stats["total_steps"],
+        "tokens_per_s": round(tokens / elapsed, 2),
+        "tokens_per_step": round(tokens / max(1, stats["total_steps"]), 2),
+        "speculative": stats["speculative"],
+        "_outputs": outputs,
+    }
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--draft", type=int, default=5, help="초안 토큰 수 (추측 켠 쪽)")
+    parser.add_argument("--ngram", type=int, default=SPEC_NGRAM)
+    parser.add_argument("--max-new-tokens", type=int, default=MAX_NEW_TOKENS)
+    parser.add_argument("--rounds", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    model, tokenizer = get_llama_model(), get_llama_tokenizer()
+    prompts = [
+        ANSWER_PROMPT_TEXT.format(context=context, query=query) for context, query in _CASES
+    ] * args.rounds
+    modes = {
+        "greedy": SamplingParams(max_new_tokens=args.max_new_tokens, do_sample=False),
+        "sampled": SamplingParams(max_new_tokens=args.max_new_tokens),
+    }
+
+    # 첫 forward의 지연 초기화 비용 제외
+    warmup = GenerationEngine(model, tokenizer, max_batch_size=1, draft_tokens=0)
+    warmup.generate(prompts[0], SamplingParams(max_new_tokens=4))
+    warmup.shutdown()
+
+    report: List[Dict[str, Any]] = []
+    for mode, params in modes.items():
+        results = []
+        for draft in (0, args.draft):
+            engine = GenerationEngine(
+                model, tokenizer, max_batch_size=1, draft_tokens=draft, ngram=args.ngram
+            )
+            results.append(_run(engine, prompts, params))
+            engine.shutdown()
+        baseline, speculative = results
+        entry: Dict[str, Any] = {"mode": mode}
+        if mode == "greedy":
+            entry["outputs_match"] = baseline["_outputs"] == speculative["_outputs"]
+        for result in results:
+            result.pop("_outputs")
+        entry["baseline"], entry["speculative"] = baseline, speculative
+        entry["speedup"] = round(speculative["tokens_per_s"] / baseline["tokens_per_s"], 2)
+        report.append(entry)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,186 @@
+"""생성 스레드 → 이벤트 루프 토큰 전달 방식별 토큰당 CPU 비용과 이벤트 루프 지연.
+
+모델 없이 스레드 하나가 decode 스텝을 흉내 내 ``--step-ms``마다 모든 스트림의
+:class:`~llama_modular_rag.engine.GenerationHandle`에 청크를 하나씩 넣고, 스트림마다 코루틴 하나가
+청크를 받아 프레임마다 연결 종료를 확인하고(실제 Starlette ``Request.is_disconnected``) SSE 프레임으로
+인코딩한다.
+
+* ``thread-hop`` — 이전 방식: 청크마다 ``asyncio.to_thread(next, ...)``, 프레임마다 연결 확인
+* ``bridge`` — :func:`app.streaming.relay_chunks` (``call_soon_threadsafe``), 연결 확인은 간격 제한
+* ``bridge+coalesce`` — 위와 같고 ``--coalesce-ms``/``--coalesce-chars``로 프레임을 합침
+
+토큰당 CPU(µs, 생성 스레드 포함 프로세스 전체), 청크가 들어간 뒤 소비자가 받기까지 지연,
+옆에서 ``--tick-ms``마다 깨는 코루틴의 지각(이벤트 루프 지연) p50/p99, 프레임 수를 보고한다.
+
+사용법 (backend/ 에서)::
+
+    python -m benchmarks.bench_token_bridge --streams 64 --tokens 200 --step-ms 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from sse_starlette.sse import ServerSentEvent
+from starlette.requests import Request
+
+from app.streaming import disconnect_probe, relay_chunks
+from llama_modular_rag.engine import GenerationHandle, SamplingParams
+
+_DONE = object()
+MODES = ("thread-hop", "bridge", "bridge+coalesce")
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _live_request() -> Request:
+    """연결이 끊기지 않은 요청 — ``is_disconnected``가 receive를 기다렸다가 바로 포기한다."""
+
+    async def receive() -> Dict[str, Any]:
+        await asyncio.Event().wait()
+        return {}
+
+    return Request({"type": "http", "method": "POST", "headers": []}, receive)
+
+
+def _decode_steps(handles: List[GenerationHandle], tokens: int, step_s: float) -> None:
+    """엔진 스케줄러 흉내: 스텝마다 모든 시퀀스에 청크 하나 (청크 = 스텝 번호를 담은 짧은 문자열)."""
+    next_step = time.perf_counter()
+    for step in range(tokens):
+        for handle in handles:
+            handle._put(f"{step:05d}")
+        next_step += step_s
+        delay = next_step - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    for handle in handles:
+        handle._finish()
+
+
+async def _thread_hop(handle: GenerationHandle, on_frame: Callable[[str], None]) -> None:
+    request = _live_request()
+    chunks = iter(handle)
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, _DONE)
+        if chunk is _DONE:
+            return
+        if await request.is_disconnected():
+            return
+        on_frame(chunk)
+
+
+async def _bridge(
+    handle: GenerationHandle, on_frame: Callable[[str], None], delay: float, chars: int
+) -> None:
+    disconnected = disconnect_probe(_live_request().is_disconnected)
+    async for text in relay_chunks(handle, delay, chars):
+        if await disconnected():
+            return
+        on_frame(text)
+
+
+async def _run(mode: str, args: argparse.Namespace) -> Dict[str, Any]:
+    handles = [GenerationHandle(i, [0], SamplingParams()) for i in range(args.streams)]
+    step_s = args.step_ms / 1000
+    started_at: List[float] = []  # 생성 시작 시각 (스텝 k의 청크는 started_at[0] + k·step에 들어간다)
+    frames = 0
+    latencies: List[float] = []
+
+    def on_frame(text: str) -> None:
+        nonlocal frames
+        frames += 1
+        # 라우트가 프레임마다 하는 일: JSON 직렬화 + SSE 인코딩.
+        ServerSentEvent(json.dumps(text, ensure_ascii=False), event="token").encode()
+        now = time.perf_counter()
+        # 프레임의 마지막 청크가 들어간 (예정) 시각 기준 — 합친 프레임은 가장 최근 청크로 잰다.
+        step = int(text[-5:])
+        latencies.append(now - (started_at[0] + step * step_s))
+
+    lags: List[float] = []
+    stop = asyncio.Event()
+
+    async def ticker() -> None:
+        interval = args.tick_ms / 1000
+        while not stop.is_set():
+            expected = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    if mode == "thread-hop":
+        consumers = [_thread_hop(h, on_frame) for h in handles]
+    else:
+        coalesce = mode == "bridge+coalesce"
+        delay = args.coalesce_ms / 1000 if coalesce else 0.0
+        chars = args.coalesce_chars if coalesce else 0
+        consumers = [_bridge(h, on_frame, delay, chars) for h in handles]
+
+    tick = asyncio.create_task(ticker())
+    tasks = [asyncio.create_task(c) for c in consumers]
+    await asyncio.sleep(0.05)  # 소비자가 모두 기다리기 시작한 뒤 생성 시작
+    cpu_before = time.process_time()
+    wall_before = time.perf_counter()
+    started_at.append(wall_before)
+    producer = threading.Thread(target=_decode_steps, args=(handles, args.tokens, step_s))
+    producer.start()
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - wall_before
+    cpu = time.process_time() - cpu_before
+    stop.set()
+    await tick
+    producer.join()
+
+    total = args.streams * args.tokens
+    return {
+        "mode": mode,
+        "streams": args.streams,
+        "tokens": total,
+        "frames": frames,
+        "cpu_us_per_token": round(cpu / total * 1e6, 1),
+        "wall_s": round(wall, 3),
+        "latency_p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "latency_p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+        "loop_lag_p50_ms": round(statistics.median(lags) * 1000, 2) if lags else 0.0,
+        "loop_lag_p99_ms": round(_percentile(lags, 0.99) * 1000, 2),
+    }
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=64, help="동시 스트림 수")
+    parser.add_argument("--tokens", type=int, default=200, help="스트림당 청크 수")
+    parser.add_argument("--step-ms", type=float, default=20.0, help="decode 스텝 간격")
+    parser.add_argument("--tick-ms", type=float, default=5.0, help="루프 지연 측정 간격")
+    parser.add_argument("--coalesce-ms", type=float, default=30.0)
+    parser.add_argument("--coalesce-chars", type=int, default=64)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args(argv)
+
+    results = [asyncio.run(_run(mode, args)) for mode in args.modes]
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print(
+        f"{'mode':<16} {'frames':>7} {'cpu_us/tok':>10} {'lat_p50':>8} {'lat_p99':>8}"
+        f" {'lag_p50':>8} {'lag_p99':>8}"
+    )
+    for r in results:
+        print(
+            f"{r['mode']:<16} {r['frames']:>7} {r['cpu_us_per_token']:>10.1f}"
+            f" {r['latency_p50_ms']:>8.2f} {r['latency_p99_ms']:>8.2f}"
+            f" {r['loop_lag_p50_ms']:>8.2f} {r['loop_lag_p99_ms']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
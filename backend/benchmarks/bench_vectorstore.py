@@ -0,0 +1,131 @@
+"""벡터 저장소 백엔드 비교: 여는 시간, 검색 지연(p50/p95), 정확 검색 대비 recall@k.
+
+정규화된 합성 벡터(군집이 있는 분포)로 Chroma와 FAISS(flat / ivf / hnsw) 저장소를 만든 뒤
+같은 쿼리 벡터로 ``similarity_search_by_vector_with_relevance_scores``를 잰다. 임베딩 모델은
+쓰지 않으므로 순수 저장소 비용만 보인다. 정답은 numpy로 계산한 정확한 top-k다.
+
+사용법 (backend/ 에서)::
+
+    python -m benchmarks.bench_vectorstore --n 50000 --dim 768
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from llama_modular_rag.data_loader import close_vectorstore
+from llama_modular_rag.faiss_store import INDEX_TYPES, FaissVectorStore
+
+
+def _vectors(n: int, dim: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 100), dim)).astype(np.float32)
+    x = centers[rng.integers(0, len(centers), n)] + 0.3 * rng.standard_normal((n, dim)).astype(
+        np.float32
+    )
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    # 정규화된 벡터에서는 내적이 클수록 L2 거리가 작다.
+    return np.argsort(-(queries @ corpus.T), axis=1)[:, :k]
+
+
+def _build_chroma(path: str, corpus: np.ndarray) -> Callable[[], Any]:
+    from langchain_community.vectorstores import Chroma
+
+    store = Chroma(persist_directory=path, collection_name="bench_vectors")
+    step = 5000  # chromadb 한 번 추가 상한보다 작게
+    for start in range(0, len(corpus), step):
+        rows = range(start, min(start + step, len(corpus)))
+        store._collection.add(
+            ids=[str(i) for i in rows],
+            embeddings=corpus[start:start + step].tolist(),
+            documents=[str(i) for i in rows],
+        )
+    close_vectorstore(store)
+    return lambda: Chroma(persist_directory=path, collection_name="bench_vectors")
+
+
+def _build_faiss(path: str, corpus: np.ndarray, index_type: str) -> Callable[[], Any]:
+    store = FaissVectorStore(path, None, index_type=index_type)
+    store.add_embeddings([str(i) for i in range(len(corpus))], corpus)
+    store.save()
+    store.close()
+    return lambda: FaissVectorStore.load(path, None)
+
+
+def _measure(
+    name: str, build: Callable[[], Callable[[], Any]], queries: np.ndarray, truth: np.ndarray, k: int
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    opener = build()
+    build_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    store = opener()
+    open_ms = (time.perf_counter() - started) * 1000
+    # 첫 검색은 지연 로드(Chroma의 HNSW 적재 등)를 포함하므로 따로 잰다.
+    started = time.perf_counter()
+    store.similarity_search_by_vector_with_relevance_scores(queries[0].tolist(), k=k)
+    first_ms = (time.perf_counter() - started) * 1000
+
+    latencies: List[float] = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        results = store.similarity_search_by_vector_with_relevance_scores(query.tolist(), k=k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += len({int(doc.page_content) for doc, _ in results} & set(expected.tolist()))
+    close_vectorstore(store)
+
+    return {
+        "backend": name,
+        "build_s": round(build_s, 2),
+        "open_ms": round(open_ms, 2),
+        "first_search_ms": round(first_ms, 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        f"recall@{k}": round(hits / (len(queries) * k), 4),
+    }
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=20000, help="저장할 벡터 수")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--backends", nargs="+", default=["chroma", *(f"faiss-{t}" for t in INDEX_TYPES)])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    vectors = _vectors(args.n + args.queries, args.dim, args.seed)
+    corpus, queries = vectors[: args.n], vectors[args.n:]
+    truth = _exact_top_k(corpus, queries, args.k)
+
+    results = []
+    tmp = tempfile.mkdtemp(prefix="bench_vs_")
+    try:
+        for name in args.backends:
+            path = f"{tmp}/{name}"
+            if name == "chroma":
+                build = lambda path=path: _build_chroma(path, corpus)  # noqa: E731
+            else:
+                index_type = name.split("-", 1)[1]
+                build = lambda path=path, t=index_type: _build_faiss(path, corpus, t)  # noqa: E731
+            results.append(_measure(name, build, queries, truth, args.k))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""추론 워커 수 × 워커당 스레드 수 조합별 총 처리량, TTFT, 메모리(RSS·PSS).
+
+조합 ``WxT``에서 ``W``는 워커 프로세스 수(0이면 API 프로세스 안의 엔진 하나), ``T``는 프로세스당
+torch 스레드 수다. 같은 코어 수를 ``1x4``·``2x2``·``4x1``처럼 나눠 보면 프로세스를 늘리는 쪽과
+스레드를 늘리는 쪽 중 어디가 나은지 알 수 있다. 조합마다 별도 프로세스에서 돌려 메모리가 섞이지
+않게 하고, 메모리는 벤치 프로세스와 워커 프로세스를 합친 값이다. 워커들이 mmap 가중치를 공유하면
+RSS 합은 워커 수만큼 늘지만 PSS(공유 페이지를 나눠 센 값) 합은 거의 늘지 않는다.
+
+사용법 (backend/ 에서)::
+
+    python -m benchmarks.bench_workers --splits 0x4 1x4 2x2 4x1 --clients 16
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from llama_modular_rag.config import LLAMA_MODEL_PATH, LLM_PRECISION
+
+_CONTEXT = (
+    "문서 1:\n명동은 서울 중구에 위치한 대표적인 쇼핑 거리로, 명동성당과 남산서울타워가 가깝다.\n"
+    "문서 2:\n중구에는 덕수궁, 서울시립미술관, 청계천 등 외국인 관광객이 많이 찾는 명소가 있다.\n"
+)
+_QUERIES = [
+    "명동에 처음 온 외국인 관광객이 가볼만한 장소를 알려줘?",
+    "중구에서 역사적인 장소는 어디야?",
+    "청계천 근처에서 할 만한 것은?",
+    "명동성당은 어디에 있어?",
+]
+
+
+def _parse_split(split: str) -> Tuple[int, int]:
+    workers, _, threads = split.lower().partition("x")
+    return int(workers), int(threads or 0)
+
+
+def _memory(pids: List[int]) -> Dict[str, Optional[float]]:
+    """``pids`` 프로세스들의 RSS·PSS 합 (MB). PSS를 못 읽는 플랫폼이면 ``None``."""
+    import psutil
+
+    rss = 0
+    pss: Optional[int] = 0
+    for pid in pids:
+        process = psutil.Process(pid)
+        try:
+            info = process.memory_full_info()
+            rss += info.rss
+            if pss is not None:
+                pss = pss + info.pss if hasattr(info, "pss") else None
+        except psutil.AccessDenied:
+            rss += process.memory_info().rss
+            pss = None
+    return {
+        "rss_mb": round(rss / 1024 / 1024, 1),
+        "pss_mb": None if pss is None else round(pss / 1024 / 1024, 1),
+    }
+
+
+def _worker(split: str, clients: int, max_new_tokens: int, model_path: str) -> Dict[str, Any]:
+    from llama_modular_rag.config import init_runtime
+
+    workers, threads = _parse_split(split)
+    # 인프로세스 모드의 스레드 수. 워커 모드에서는 워커가 자기 스레드 수를 정한다.
+    init_runtime(threads if workers == 0 and threads else None)
+
+    from transformers import AutoTokenizer
+
+    from llama_modular_rag.engine import SamplingParams, build_generation_engine
+    from llama_modular_rag.generation import ANSWER_PROMPT_TEXT
+    from llama_modular_rag.llm_setup import load_llama_model
+    from llama_modular_rag.worker_pool import WorkerPool
+
+    started = time.perf_counter()
+    if workers == 0:
+        engine: Any = build_generation_engine(
+            load_llama_model(LLM_PRECISION, model_path), AutoTokenizer.from_pretrained(model_path)
+        )
+        pids = [os.getpid()]
+    else:
+        engine = WorkerPool(workers, threads=threads, model_path=model_path)
+        pids = [os.getpid()] + [w["pid"] for w in engine.stats()["workers"]]
+    # 워커마다 한 번씩 워밍업 (최소 부하 배정이라 동시에 넣으면 고르게 퍼진다).
+    warmup = SamplingParams(max_new_tokens=2, do_sample=False)
+    for handle in [engine.submit("워밍업", warmup) for _ in range(max(1, workers))]:
+        handle.result()
+    load_s = time.perf_counter() - started
+
+    params = SamplingParams(max_new_tokens=max_new_tokens, do_sample=False)
+    prompts = [
+        ANSWER_PROMPT_TEXT.format(context=_CONTEXT, query=_QUERIES[i % len(_QUERIES)])
+        for i in range(clients)
+    ]
+    started = time.perf_counter()
+    handles = [engine.submit(p, params) for p in prompts]
+    for handle in handles:
+        handle.result()
+    elapsed = time.perf_counter() - started
+
+    memory = _memory(pids)
+    engine.shutdown()
+    tokens = sum(h.num_generated for h in handles)
+    ttft = [h.first_token_at - h.submitted_at for h in handles if h.first_token_at is not None]
+    return {
+        "split": split,
+        "workers": workers,
+        "threads": threads,
+        "load_s": round(load_s, 2),
+        "tokens": tokens,
+        "seconds": round(elapsed, 3),
+        "tokens_per_s": round(tokens / elapsed, 2) if elapsed else 0.0,
+        "ttft_p50_ms": round(statistics.median(ttft) * 1000, 1) if ttft else None,
+        **memory,
+    }
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--splits", nargs="+", default=["0x4", "1x4", "2x2", "4x1"])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--model-path", default=LLAMA_MODEL_PATH)
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(_worker(args.worker, args.clients, args.max_new_tokens, args.model_path)))
+        return
+
+    results: List[Dict[str, Any]] = []
+    for split in args.splits:
+        _parse_split(split)  # 형식 오류는 자식 프로세스를 띄우기 전에 낸다
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_workers", "--worker", split,
+             "--clients", str(args.clients), "--max-new-tokens", str(args.max_new_tokens),
+             "--model-path", args.model_path],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    print(
+        f"{'split':>6} {'load_s':>7} {'tokens/s':>9} {'ttft_p50':>9} {'rss_mb':>8} {'pss_mb':>8}"
+    )
+    for r in results:
+        pss = "-" if r["pss_mb"] is None else f"{r['pss_mb']:.1f}"
+        ttft = "-" if r["ttft_p50_ms"] is None else f"{r['ttft_p50_ms']:.1f}"
+        print(
+            f"{r['split']:>6} {r['load_s']:>7.2f} {r['tokens_per_s']:>9.2f} {ttft:>9}"
+            f" {r['rss_mb']:>8.1f} {pss:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
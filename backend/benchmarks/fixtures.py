@@ -0,0 +1,267 @@
+"""오프라인 벤치마크용 고정 입력: 작은 무작위 초기화 모델과 합성 한국어 PDF.
+
+네트워크 없이 파이프라인 전 단계를 돌리기 위해 로컬에서 직접 만든다.
+
+- Llama: 합성 코퍼스로 학습한 byte-level BPE 토크나이저 + 작은 ``LlamaForCausalLM``
+- 임베딩: WordPiece 토크나이저 + 작은 BERT에 mean pooling을 붙인 sentence-transformers 모델
+- 재순위: 같은 토크나이저를 쓰는 ``BertForSequenceClassification`` (출력 1개)
+- PDF: 한국어 문장을 ``Identity-H`` 폰트와 ToUnicode CMap으로 적은 문서 (pypdf로 추출 가능)
+
+가중치는 시드로 고정되므로 같은 사양이면 어느 머신에서나 같은 모델이 나온다. 품질은 의미가
+없고 모양(층 수·차원·어휘 크기)만 실제 모델과 같은 경로를 타게 하는 것이 목적이다.
+
+사용법 (backend/ 에서)::
+
+    python -m benchmarks.fixtures --out /tmp/rag_tiny_models
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+_SPEC_FILE = "fixtures.json"
+_SPEC_VERSION = 1
+
+# Llama 3 토크나이저와 같은 이름의 특수 토큰 (엔진은 eos만 참조한다).
+_BOS, _EOS, _EOT = "<|begin_of_text|>", "<|end_of_text|>", "<|eot_id|>"
+
+
+@dataclass(frozen=True)
+class TinyModelSpec:
+    seed: int = 0
+    llama_vocab: int = 4000
+    llama_hidden: int = 128
+    llama_layers: int = 4
+    llama_heads: int = 4
+    llama_kv_heads: int = 2
+    llama_intermediate: int = 344
+    bert_vocab: int = 4000
+    bert_hidden: int = 64
+    bert_layers: int = 2
+    bert_heads: int = 4
+    bert_intermediate: int = 128
+
+
+@dataclass(frozen=True)
+class TinyModels:
+    llama: str
+    embedding: str
+    reranker: str
+
+
+def synthetic_vocabulary(size: int, seed: int) -> List[str]:
+    """한글 음절 2–4개로 된 무작위 단어 ``size``개."""
+    rng = np.random.default_rng(seed)
+    syllables = [chr(c) for c in range(0xAC00, 0xAC00 + 2000)]
+    return ["".join(rng.choice(syllables, int(rng.integers(2, 5)))) for _ in range(size)]
+
+
+def synthetic_sentences(count: int, seed: int, vocab_size: int = 3000) -> List[str]:
+    """Zipf 분포 어휘로 만든 한국어 모양의 문장들. 자주 나오는 단어가 있어야 BPE가 병합을 배운다."""
+    words = synthetic_vocabulary(vocab_size, seed)
+    rng = np.random.default_rng(seed + 1)
+    probs = 1.0 / np.arange(1, vocab_size + 1)
+    probs /= probs.sum()
+    endings = ["다.", "요.", "까?", ".", ""]
+    sentences = []
+    for _ in range(count):
+        picks = rng.choice(vocab_size, int(rng.integers(4, 13)), p=probs)
+        sentences.append(" ".join(words[i] for i in picks) + endings[int(rng.integers(len(endings)))])
+    return sentences
+
+
+def _train_llama_tokenizer(corpus: Sequence[str], vocab_size: int):
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, processors, trainers
+    from transformers import PreTrainedTokenizerFast
+
+    tok = Tokenizer(models.BPE())
+    tok.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tok.decoder = decoders.ByteLevel()
+    tok.train_from_iterator(
+        corpus,
+        trainers.BpeTrainer(
+            vocab_size=vocab_size,
+            special_tokens=[_BOS, _EOS, _EOT],
+            initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+        ),
+    )
+    tok.post_processor = processors.TemplateProcessing(
+        single=f"{_BOS} $A", pair=f"{_BOS} $A {_BOS} $B", special_tokens=[(_BOS, tok.token_to_id(_BOS))]
+    )
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tok, bos_token=_BOS, eos_token=_EOT, pad_token=_EOS
+    )
+
+
+def _train_bert_tokenizer(corpus: Sequence[str], vocab_size: int):
+    from tokenizers import BertWordPieceTokenizer
+    from transformers import BertTokenizerFast
+
+    tok = BertWordPieceTokenizer(lowercase=False, strip_accents=False)
+    tok.train_from_iterator(corpus, vocab_size=vocab_size)
+    return BertTokenizerFast(
+        tokenizer_object=tok._tokenizer,
+        unk_token="[UNK]",
+        sep_token="[SEP]",
+        pad_token="[PAD]",
+        cls_token="[CLS]",
+        mask_token="[MASK]",
+    )
+
+
+def _save_llama(path: str, spec: TinyModelSpec, corpus: Sequence[str]) -> None:
+    import torch
+    from transformers import LlamaConfig, LlamaForCausalLM
+
+    tokenizer = _train_llama_tokenizer(corpus, spec.llama_vocab)
+    torch.manual_seed(spec.seed)
+    config = LlamaConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=spec.llama_hidden,
+        intermediate_size=spec.llama_intermediate,
+        num_hidden_layers=spec.llama_layers,
+        num_attention_heads=spec.llama_heads,
+        num_key_value_heads=spec.llama_kv_heads,
+        max_position_embeddings=4096,
+        tie_word_embeddings=True,
+        bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=[tokenizer.convert_tokens_to_ids(_EOS), tokenizer.eos_token_id],
+        pad_token_id=tokenizer.pad_token_id,
+    )
+    LlamaForCausalLM(config).save_pretrained(path)
+    tokenizer.save_pretrained(path)
+
+
+def _save_berts(embedding_path: str, reranker_path: str, spec: TinyModelSpec, corpus) -> None:
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers import models as st_models
+    from transformers import BertConfig, BertForSequenceClassification, BertModel
+
+    tokenizer = _train_bert_tokenizer(corpus, spec.bert_vocab)
+    config = BertConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=spec.bert_hidden,
+        num_hidden_layers=spec.bert_layers,
+        num_attention_heads=spec.bert_heads,
+        intermediate_size=spec.bert_intermediate,
+        max_position_embeddings=512,
+    )
+
+    torch.manual_seed(spec.seed)
+    BertModel(config).save_pretrained(embedding_path)
+    tokenizer.save_pretrained(embedding_path)
+    transformer = st_models.Transformer(embedding_path, max_seq_length=256)
+    pooling = st_models.Pooling(spec.bert_hidden, pooling_mode="mean")
+    SentenceTransformer(modules=[transformer, pooling], device="cpu").save(embedding_path)
+
+    torch.manual_seed(spec.seed + 1)
+    config.num_labels = 1
+    BertForSequenceClassification(config).save_pretrained(reranker_path)
+    tokenizer.save_pretrained(reranker_path)
+
+
+def build_tiny_models(root: str, spec: TinyModelSpec = TinyModelSpec()) -> TinyModels:
+    """``root`` 아래에 세 모델을 만든다. 같은 사양으로 이미 만들어 두었으면 그대로 쓴다."""
+    models = TinyModels(
+        llama=os.path.join(root, "tiny-llama"),
+        embedding=os.path.join(root, "tiny-sbert"),
+        reranker=os.path.join(root, "tiny-cross-encoder"),
+    )
+    spec_path = os.path.join(root, _SPEC_FILE)
+    wanted = {"version": _SPEC_VERSION, **asdict(spec)}
+    if os.path.exists(spec_path):
+        with open(spec_path, encoding="utf-8") as f:
+            if json.load(f) == wanted:
+                return models
+
+    os.makedirs(root, exist_ok=True)
+    corpus = synthetic_sentences(20_000, spec.seed)
+    _save_llama(models.llama, spec, corpus)
+    _save_berts(models.embedding, models.reranker, spec, corpus)
+    with open(spec_path, "w", encoding="utf-8") as f:
+        json.dump(wanted, f)
+    return models
+
+
+def write_korean_pdf(path: str, pages: Sequence[Sequence[str]]) -> None:
+    """줄 목록의 목록을 페이지마다 한 줄씩 적은 PDF로 쓴다.
+
+    글리프는 넣지 않는다(화면에는 보이지 않음). 문자 코드를 그대로 CID로 쓰는 ``Identity-H``와
+    같은 값을 유니코드로 돌려주는 ToUnicode CMap만 넣어 텍스트 추출이 원문을 복원하게 한다.
+    """
+    highs = sorted({ord(c) >> 8 for lines in pages for line in lines for c in line})
+    cmap = (
+        "/CIDInit /ProcSet findresource begin 12 dict begin begincmap "
+        "/CMapName /Adobe-Identity-UCS def /CMapType 2 def "
+        "1 begincodespacerange <0000> <FFFF> endcodespacerange\n"
+        f"{len(highs)} beginbfrange\n"
+        + "".join(f"<{h:02X}00> <{h:02X}FF> <{h:02X}00>\n" for h in highs)
+        + "endbfrange endcmap CMapName currentdict /CMap defineresource pop end end"
+    )
+    n = len(pages)
+    font = 3 + 2 * n
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(n))}] /Count {n} >>",
+    ]
+    for i, lines in enumerate(pages):
+        body = " ".join(f"<{''.join(f'{ord(c):04X}' for c in line)}> Tj T*" for line in lines)
+        stream = f"BT /F1 10 Tf 14 TL 40 800 Td {body} ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font} 0 R >> >> >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append(
+        "<< /Type /Font /Subtype /Type0 /BaseFont /Bench /Encoding /Identity-H "
+        f"/DescendantFonts [{font + 1} 0 R] /ToUnicode {font + 2} 0 R >>"
+    )
+    objects.append(
+        "<< /Type /Font /Subtype /CIDFontType2 /BaseFont /Bench /CIDSystemInfo "
+        "<< /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> /DW 1000 >>"
+    )
+    objects.append(f"<< /Length {len(cmap)} >>\nstream\n{cmap}\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("ascii")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode("ascii")
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    ).encode("ascii")
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def synthetic_pdf(path: str, pages: int, seed: int = 0, lines_per_page: int = 40) -> List[str]:
+    """합성 문장으로 ``pages``쪽짜리 PDF를 만들고 사용한 문장들을 반환한다 (쿼리 생성용)."""
+    sentences = synthetic_sentences(pages * lines_per_page, seed + 100)
+    layout = [
+        sentences[i * lines_per_page:(i + 1) * lines_per_page] for i in range(pages)
+    ]
+    write_korean_pdf(path, layout)
+    return sentences
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", required=True, help="모델을 만들 디렉터리")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    models = build_tiny_models(args.out, TinyModelSpec(seed=args.seed))
+    paths: Dict[str, str] = asdict(models)
+    print(json.dumps(paths, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
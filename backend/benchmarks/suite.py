@@ -0,0 +1,619 @@
+"""파이프라인 전 단계 오프라인 벤치마크 스위트 — 결과를 JSON으로 남기고 기준과 비교한다.
+
+네트워크나 실제 가중치 없이 :mod:`benchmarks.fixtures`의 작은 무작위 모델과 합성 한국어 PDF로
+다음 단계를 잰다. 절대값은 실제 모델과 다르지만 같은 머신에서 커밋 사이의 회귀를 잡는 용도다.
+
+- ``ingest``   : ``create_vectorstore_from_pdf`` (파싱 → 토큰 분할 → 임베딩 → 저장 + BM25)
+- ``embedding``: ``embed_documents`` 처리량, ``embed_query`` 지연
+- ``search``   : dense ``similarity_search`` / hybrid(dense + BM25) 지연
+- ``context``  : ``context_builder`` 지연 (``HYBRID_CANDIDATES``개 후보에서 예산만큼 채우기)
+- ``rerank``   : cross-encoder 한 배치 채점 (점수 캐시를 거치지 않음)
+- ``engine``   : 배치 1 prefill 지연과 decode tokens/s, ``--batch``개 동시 요청의 tokens/s
+- ``sse``      : uvicorn으로 띄운 앱의 ``/api/query/stream`` 첫 ``token`` 이벤트까지(TTFT)
+- ``coalesce`` : 같은 쿼리 ``--coalesce-requests``개를 REST·SSE 반반으로 동시에 보내 엔진 생성이
+  정확히 한 번이고 답변이 모두 같은지 확인한다 (아니면 실패). 합류 수와 완료 지연을 남긴다.
+- ``cache``    : 쿼리 캐시 미스 / 메모리 히트 / SQLite 히트 / 유사 쿼리 히트·미스 지연
+
+지표마다 단위와 방향(``lower``/``higher``가 좋음)을 함께 저장한다. ``--baseline``을 주면
+같은 이름의 지표를 비교해 ``--threshold``(비율)보다 나빠진 것이 있으면 종료 코드 1로 끝난다.
+ms 지표는 ``--min-delta-ms``보다 작은 차이를 잡음으로 보고 무시한다.
+
+사용법 (backend/ 에서)::
+
+    python -m benchmarks.suite --out bench.json
+    python -m benchmarks.suite --out new.json --baseline bench.json --threshold 0.25
+    python -m benchmarks.suite --current new.json --baseline bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+# llama_modular_rag.config는 import 시점에 환경 변수를 읽는다. 작은 모델과 임시 경로를
+# 환경 변수로 먼저 지정해야 하므로 패키지 import는 전부 _run_stages 안에서 한다.
+from benchmarks.fixtures import TinyModelSpec, build_tiny_models, synthetic_pdf
+
+logger = logging.getLogger(__name__)
+
+STAGES = (
+    "ingest",
+    "embedding",
+    "search",
+    "context",
+    "rerank",
+    "engine",
+    "sse",
+    "coalesce",
+    "cache",
+)
+
+Metrics = Dict[str, Dict[str, Any]]
+
+
+def _metric(metrics: Metrics, name: str, value: float, unit: str, better: str) -> None:
+    metrics[name] = {"value": round(float(value), 4), "unit": unit, "better": better}
+
+
+def _latency(metrics: Metrics, name: str, samples_s: Sequence[float]) -> None:
+    """초 단위 샘플을 ``<name>_p50_ms`` / ``<name>_p95_ms`` 두 지표로 남긴다."""
+    samples_ms = np.asarray(samples_s) * 1000
+    _metric(metrics, f"{name}_p50_ms", np.percentile(samples_ms, 50), "ms", "lower")
+    _metric(metrics, f"{name}_p95_ms", np.percentile(samples_ms, 95), "ms", "lower")
+
+
+def _timed(fn: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def _per_query(fn: Callable[[str], Any], queries: Sequence[str], rounds: int) -> List[float]:
+    """쿼리 세트를 ``rounds``번 돌며 쿼리마다 ``fn`` 한 번의 시간(초)을 잰다."""
+    return [_timed(lambda q=q: fn(q)) for _ in range(rounds) for q in queries]
+
+
+def _queries(sentences: Sequence[str], n: int, seed: int) -> List[str]:
+    """문서 문장에서 연속된 단어 2–4개를 뽑은 쿼리 (BM25와 dense 모두 후보가 나오게)."""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for i in rng.integers(0, len(sentences), n):
+        words = sentences[int(i)].split()
+        start = int(rng.integers(0, max(1, len(words) - 3)))
+        queries.append(" ".join(words[start:start + int(rng.integers(2, 5))]))
+    return queries
+
+
+def _configure_environment(models: Any, run_dir: str, pdf_path: str, threads: Optional[int]) -> None:
+    if "llama_modular_rag.config" in sys.modules:
+        raise RuntimeError("llama_modular_rag.config가 환경 변수 설정보다 먼저 import되었습니다.")
+    os.environ.update(
+        {
+            "RAG_LLAMA_MODEL_PATH": models.llama,
+            "RAG_EMBEDDING_MODEL": models.embedding,
+            "RAG_RERANKER_MODEL": models.reranker,
+            "RAG_EMBEDDING_BACKEND": "torch",
+            "RAG_EMBEDDING_ONNX_DIR": os.path.join(run_dir, "onnx"),
+            "RAG_VECTOR_DB_PATH": os.path.join(run_dir, "vector_db"),
+            "RAG_CACHE_DIR": os.path.join(run_dir, "cache"),
+            "RAG_DEFAULT_PDF": pdf_path,
+            "LOG_LEVEL": "WARNING",
+        }
+    )
+    if threads:
+        os.environ["RAG_NUM_THREADS"] = str(threads)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _sse_ttft(port: int, queries: Sequence[str]) -> Dict[str, List[float]]:
+    """쿼리마다 첫 ``token`` 이벤트와 ``done`` 이벤트까지의 시간(초)."""
+    import httpx
+
+    ttft: List[float] = []
+    total: List[float] = []
+    with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=300) as client:
+        for query in queries:
+            started = time.perf_counter()
+            first: Optional[float] = None
+            with client.stream(
+                "POST", "/api/query/stream", json={"query": query, "semantic_cache": False}
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    event = line.partition(":")[2].strip() if line.startswith("event:") else None
+                    if event == "token" and first is None:
+                        first = time.perf_counter() - started
+                    elif event == "error":
+                        raise RuntimeError(f"SSE 오류 이벤트: {query!r}")
+                    elif event == "done":
+                        break
+            if first is None:
+                raise RuntimeError(f"token 이벤트 없이 스트림이 끝났습니다: {query!r}")
+            ttft.append(first)
+            total.append(time.perf_counter() - started)
+    return {"ttft": ttft, "total": total}
+
+
+@contextmanager
+def _serve_app() -> Iterator[int]:
+    """``app.main:app``을 uvicorn으로 띄우고 포트를 넘긴다. 블록을 나가면 내린다."""
+    import uvicorn
+    from sse_starlette.sse import AppStatus
+
+    from app.main import app
+
+    # sse-starlette는 종료 이벤트를 프로세스 전역에 두고 처음 만든 루프에 묶는다. 한 프로세스에서
+    # 서버를 다시 띄우면 새 루프에서 다시 만들도록 비운다.
+    AppStatus.should_exit = False
+    AppStatus.should_exit_event = None
+    port = _free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+    )
+    thread = threading.Thread(target=server.run, name="bench-uvicorn", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn 서버가 시작되지 못했습니다.")
+        time.sleep(0.05)
+    try:
+        yield port
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def _coalesce(port: int, query: str, n: int) -> Dict[str, Any]:
+    """같은 쿼리를 ``n``개 동시에 보낸다 (짝수 번째는 ``/api/query``, 홀수 번째는 SSE).
+
+    요청별 완료 시간(초), 받은 답변, 진행 중인 생성에 합류한 요청 수를 돌려준다.
+    """
+    import httpx
+
+    body = {"query": query, "semantic_cache": False}
+    barrier = threading.Barrier(n)
+    total: List[float] = [0.0] * n
+    answers: List[Optional[str]] = [None] * n
+    coalesced: List[bool] = [False] * n
+    errors: List[BaseException] = []
+
+    def run(i: int) -> None:
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=300) as client:
+                barrier.wait()
+                started = time.perf_counter()
+                if i % 2 == 0:
+                    response = client.post("/api/query", json=body)
+                    response.raise_for_status()
+                    data = response.json()
+                    answers[i], coalesced[i] = data["answer"], data["coalesced"]
+                else:
+                    parts: List[str] = []
+                    with client.stream("POST", "/api/query/stream", json=body) as response:
+                        response.raise_for_status()
+                        event = None
+                        for line in response.iter_lines():
+                            if line.startswith("event:"):
+                                event = line.partition(":")[2].strip()
+                            elif line.startswith("data:") and event == "token":
+                                parts.append(json.loads(line.partition(":")[2].strip()))
+                            elif line.startswith("data:") and event == "done":
+                                coalesced[i] = json.loads(line.partition(":")[2])["coalesced"]
+                                break
+                            elif event == "error":
+                                raise RuntimeError(f"SSE 오류 이벤트: {line}")
+                    answers[i] = "".join(parts).strip()
+                total[i] = time.perf_counter() - started
+        except BaseException as exc:  # noqa: BLE001
+            errors.append(exc)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return {"total": total, "answers": answers, "joined": sum(coalesced)}
+
+
+def _run_stages(args: argparse.Namespace, pdf_path: str, sentences: List[str]) -> Metrics:
+    from llama_modular_rag.config import (
+        HYBRID_CANDIDATES,
+        RERANK_CANDIDATES,
+        RETRIEVAL_TOP_K,
+        init_runtime,
+    )
+
+    init_runtime()
+
+    from llama_modular_rag.caching import QueryCache, SemanticQueryCache
+    from llama_modular_rag.data_loader import (
+        IngestStats,
+        close_vectorstore,
+        create_vectorstore_from_pdf,
+        open_sparse_index,
+    )
+    from llama_modular_rag.embeddings import get_embedding_model
+    from llama_modular_rag.engine import GenerationEngine, SamplingParams
+    from llama_modular_rag.generation import ANSWER_PROMPT_TEXT
+    from llama_modular_rag.llm_setup import get_llama_model, get_llama_tokenizer
+    from llama_modular_rag.rerank import get_reranker
+    from llama_modular_rag.retrieval import context_builder, document_retriever
+    from llama_modular_rag.sparse_index import HybridSearch
+
+    stages = set(args.stages)
+    rounds = args.rounds
+    metrics: Metrics = {}
+    queries = _queries(sentences, args.queries, args.seed)
+
+    # ---------------------------------------------------------------- ingest
+    # 임베딩·토크나이저 로드는 인제스트 시간에서 뺀다.
+    embeddings = get_embedding_model()
+    embeddings.embed_query(queries[0])
+    get_llama_tokenizer()
+    final: List[IngestStats] = []
+    vectorstore, doc_id = create_vectorstore_from_pdf(pdf_path, progress=final.append)
+    if "ingest" in stages:
+        stats = final[-1]
+        _metric(metrics, "ingest.elapsed_s", stats.elapsed_s, "s", "lower")
+        _metric(metrics, "ingest.pages_per_s", stats.pages_per_s, "pages/s", "higher")
+        _metric(metrics, "ingest.chunks_per_s", stats.chunks_per_s, "chunks/s", "higher")
+
+    # ------------------------------------------------------------- embedding
+    if "embedding" in stages:
+        texts = [" ".join(sentences[i:i + 6]) for i in range(0, len(sentences), 6)][:512]
+        embeddings.embed_documents(texts[:16])
+        elapsed = _timed(lambda: embeddings.embed_documents(texts))
+        _metric(metrics, "embedding.docs_per_s", len(texts) / elapsed, "docs/s", "higher")
+        _latency(metrics, "embedding.query", _per_query(embeddings.embed_query, queries, rounds))
+
+    # ------------------------------------------------------- search / context
+    sparse = open_sparse_index(doc_id, vectorstore)
+    hybrid = HybridSearch(vectorstore, [(None, sparse)])
+    if "search" in stages:
+        for name, search in (("dense", vectorstore), ("hybrid", hybrid)):
+            _latency(
+                metrics,
+                f"search.{name}",
+                _per_query(
+                    lambda q, s=search: s.similarity_search(q, k=RETRIEVAL_TOP_K), queries, rounds
+                ),
+            )
+    candidates = {
+        q: document_retriever({"query": q}, hybrid, k=max(HYBRID_CANDIDATES, RERANK_CANDIDATES))[
+            "documents"
+        ]
+        for q in queries
+    }
+    if "context" in stages:
+        _latency(
+            metrics,
+            "context.build",
+            _per_query(
+                lambda q: context_builder({"query": q, "documents": candidates[q]}), queries, rounds
+            ),
+        )
+    if "rerank" in stages:
+        reranker = get_reranker()
+        reranker.score(queries[0], [d.page_content for d in candidates[queries[0]]])
+        texts = {q: [d.page_content for d in candidates[q][:RERANK_CANDIDATES]] for q in queries}
+        # 점수 캐시를 거치지 않는 채점 한 배치.
+        _latency(
+            metrics, "rerank.batch", _per_query(lambda q: reranker._forward(q, texts[q]), queries, rounds)
+        )
+
+    prompts = [
+        ANSWER_PROMPT_TEXT.format(
+            context=context_builder({"query": q, "documents": candidates[q]}).get("context", ""),
+            query=q,
+        )
+        for q in queries[: args.prompts]
+    ]
+    sparse.close()
+    close_vectorstore(vectorstore)
+
+    # ---------------------------------------------------------------- engine
+    if "engine" in stages:
+        model, tokenizer = get_llama_model(), get_llama_tokenizer()
+        first_token = SamplingParams(max_new_tokens=1, do_sample=False)
+        decode = SamplingParams(max_new_tokens=args.decode_tokens, do_sample=False)
+        engine = GenerationEngine(model, tokenizer, max_batch_size=1, prefix_cache=None)
+        engine.generate(prompts[0], SamplingParams(max_new_tokens=4))
+        prefill, rates = [], []
+        for prompt in prompts:
+            # 같은 프롬프트의 1토큰 생성 시간을 prefill로 보고 전체 시간에서 빼 decode 속도를 낸다.
+            prefill_s = _timed(lambda p=prompt: engine.submit(p, first_token, timeout=None).result())
+            handle = engine.submit(prompt, decode, timeout=None)
+            total_s = _timed(handle.result)
+            if handle.num_generated > 1 and total_s > prefill_s:
+                rates.append((handle.num_generated - 1) / (total_s - prefill_s))
+            prefill.append(prefill_s)
+        engine.shutdown()
+        _latency(metrics, "engine.prefill", prefill)
+        _metric(metrics, "engine.decode_tokens_per_s", statistics.median(rates), "tokens/s", "higher")
+
+        batched = GenerationEngine(model, tokenizer, max_batch_size=args.batch, prefix_cache=None)
+        batched.generate(prompts[0], SamplingParams(max_new_tokens=4))
+        started = time.perf_counter()
+        handles = [
+            batched.submit(prompts[i % len(prompts)], decode, timeout=None)
+            for i in range(args.batch)
+        ]
+        for handle in handles:
+            handle.result()
+        elapsed = time.perf_counter() - started
+        batched.shutdown()
+        _metric(
+            metrics,
+            "engine.batch_tokens_per_s",
+            sum(h.num_generated for h in handles) / elapsed,
+            "tokens/s",
+            "higher",
+        )
+
+    # ------------------------------------------------------------------- sse
+    if "sse" in stages:
+        with _serve_app() as port:
+            # 엔진 스레드·모델 지연 로드는 첫 요청에서 일어나므로 한 번 흘려 보낸다.
+            _sse_ttft(port, ["warmup " + queries[0]])
+            # 캐시 히트가 나지 않도록 요청마다 번호를 붙인다.
+            timings = _sse_ttft(
+                port, [f"{q} {i}" for i, q in enumerate(queries[: args.sse_requests])]
+            )
+        _latency(metrics, "sse.ttft", timings["ttft"])
+        _latency(metrics, "sse.total", timings["total"])
+
+    # -------------------------------------------------------------- coalesce
+    if "coalesce" in stages:
+        from llama_modular_rag.engine import get_generation_engine
+
+        with _serve_app() as port:
+            _sse_ttft(port, ["warmup " + queries[0]])
+            before = get_generation_engine().stats()["submitted"]
+            outcome = _coalesce(port, "coalesce " + queries[0], args.coalesce_requests)
+            generations = get_generation_engine().stats()["submitted"] - before
+        # 동시에 보낸 같은 쿼리는 생성 한 번만 일으켜야 한다 (늦게 온 요청은 캐시 히트).
+        if generations != 1:
+            raise RuntimeError(
+                f"같은 쿼리 {args.coalesce_requests}개가 생성 {generations}번을 일으켰습니다."
+            )
+        if len(set(outcome["answers"])) != 1:
+            raise RuntimeError("합쳐진 요청들의 답변이 서로 다릅니다.")
+        _metric(metrics, "coalesce.generations", generations, "count", "lower")
+        _metric(metrics, "coalesce.joined", outcome["joined"], "count", "higher")
+        _latency(metrics, "coalesce.total", outcome["total"])
+
+    # ----------------------------------------------------------------- cache
+    if "cache" in stages:
+        cache_dir = tempfile.mkdtemp(prefix="bench_suite_cache_")
+        try:
+            results = {
+                q: {"query": q, "answer": q * 8, "documents": candidates[q][:RETRIEVAL_TOP_K]}
+                for q in queries
+            }
+            exact = QueryCache(cache_dir=os.path.join(cache_dir, "exact"))
+            _latency(
+                metrics,
+                "cache.miss",
+                _per_query(lambda q: exact.get_cached_result(doc_id, q), queries, rounds),
+            )
+            for q, result in results.items():
+                exact.cache_result(doc_id, q, result)
+            _latency(
+                metrics,
+                "cache.memory_hit",
+                _per_query(lambda q: exact.get_cached_result(doc_id, q), queries, rounds),
+            )
+            # 새 인스턴스는 메모리 LRU가 비어 있으므로 첫 조회만 SQLite에서 읽힌다 (한 바퀴).
+            reopened = QueryCache(cache_dir=exact.cache_dir)
+            _latency(
+                metrics,
+                "cache.disk_hit",
+                _per_query(lambda q: reopened.get_cached_result(doc_id, q), queries, 1),
+            )
+
+            # 무작위 임베딩이라 유사도에 의미가 없으므로 임계값으로 경로를 고른다:
+            # -1이면 가장 가까운 과거 쿼리가 항상 히트, 1이면 (같은 문자열이 아니면) 항상 미스.
+            for name, threshold in (("semantic_hit", -1.0), ("semantic_miss", 1.0)):
+                semantic = SemanticQueryCache(
+                    exact=QueryCache(cache_dir=os.path.join(cache_dir, name)),
+                    embeddings=embeddings,
+                    threshold=threshold,
+                )
+                for q, result in results.items():
+                    semantic.cache_result(doc_id, q, result)
+                _latency(
+                    metrics,
+                    f"cache.{name}",
+                    _per_query(
+                        lambda q, c=semantic: c.get_cached_result(doc_id, q + "?"), queries, rounds
+                    ),
+                )
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    return metrics
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(
+    current: Metrics,
+    baseline: Metrics,
+    threshold: float,
+    overrides: Dict[str, float],
+    min_delta_ms: float,
+) -> List[Dict[str, Any]]:
+    """지표별 비교 행. ``status``는 ok / regressed / improved / new / missing."""
+    rows: List[Dict[str, Any]] = []
+    for name in sorted(set(current) | set(baseline)):
+        if name not in baseline or name not in current:
+            rows.append({"metric": name, "status": "new" if name in current else "missing"})
+            continue
+        now, before = current[name]["value"], baseline[name]["value"]
+        row: Dict[str, Any] = {"metric": name, "baseline": before, "current": now}
+        limit = overrides.get(name, threshold)
+        # 나빠진 방향을 양수로: lower가 좋은 지표는 증가율, higher가 좋은 지표는 감소율.
+        sign = 1 if current[name]["better"] == "lower" else -1
+        change = sign * (now - before) / before if before else 0.0
+        row["change"] = round(change, 4)
+        if current[name]["unit"] == "ms" and abs(now - before) < min_delta_ms:
+            row["status"] = "ok"
+        elif change > limit:
+            row["status"] = "regressed"
+        elif change < -limit:
+            row["status"] = "improved"
+        else:
+            row["status"] = "ok"
+        rows.append(row)
+    return rows
+
+
+def _parse_overrides(items: Sequence[str]) -> Dict[str, float]:
+    overrides = {}
+    for item in items:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise SystemExit(f"--metric-threshold는 NAME=비율 형식이어야 합니다: {item!r}")
+        overrides[name] = float(value)
+    return overrides
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", help="결과 JSON을 쓸 경로")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument(
+        "--workdir",
+        default=os.path.join(tempfile.gettempdir(), "rag_bench_suite"),
+        help="작은 모델을 만들어 두고 재사용할 디렉터리 (실행별 데이터는 매번 지운다)",
+    )
+    parser.add_argument("--pages", type=int, default=40, help="합성 PDF 쪽수")
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--rounds", type=int, default=3, help="지연 측정에서 쿼리 세트를 도는 횟수")
+    parser.add_argument("--prompts", type=int, default=5, help="engine 단계의 프롬프트 수")
+    parser.add_argument("--decode-tokens", type=int, default=64)
+    parser.add_argument("--batch", type=int, default=4, help="engine 배치 처리량의 동시 요청 수")
+    parser.add_argument("--sse-requests", type=int, default=10)
+    parser.add_argument(
+        "--coalesce-requests", type=int, default=8, help="coalesce 단계에서 동시에 보낼 같은 쿼리 수"
+    )
+    parser.add_argument("--threads", type=int, help="torch 스레드 수 (기본: RAG_NUM_THREADS)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON")
+    parser.add_argument("--current", help="새로 돌리지 않고 이 결과 JSON을 --baseline과 비교")
+    parser.add_argument("--threshold", type=float, default=0.25, help="허용 악화 비율")
+    parser.add_argument(
+        "--metric-threshold",
+        action="append",
+        default=[],
+        metavar="NAME=RATIO",
+        help="지표별 허용 악화 비율 (여러 번 지정 가능)",
+    )
+    parser.add_argument("--min-delta-ms", type=float, default=0.5)
+    args = parser.parse_args(argv)
+    if args.current and not args.baseline:
+        parser.error("--current는 --baseline과 함께 써야 합니다.")
+
+    if args.current:
+        with open(args.current, encoding="utf-8") as f:
+            report = json.load(f)
+    else:
+        spec = TinyModelSpec(seed=args.seed)
+        models = build_tiny_models(os.path.join(args.workdir, "models"), spec)
+        run_dir = os.path.join(args.workdir, "run")
+        shutil.rmtree(run_dir, ignore_errors=True)
+        os.makedirs(run_dir)
+        pdf_path = os.path.join(run_dir, "synthetic.pdf")
+        sentences = synthetic_pdf(pdf_path, args.pages, args.seed)
+        _configure_environment(models, run_dir, pdf_path, args.threads)
+
+        started = time.perf_counter()
+        metrics = _run_stages(args, pdf_path, sentences)
+        import torch
+
+        report = {
+            "meta": {
+                "commit": _git_commit(),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "torch": torch.__version__,
+                "threads": torch.get_num_threads(),
+                "machine": platform.machine(),
+                "elapsed_s": round(time.perf_counter() - started, 1),
+                "args": {
+                    k: v
+                    for k, v in vars(args).items()
+                    if k not in ("out", "baseline", "current", "workdir")
+                },
+                "models": vars(spec),
+            },
+            "metrics": metrics,
+        }
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if not args.baseline:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(
+        report["metrics"],
+        baseline["metrics"],
+        args.threshold,
+        _parse_overrides(args.metric_threshold),
+        args.min_delta_ms,
+    )
+    regressions = [row["metric"] for row in rows if row["status"] == "regressed"]
+    print(
+        json.dumps(
+            {
+                "baseline_commit": baseline.get("meta", {}).get("commit"),
+                "current_commit": report.get("meta", {}).get("commit"),
+                "comparison": rows,
+                "regressions": regressions,
+            },
+            ensure_ascii=False,
+            indent=2,
+        )
+    )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""여러 쿼리를 한 번에 처리하는 배치 경로 (야간 평가·캐시 예열용).
+
+1. 중복을 뺀 쿼리 전부를 ``embed_documents`` 한 번으로 임베딩한다. 이 벡터를 유사 쿼리 캐시
+   조회·검색·캐시 저장에 그대로 쓴다.
+2. 캐시에 있는 쿼리는 바로 내보내고 생성하지 않는다.
+3. 나머지는 :func:`~llama_modular_rag.retrieval.retrieve_documents_batch`로 한꺼번에 검색하고
+   컨텍스트를 만든다.
+4. 프롬프트를 한 번에 토큰화해 길이순으로 엔진에 넣는다. 엔진은 대기열 순서대로 decode 배치에
+   합류시키고 배치 KV 캐시를 left-padding으로 맞추므로, 비슷한 길이끼리 묶여 padding이 준다.
+   엔진에 동시에 넣어 두는 수는 ``max_inflight``로 제한해 대화형 요청이 배치 뒤에 밀리지 않게 한다.
+5. 생성이 끝나는 순서대로 :class:`BatchResult`를 yield한다.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from llama_modular_rag.caching import SemanticQueryCache
+from llama_modular_rag.config import BATCH_MAX_INFLIGHT, RERANK_ENABLED
+from llama_modular_rag.engine import GenerationEngine, GenerationHandle, get_generation_engine
+from llama_modular_rag.generation import ANSWER_PROMPT_TEXT
+from llama_modular_rag.retrieval import context_builder, retrieve_documents_batch
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchResult:
+    index: int  # 입력 목록에서의 위치
+    query: str
+    answer: str = ""
+    documents: List[Document] = field(default_factory=list)
+    cached: bool = False
+    elapsed_ms: int = 0  # 배치 시작부터 이 결과가 나올 때까지
+    error: Optional[str] = None
+
+
+def answer_batch(
+    vectorstore: VectorStore,
+    queries: Sequence[str],
+    *,
+    cache: Optional[SemanticQueryCache] = None,
+    cache_key: Optional[str] = None,
+    semantic: bool = True,
+    rerank: bool = RERANK_ENABLED,
+    engine: Optional[GenerationEngine] = None,
+    max_inflight: int = BATCH_MAX_INFLIGHT,
+    timeout: Optional[float] = None,
+) -> Iterator[BatchResult]:
+    """``queries``를 처리해 끝나는 순서대로 결과를 yield한다.
+
+    ``cache``가 있으면 ``cache_key``(문서 키)로 조회·저장한다. 같은 쿼리가 여러 번 있으면 한 번만
+    생성해 모든 위치에 내보낸다. ``timeout``은 생성 하나의 deadline이다 (기본 없음 — 배치는
+    대기열에서 오래 기다릴 수 있다). 소비자가 도중에 멈추면 진행 중인 생성을 취소한다.
+    """
+    started = time.perf_counter()
+    engine = engine or get_generation_engine()
+
+    def result(index: int, query: str, **fields: Any) -> BatchResult:
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        return BatchResult(index=index, query=query, elapsed_ms=elapsed_ms, **fields)
+
+    positions: Dict[str, List[int]] = {}
+    for index, query in enumerate(queries):
+        positions.setdefault(query, []).append(index)
+    unique = list(positions)
+    if not unique:
+        return
+
+    from llama_modular_rag.embeddings import get_embedding_model
+
+    vectors = np.asarray(get_embedding_model().embed_documents(unique), dtype=np.float32)
+
+    pending: List[int] = []
+    for u, query in enumerate(unique):
+        cached = None
+        if cache is not None:
+            cached = cache.get_cached_result(cache_key, query, semantic=semantic, vector=vectors[u])
+        if not cached:
+            pending.append(u)
+            continue
+        for index in positions[query]:
+            yield result(
+                index,
+                query,
+                answer=cached.get("answer") or "",
+                documents=cached.get("documents") or [],
+                cached=True,
+            )
+    if not pending:
+        return
+
+    pending_queries = [unique[u] for u in pending]
+    documents = retrieve_documents_batch(vectorstore, pending_queries, vectors[pending], rerank)
+    prompts = [
+        ANSWER_PROMPT_TEXT.format(
+            context=context_builder({"query": query, "documents": docs})["context"], query=query
+        )
+        for query, docs in zip(pending_queries, documents)
+    ]
+    prompt_ids: List[List[int]] = engine.tokenizer(prompts)["input_ids"]
+    order = sorted(range(len(prompts)), key=lambda j: len(prompt_ids[j]))
+
+    finished: "queue.Queue[GenerationHandle]" = queue.Queue()
+    inflight: Dict[GenerationHandle, int] = {}
+    submitted = 0
+    try:
+        while submitted < len(order) or inflight:
+            while submitted < len(order) and len(inflight) < max(1, max_inflight):
+                j = order[submitted]
+                submitted += 1
+                handle = engine.submit_ids(prompt_ids[j], timeout=timeout)
+                inflight[handle] = j
+                handle.add_done_callback(finished.put)
+
+            handle = finished.get()
+            j = inflight.pop(handle)
+            query, docs = pending_queries[j], documents[j]
+            try:
+                answer = handle.result()
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("배치 생성 실패 (%r): %s", query, exc)
+                for index in positions[query]:
+                    yield result(index, query, documents=docs, error=str(exc))
+                continue
+            if cache is not None:
+                cache.cache_result(
+                    cache_key,
+                    query,
+                    {"query": query, "answer": answer, "documents": docs},
+                    vector=vectors[pending[j]],
+                )
+            for index in positions[query]:
+                yield result(index, query, answer=answer, documents=docs)
+    finally:
+        for handle in inflight:
+            handle.cancel()
@@ -1,15 +1,31 @@
 import hashlib
 import json
 import os
-from typing import Any, Dict, Optional
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 
-from llama_modular_rag.config import CACHE_DIR
+from llama_modular_rag.config import (
+    CACHE_DIR,
+    QUERY_CACHE_MAX_ENTRIES,
+    QUERY_CACHE_MAX_MB,
+    QUERY_CACHE_MEMORY_ENTRIES,
+    QUERY_CACHE_TTL_SECONDS,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_THRESHOLD,
+)
 
 # 캐시 포맷이 바뀌면 이 값을 올려 기존 캐시를 자동으로 무효화한다.
 _CACHE_SCHEMA_VERSION = 2
 
+_DB_FILENAME = "query_cache.sqlite3"
+
 
 def _serialize(result: Dict[str, Any]) -> Dict[str, Any]:
     payload = dict(result)
@@ -34,30 +50,383 @@ def _deserialize(blob: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     return data
 
 
+def _avg_ms(seconds: float, count: int) -> float:
+    return round(1000 * seconds / count, 4) if count else 0.0
+
+
 class QueryCache:
-    """문서별로 분리된 쿼리 결과 캐시 (JSON, SHA-256)."""
+    """문서별로 분리된 쿼리 결과 캐시 (SHA-256 키).
 
-    def __init__(self, cache_dir: str = CACHE_DIR) -> None:
+    2단 구조다. 프로세스 안의 LRU(역직렬화된 결과)가 먼저 응답하고, 미스면
+    ``cache_dir`` 아래 SQLite 파일 하나에서 인덱스 조회로 읽는다. 디스크 쪽은
+    ``max_entries``/``max_bytes``를 넘으면 마지막 접근 시각이 오래된 순으로 지우고,
+    ``ttl_seconds``가 지난 항목은 미스로 처리한다.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = CACHE_DIR,
+        memory_entries: int = QUERY_CACHE_MEMORY_ENTRIES,
+        max_entries: int = QUERY_CACHE_MAX_ENTRIES,
+        max_bytes: int = QUERY_CACHE_MAX_MB * 1024 * 1024,
+        ttl_seconds: float = QUERY_CACHE_TTL_SECONDS,
+    ) -> None:
         self.cache_dir: str = cache_dir
         os.makedirs(cache_dir, exist_ok=True)
+        self.db_path: str = os.path.join(cache_dir, _DB_FILENAME)
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, doc_id TEXT NOT NULL, payload TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+        # TTL 정리(cache_result마다)가 만료 항목만 인덱스로 찾도록.
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries(created)")
+        self._count, self._bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+
+        self.memory_hits: int = 0
+        self.disk_hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self._memory_hit_seconds: float = 0.0
+        self._disk_hit_seconds: float = 0.0
 
-    def _path(self, doc_id: str, query: str) -> str:
+    @staticmethod
+    def _key(doc_id: str, query: str) -> str:
         material = f"{doc_id}::{query}".encode("utf-8")
-        key = hashlib.sha256(material).hexdigest()
-        return os.path.join(self.cache_dir, f"{key}.json")
+        return hashlib.sha256(material).hexdigest()
 
-    def get_cached_result(self, doc_id: str, query: str) -> Optional[Dict[str, Any]]:
-        path = self._path(doc_id, query)
-        if not os.path.exists(path):
-            return None
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                blob = json.load(f)
-        except (json.JSONDecodeError, OSError):
-            return None
-        return _deserialize(blob)
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created > self.ttl_seconds
+
+    def get_cached_result(
+        self, doc_id: str, query: str, *, count: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """``count=False``면 적중·미스 카운터를 건드리지 않는다 (유사 쿼리 단계가 이웃을 꺼낼 때)."""
+        started = time.perf_counter()
+        now = time.time()
+        key = self._key(doc_id, query)
+        with self._lock:
+            hot = self._memory.get(key)
+            if hot is not None and not self._expired(hot[0], now):
+                self._memory.move_to_end(key)
+                if count:
+                    self.memory_hits += 1
+                    self._memory_hit_seconds += time.perf_counter() - started
+                return dict(hot[1])
+
+            row = self._conn.execute(
+                "SELECT payload, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            result = None
+            if row is not None:
+                payload, created = row
+                if not self._expired(created, now):
+                    try:
+                        result = _deserialize(json.loads(payload))
+                    except json.JSONDecodeError:
+                        result = None
+                if result is None:  # 만료됐거나 읽을 수 없는 항목
+                    self._delete(key)
+            if result is None:
+                if count:
+                    self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._remember(key, created, result)
+            if count:
+                self.disk_hits += 1
+                self._disk_hit_seconds += time.perf_counter() - started
+            return dict(result)
 
     def cache_result(self, doc_id: str, query: str, result: Dict[str, Any]) -> None:
-        path = self._path(doc_id, query)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(_serialize(result), f, ensure_ascii=False)
+        key = self._key(doc_id, query)
+        payload = json.dumps(_serialize(result), ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._delete(key)
+            self._conn.execute(
+                "INSERT INTO entries (key, doc_id, payload, size, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, doc_id, payload, size, now, now),
+            )
+            self._count += 1
+            self._bytes += size
+            self._remember(key, now, _deserialize(_serialize(result)) or {})
+            self._enforce_limits()
+
+    def _remember(self, key: str, created: float, result: Dict[str, Any]) -> None:
+        self._memory[key] = (created, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _delete(self, key: str) -> None:
+        self._memory.pop(key, None)
+        row = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return
+        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._count -= 1
+        self._bytes -= row[0]
+
+    def _enforce_limits(self) -> None:
+        """만료 항목을 지우고, 한도를 넘으면 접근이 오래된 순으로 내보낸다."""
+        if self.ttl_seconds > 0:
+            self._purge_expired()
+        while self._count > self.max_entries or self._bytes > self.max_bytes:
+            victims = self._conn.execute(
+                "SELECT key FROM entries ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not victims:
+                break
+            for (key,) in victims:
+                self._delete(key)
+                self.evictions += 1
+                if self._count <= self.max_entries and self._bytes <= self.max_bytes:
+                    break
+
+    def _purge_expired(self) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        removed = self._conn.execute(
+            "SELECT key FROM entries WHERE created < ?", (cutoff,)
+        ).fetchall()
+        for (key,) in removed:
+            self._delete(key)
+        self.evictions += len(removed)
+        return len(removed)
+
+    def compact(self) -> Dict[str, Any]:
+        """만료·초과 항목 정리, 구버전 ``*.json`` 파일 흡수, VACUUM 후 통계를 반환한다."""
+        with self._lock:
+            imported = self._import_legacy_files()
+            expired = self._purge_expired() if self.ttl_seconds > 0 else 0
+            self._enforce_limits()
+            self._conn.execute("VACUUM")
+        stats = self.stats()
+        stats.update({"imported_legacy": imported, "expired_removed": expired})
+        return stats
+
+    def _import_legacy_files(self) -> int:
+        """이전 버전이 남긴 ``<sha256>.json`` 파일을 DB로 옮기고 지운다."""
+        imported = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    blob = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                blob = None
+            if blob is not None and _deserialize(blob) is not None:
+                payload = json.dumps(blob, ensure_ascii=False)
+                mtime = os.path.getmtime(path)
+                key = name[: -len(".json")]
+                self._delete(key)
+                self._conn.execute(
+                    "INSERT INTO entries (key, doc_id, payload, size, created, accessed)"
+                    " VALUES (?, '', ?, ?, ?, ?)",
+                    (key, payload, len(payload.encode("utf-8")), mtime, mtime),
+                )
+                self._count += 1
+                self._bytes += len(payload.encode("utf-8"))
+                imported += 1
+            os.remove(path)
+        return imported
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "disk_entries": self._count,
+            "disk_bytes": self._bytes,
+            "file_bytes": os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_hit_ms": _avg_ms(self._memory_hit_seconds, self.memory_hits),
+            "disk_hit_ms": _avg_ms(self._disk_hit_seconds, self.disk_hits),
+        }
+
+
+class _SemanticIndex:
+    """문서 하나에 대한 과거 쿼리 임베딩 행렬 (행 = 정규화된 임베딩)."""
+
+    def __init__(self, dim: int, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.matrix = np.empty((min(64, max_entries), dim), dtype=np.float32)
+        self.queries: List[str] = []
+        self.rows: Dict[str, int] = {}
+
+    def add(self, query: str, vector: np.ndarray) -> None:
+        if query in self.rows:
+            return
+        n = len(self.queries)
+        if n >= self.max_entries:
+            # 가장 오래된 절반을 버려 행렬 이동 비용을 상각한다.
+            keep = self.max_entries // 2
+            self.matrix[:keep] = self.matrix[n - keep:n]
+            self.queries = self.queries[n - keep:]
+            self.rows = {q: i for i, q in enumerate(self.queries)}
+            n = keep
+        if n >= self.matrix.shape[0]:
+            rows = min(self.matrix.shape[0] * 2, self.max_entries)
+            grown = np.empty((rows, self.matrix.shape[1]), dtype=np.float32)
+            grown[:n] = self.matrix[:n]
+            self.matrix = grown
+        self.matrix[n] = vector
+        self.rows[query] = n
+        self.queries.append(query)
+
+    def remove(self, query: str) -> None:
+        """정확 일치 저장소에서 빠진(만료·제거된) 쿼리를 뺀다. 오래된 순서는 유지한다."""
+        row = self.rows.pop(query, None)
+        if row is None:
+            return
+        n = len(self.queries)
+        self.matrix[row:n - 1] = self.matrix[row + 1:n]
+        del self.queries[row]
+        for i in range(row, n - 1):
+            self.rows[self.queries[i]] = i
+
+    def nearest(self, vector: np.ndarray) -> Tuple[Optional[str], float]:
+        n = len(self.queries)
+        if n == 0:
+            return None, 0.0
+        scores = self.matrix[:n] @ vector
+        best = int(np.argmax(scores))
+        return self.queries[best], float(scores[best])
+
+
+class SemanticQueryCache:
+    """:class:`QueryCache` 앞에 임베딩 유사도 조회를 얹은 2단 캐시.
+
+    정확히 같은 쿼리는 기존 sha256 키로 바로 찾고, 미스면 쿼리를 임베딩해
+    같은 ``doc_id``의 과거 쿼리들과 코사인 유사도를 비교한다. 임베딩은
+    ``normalize_embeddings=True``로 만들어지므로 내적이 곧 코사인 유사도다.
+    인덱스는 메모리에만 두며, 재시작 후에는 새로 저장되는 결과부터 채워진다.
+    """
+
+    def __init__(
+        self,
+        exact: Optional[QueryCache] = None,
+        embeddings: Optional[Embeddings] = None,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries_per_doc: int = SEMANTIC_CACHE_MAX_ENTRIES,
+    ) -> None:
+        self.exact: QueryCache = exact or QueryCache()
+        self.threshold = threshold
+        self.max_entries_per_doc = max_entries_per_doc
+        self._embeddings = embeddings
+        self._indexes: Dict[str, _SemanticIndex] = {}
+        self._lock = threading.Lock()
+
+        self.exact_hits: int = 0
+        self.semantic_hits: int = 0
+        self.misses: int = 0
+
+    def _embed(self, query: str) -> np.ndarray:
+        if self._embeddings is None:
+            from llama_modular_rag.embeddings import get_embedding_model
+
+            self._embeddings = get_embedding_model()
+        return np.asarray(self._embeddings.embed_query(query), dtype=np.float32)
+
+    def get_cached_result(
+        self,
+        doc_id: str,
+        query: str,
+        *,
+        semantic: bool = True,
+        vector: Optional[np.ndarray] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """정확 일치 → (``semantic``이면) 유사 쿼리 순으로 조회한다.
+
+        ``vector``는 미리 계산한 쿼리 임베딩이다 (배치 경로가 여러 쿼리를 한 번에 임베딩할 때).
+        """
+        result = self.exact.get_cached_result(doc_id, query)
+        if result is not None:
+            self.exact_hits += 1
+            return result
+        if not semantic or self.threshold > 1.0:
+            self.misses += 1
+            return None
+
+        with self._lock:
+            index = self._indexes.get(doc_id)
+            if index is None or not index.queries:
+                self.misses += 1
+                return None
+        if vector is None:
+            vector = self._embed(query)
+        while True:
+            with self._lock:
+                matched, score = index.nearest(vector)
+            if matched is None or score < self.threshold:
+                break
+            # 정확 일치 단계의 미스는 위에서 이미 셌다 — 이웃 조회는 저장소 카운터에 넣지 않는다.
+            result = self.exact.get_cached_result(doc_id, matched, count=False)
+            if result is not None:
+                self.semantic_hits += 1
+                return result
+            # 정확 일치 저장소가 TTL·용량 한도·compact로 지운 항목 — 인덱스에서도 빼고 다음 이웃을 본다.
+            with self._lock:
+                index.remove(matched)
+        self.misses += 1
+        return None
+
+    def cache_result(
+        self,
+        doc_id: str,
+        query: str,
+        result: Dict[str, Any],
+        vector: Optional[np.ndarray] = None,
+    ) -> None:
+        self.exact.cache_result(doc_id, query, result)
+        if vector is None:
+            vector = self._embed(query)
+        with self._lock:
+            index = self._indexes.get(doc_id)
+            if index is None:
+                index = _SemanticIndex(vector.shape[0], self.max_entries_per_doc)
+                self._indexes[doc_id] = index
+            index.add(query, vector)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_ratio": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+            "indexed_queries": sum(len(i.queries) for i in self._indexes.values()),
+            "store": self.exact.stats(),
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="쿼리 캐시 관리")
+    parser.add_argument("command", choices=["stats", "compact"])
+    args = parser.parse_args()
+
+    cache = QueryCache()
+    report = cache.compact() if args.command == "compact" else cache.stats()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,79 @@
+"""청크 본문 사이드카: 인덱스 번호로 청크를 꺼내는 append-only 레코드 파일.
+
+``chunks.bin``에는 청크마다 JSON 한 줄(``page_content`` + ``metadata``)을 이어 붙이고,
+``chunks.offsets.npy``에는 레코드 경계(int64, n + 1개)를 둔다. 둘 다 mmap으로 열어
+필요한 레코드만 디코드한다. FAISS 저장소와 BM25 희소 인덱스가 같은 형식을 쓴다.
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+TEXTS_FILE = "chunks.bin"
+OFFSETS_FILE = "chunks.offsets.npy"
+
+
+def append_chunks(
+    directory: str,
+    texts: Sequence[str],
+    metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+) -> None:
+    os.makedirs(directory, exist_ok=True)
+    metadatas = metadatas or [None] * len(texts)
+    with open(os.path.join(directory, TEXTS_FILE), "ab") as blob:
+        for text, metadata in zip(texts, metadatas):
+            # JSON 문자열 안의 줄바꿈은 이스케이프되므로 레코드는 항상 한 줄이다.
+            blob.write(
+                json.dumps(
+                    {"page_content": text, "metadata": metadata or {}}, ensure_ascii=False
+                ).encode("utf-8")
+            )
+            blob.write(b"\n")
+
+
+def finalize_chunks(directory: str, count: int) -> None:
+    """레코드 경계를 계산해 오프셋 파일을 쓴다. 레코드가 ``count``개가 아니면 ``ValueError``."""
+    texts_path = os.path.join(directory, TEXTS_FILE)
+    os.makedirs(directory, exist_ok=True)
+    open(texts_path, "ab").close()
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    if os.path.getsize(texts_path):
+        blob = np.memmap(texts_path, dtype=np.uint8, mode="r")
+        ends = np.flatnonzero(blob == ord("\n")) + 1
+        del blob
+        if len(ends) != count:
+            raise ValueError(f"청크 레코드 수 불일치: {len(ends)} != {count}")
+        offsets[1:] = ends
+    elif count:
+        raise ValueError(f"청크 레코드 수 불일치: 0 != {count}")
+    np.save(os.path.join(directory, OFFSETS_FILE), offsets)
+
+
+class ChunkReader:
+    """``finalize_chunks``를 마친 사이드카를 mmap으로 연다."""
+
+    def __init__(self, directory: str) -> None:
+        self._offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+        texts_path = os.path.join(directory, TEXTS_FILE)
+        # 길이 0 파일은 mmap할 수 없다.
+        self._blob = (
+            np.memmap(texts_path, dtype=np.uint8, mode="r")
+            if os.path.getsize(texts_path)
+            else np.zeros(0, dtype=np.uint8)
+        )
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def document(self, i: int) -> Document:
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        payload = json.loads(bytes(self._blob[start:end]).decode("utf-8"))
+        return Document(page_content=payload["page_content"], metadata=payload["metadata"])
+
+    def documents(self) -> Iterator[Document]:
+        for i in range(len(self)):
+            yield self.document(i)
@@ -0,0 +1,103 @@
+"""LLM 토크나이저 기준 청크 분할.
+
+컨텍스트 예산(``CONTEXT_MAX_TOKENS``)은 Llama 토큰 수로 정해지므로 청크도 같은 토큰으로
+자른다. 페이지를 한 번만 토큰화하고(fast 토크나이저의 offset 사용) ``chunk_tokens``개
+창 안에서 가장 자연스러운 경계(문단 > 문장 끝 > 줄바꿈 > 단어 사이)를 찾아 자른다. 청크마다
+토큰 수를 ``metadata["token_count"]``에 남기므로 검색 후 컨텍스트를 조립할 때 다시
+토큰화할 필요가 없다.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, List, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from llama_modular_rag.config import CHUNK_OVERLAP_TOKENS, CHUNK_TOKENS
+
+if TYPE_CHECKING:
+    from transformers import PreTrainedTokenizerBase
+
+TOKEN_COUNT_KEY = "token_count"
+
+_SENTENCE_END = ".?!。"
+
+
+class TokenChunker:
+    """``RecursiveCharacterTextSplitter``의 ``split_documents``를 토큰 단위로 대신한다."""
+
+    def __init__(
+        self,
+        tokenizer: PreTrainedTokenizerBase,
+        chunk_tokens: int = CHUNK_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    ) -> None:
+        if not tokenizer.is_fast:
+            raise ValueError("토큰 단위 분할에는 offset을 주는 fast 토크나이저가 필요합니다.")
+        if not 0 <= overlap_tokens < chunk_tokens:
+            raise ValueError(f"overlap_tokens는 0 이상 {chunk_tokens} 미만이어야 합니다.")
+        self.tokenizer = tokenizer
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+
+    @staticmethod
+    def _break_rank(text: str, offsets: Sequence[Tuple[int, int]], end: int) -> int:
+        """토큰 ``end`` 앞에서 자를 때의 경계 품질. 0이면 글자 중간이라 자를 수 없다."""
+        prev_stop, next_start = offsets[end - 1][1], offsets[end][0]
+        if next_start < prev_stop or prev_stop == 0:
+            return 0  # 한 글자가 바이트 토큰 여럿으로 나뉜 자리
+        gap = text[prev_stop - 1:next_start + 1]
+        if "\n\n" in gap:
+            return 5
+        if text[prev_stop - 1] in _SENTENCE_END:
+            return 4
+        if "\n" in gap:
+            return 3
+        if gap[-1:].isspace() or gap[:1].isspace() or next_start > prev_stop:
+            return 2
+        return 1
+
+    def split_text(self, text: str) -> List[Tuple[str, int]]:
+        """``(청크 본문, 토큰 수)`` 목록."""
+        encoded = self.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True
+        )
+        offsets: List[Tuple[int, int]] = encoded["offset_mapping"]
+        n = len(offsets)
+        chunks: List[Tuple[str, int]] = []
+        start = 0
+        while start < n:
+            end = min(start + self.chunk_tokens, n)
+            if end < n:
+                # 창의 뒤쪽 절반에서 가장 좋은 경계, 같은 품질이면 뒤쪽을 고른다.
+                best, best_rank = end, 0
+                for cut in range(end, start + self.chunk_tokens // 2, -1):
+                    rank = self._break_rank(text, offsets, cut)
+                    if rank > best_rank:
+                        best, best_rank = cut, rank
+                        if rank == 5:
+                            break
+                end = best
+            piece = text[offsets[start][0]:offsets[end - 1][1]].strip()
+            if piece:
+                # 앞뒤 공백을 떼면 토큰 경계가 조금 달라지므로 잘린 본문을 다시 센다.
+                count = len(self.tokenizer.encode(piece, add_special_tokens=False))
+                chunks.append((piece, count))
+            if end >= n:
+                break
+            # 겹침 구간도 단어 경계에서 시작한다.
+            nxt = max(end - self.overlap_tokens, start + 1)
+            while nxt < end and self._break_rank(text, offsets, nxt) < 2:
+                nxt += 1
+            start = nxt
+        return chunks
+
+    def split_documents(self, documents: Sequence[Document]) -> List[Document]:
+        out: List[Document] = []
+        for doc in documents:
+            for piece, count in self.split_text(doc.page_content):
+                out.append(
+                    Document(
+                        page_content=piece, metadata={**doc.metadata, TOKEN_COUNT_KEY: count}
+                    )
+                )
+        return out
@@ -4,33 +4,159 @@
 torch나 환경변수에 손대지 않으므로 FastAPI lifespan 등에서 명시적으로 호출하라.
 """
 import os
+import sys
 
 BASE_DIR: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-LLAMA_MODEL_PATH: str = os.path.join(
-    BASE_DIR, "models/torchtorchkimtorch-Llama-3.2-Korean-GGACHI-1B-Instruct-v1"
+# 모델·데이터 경로는 환경 변수로 바꿀 수 있다 (벤치마크 스위트가 작은 로컬 모델을 가리킬 때 등).
+LLAMA_MODEL_PATH: str = os.environ.get(
+    "RAG_LLAMA_MODEL_PATH",
+    os.path.join(BASE_DIR, "models/torchtorchkimtorch-Llama-3.2-Korean-GGACHI-1B-Instruct-v1"),
 )
-EMBEDDING_MODEL_NAME: str = os.path.join(BASE_DIR, "models/ko-sroberta-multitask")
+EMBEDDING_MODEL_NAME: str = os.environ.get(
+    "RAG_EMBEDDING_MODEL", os.path.join(BASE_DIR, "models/ko-sroberta-multitask")
+)
+# 임베딩 백엔드: torch (sentence-transformers) / onnx / onnx-int8 (ONNX Runtime).
+EMBEDDING_BACKEND: str = os.environ.get("RAG_EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_DIR: str = os.environ.get(
+    "RAG_EMBEDDING_ONNX_DIR", os.path.join(BASE_DIR, "models/ko-sroberta-multitask-onnx")
+)
+EMBEDDING_BATCH_SIZE: int = 8
+
+# 추론 정밀도: fp32 / bf16 / int8 (Linear 동적 양자화).
+LLM_PRECISION: str = os.environ.get("RAG_LLM_PRECISION", "fp32").lower()
 
 TEMPERATURE: float = 0.1
 TOP_P: float = 0.95
 MAX_NEW_TOKENS: int = 128
+REPETITION_PENALTY: float = 1.1
+
+# 동시 요청을 하나의 decode 루프로 묶는 최대 배치 크기 (engine.GenerationEngine).
+GENERATION_MAX_BATCH: int = int(os.environ.get("RAG_MAX_BATCH", "8"))
+# 요청 하나의 생성 deadline(초, 대기열 대기 포함). 0이면 제한 없음.
+GENERATION_TIMEOUT_S: float = float(os.environ.get("RAG_GENERATION_TIMEOUT", "120"))
+
+# SSE 토큰 프레임 합치기: 첫 청크 뒤 STREAM_COALESCE_MS 동안 더 모아 한 프레임으로 보낸다. 이미
+# STREAM_COALESCE_CHARS자 이상 받았으면 기다리지 않는다 (0이면 그때까지 쌓인 청크만 합친다).
+STREAM_COALESCE_MS: float = float(os.environ.get("RAG_STREAM_COALESCE_MS", "0"))
+STREAM_COALESCE_CHARS: int = int(os.environ.get("RAG_STREAM_COALESCE_CHARS", "0"))
+# SSE 스트림이 클라이언트 연결 종료를 확인하는 최소 간격(ms). 0이면 프레임마다 확인.
+STREAM_DISCONNECT_CHECK_MS: float = float(os.environ.get("RAG_STREAM_DISCONNECT_CHECK_MS", "250"))
+
+# prompt-lookup 추측 디코딩: 프롬프트·생성문에서 직전 n-gram(SPEC_NGRAM개부터 1개까지)이
+# 나온 자리의 뒷부분을 최대 SPEC_DRAFT_TOKENS개 초안으로 붙여 한 forward로 검증한다. 0이면 끔.
+SPEC_DRAFT_TOKENS: int = int(os.environ.get("RAG_SPEC_DRAFT", "0"))
+SPEC_NGRAM: int = int(os.environ.get("RAG_SPEC_NGRAM", "3"))
+
+# 추론 워커 프로세스 수. 0이면 API 프로세스 안의 엔진 하나(기본). N이면 코어를 N묶음으로 나눠
+# 고정한 프로세스가 각자 엔진을 돌리고, 가중치는 mmap한 safetensors를 공유한다 (worker_pool).
+INFERENCE_WORKERS: int = int(os.environ.get("RAG_INFERENCE_WORKERS", "0"))
+# 워커당 torch 스레드 수. 0이면 워커에 배정된 코어 수.
+WORKER_THREADS: int = int(os.environ.get("RAG_WORKER_THREADS", "0"))
+# 죽은 워커 재시작 한도: 한 워커가 WINDOW초 안에 이만큼 재시작되면 더 띄우지 않고 failed로 둔다
+# (시작하자마자 죽는 워커가 무한히 다시 뜨지 않도록).
+WORKER_MAX_RESTARTS: int = int(os.environ.get("RAG_WORKER_MAX_RESTARTS", "3"))
+WORKER_RESTART_WINDOW_S: float = float(os.environ.get("RAG_WORKER_RESTART_WINDOW", "60"))
+
+# 프롬프트 prefix KV 캐시 메모리 예산(MB, 0이면 비활성)과 해시 블록 크기(토큰).
+PREFIX_CACHE_MB: int = int(os.environ.get("RAG_PREFIX_CACHE_MB", "256"))
+PREFIX_CACHE_BLOCK: int = 16
 
 RETRIEVAL_TOP_K: int = 2
 CONTEXT_MAX_TOKENS: int = 512
 
-CHUNK_SIZE: int = 256
-CHUNK_OVERLAP: int = 30
+# 검색 방식: hybrid (dense + BM25를 RRF로 결합) / dense.
+# hybrid에서 각 검색기가 내놓는 후보 수와 RRF 상수 (score = Σ 1 / (RRF_K + rank)).
+RETRIEVAL_MODE: str = os.environ.get("RAG_RETRIEVAL_MODE", "hybrid").lower()
+HYBRID_CANDIDATES: int = int(os.environ.get("RAG_HYBRID_CANDIDATES", "20"))
+RRF_K: int = 60
+
+# cross-encoder 재순위: 켜면 RERANK_CANDIDATES개를 검색해 (쿼리, 청크) 쌍을 한 번의 배치로
+# 채점하고 상위 RERANK_TOP_N개만 컨텍스트 후보로 남긴다. 점수는 (쿼리, 청크 해시)별로 캐시.
+RERANK_ENABLED: bool = os.environ.get("RAG_RERANK", "0").lower() in ("1", "true", "yes", "on")
+RERANKER_MODEL_NAME: str = os.environ.get(
+    "RAG_RERANKER_MODEL", os.path.join(BASE_DIR, "models/mmarco-mMiniLMv2-L12-H384-v1")
+)
+RERANK_CANDIDATES: int = int(os.environ.get("RAG_RERANK_CANDIDATES", "12"))
+RERANK_TOP_N: int = int(os.environ.get("RAG_RERANK_TOP_N", str(RETRIEVAL_TOP_K)))
+RERANK_MAX_LENGTH: int = 256
+RERANK_CACHE_ENTRIES: int = 8192
+
+# BM25 희소 인덱스: 단어를 자르는 문자 n-gram 길이와 BM25 파라미터.
+SPARSE_NGRAM: int = 2
+BM25_K1: float = 1.2
+BM25_B: float = 0.75
 
-CACHE_DIR: str = os.path.join(BASE_DIR, "cache")
-VECTOR_DB_PATH: str = os.path.join(BASE_DIR, "vector_db")
+# 청크 크기와 겹침 (Llama 토큰 단위). 청크별 토큰 수는 metadata["token_count"]에 저장된다.
+CHUNK_TOKENS: int = 128
+CHUNK_OVERLAP_TOKENS: int = 16
+
+# PDF 인제스트 파이프라인: 파싱 프로세스 수, 작업당 페이지 수, 임베딩 배치, 미저장 청크 상한.
+INGEST_WORKERS: int = int(os.environ.get("RAG_INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+INGEST_PAGES_PER_TASK: int = 16
+INGEST_EMBED_BATCH: int = 256
+INGEST_MAX_INFLIGHT_CHUNKS: int = int(os.environ.get("RAG_INGEST_MAX_INFLIGHT", "2048"))
+
+CACHE_DIR: str = os.environ.get("RAG_CACHE_DIR", os.path.join(BASE_DIR, "cache"))
+# 워커가 mmap할 가중치 변환본(저장 dtype과 정밀도가 다를 때) 위치.
+WEIGHTS_CACHE_DIR: str = os.environ.get("RAG_WEIGHTS_CACHE_DIR", os.path.join(CACHE_DIR, "weights"))
+# 청크 임베딩 캐시: hash(임베딩 모델 id, 청크 본문) → 벡터. 개정판 PDF나 공통 문구를 나누는 문서는
+# 처음 보는 청크만 임베딩한다. RAG_EMBEDDING_CACHE=0이면 끈다.
+EMBEDDING_CACHE_ENABLED: bool = os.environ.get("RAG_EMBEDDING_CACHE", "1") != "0"
+EMBEDDING_CACHE_DIR: str = os.environ.get(
+    "RAG_EMBEDDING_CACHE_DIR", os.path.join(CACHE_DIR, "embeddings")
+)
+
+# 쿼리 캐시: 메모리 LRU 항목 수, 디스크(SQLite) 한도, TTL(초, 0이면 만료 없음).
+QUERY_CACHE_MEMORY_ENTRIES: int = 256
+QUERY_CACHE_MAX_ENTRIES: int = int(os.environ.get("RAG_CACHE_MAX_ENTRIES", "50000"))
+QUERY_CACHE_MAX_MB: int = int(os.environ.get("RAG_CACHE_MAX_MB", "256"))
+QUERY_CACHE_TTL_SECONDS: float = float(os.environ.get("RAG_CACHE_TTL_SECONDS", "0"))
+
+# 유사 쿼리 캐시: 코사인 유사도가 이 값 이상이면 과거 답변을 재사용 (1.0 초과면 비활성).
+SEMANTIC_CACHE_THRESHOLD: float = float(os.environ.get("RAG_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES: int = 10_000
+VECTOR_DB_PATH: str = os.environ.get("RAG_VECTOR_DB_PATH", os.path.join(BASE_DIR, "vector_db"))
+
+# 벡터 저장소 백엔드: chroma / faiss. FAISS 인덱스 종류: flat (정확) / ivf / hnsw (근사).
+VECTOR_BACKEND: str = os.environ.get("RAG_VECTOR_BACKEND", "chroma").lower()
+FAISS_INDEX_TYPE: str = os.environ.get("RAG_FAISS_INDEX", "flat").lower()
+FAISS_IVF_NPROBE: int = int(os.environ.get("RAG_FAISS_NPROBE", "16"))
+FAISS_HNSW_M: int = 32
+FAISS_HNSW_EF_SEARCH: int = int(os.environ.get("RAG_FAISS_EF_SEARCH", "64"))
+
+# 메모리에 올려 두는 문서(벡터 저장소 + 컴파일된 그래프) 수와 대략적인 메모리 한도(MB),
+# 그리고 한 쿼리가 함께 검색할 수 있는 최대 문서 수.
+DOC_POOL_MAX_DOCS: int = int(os.environ.get("RAG_DOC_POOL_SIZE", "4"))
+DOC_POOL_MAX_MB: int = int(os.environ.get("RAG_DOC_POOL_MAX_MB", "2048"))
+QUERY_MAX_DOCS: int = 8
+
+# 배치 쿼리(/api/query/batch): 요청당 최대 쿼리 수와 엔진에 동시에 넣어 두는 생성 수 상한
+# (대화형 요청이 배치 뒤에서 오래 기다리지 않도록).
+BATCH_MAX_QUERIES: int = int(os.environ.get("RAG_BATCH_MAX_QUERIES", "1000"))
+BATCH_MAX_INFLIGHT: int = int(os.environ.get("RAG_BATCH_MAX_INFLIGHT", str(2 * GENERATION_MAX_BATCH)))
+
+# 요청별 단계 타이밍 추적: 샘플링 비율(0이면 끔, 1이면 전부)과 JSONL 로그 경로(비우면 기록 안 함).
+# 요청 본문의 ``trace``로 개별 요청을 강제로 켜거나 끌 수 있다.
+TRACE_SAMPLE_RATE: float = float(os.environ.get("RAG_TRACE_SAMPLE", "0"))
+TRACE_LOG_PATH: str = os.environ.get("RAG_TRACE_LOG", "")
+
+# 부팅 워밍업(startup.warmup): 앱이 뜨자마자 백그라운드에서 모델을 올리고 짧게 한 번 돌린다.
+# 0이면 끄고, 모델은 첫 요청이 올린다.
+WARMUP_ENABLED: bool = os.environ.get("RAG_WARMUP", "1") != "0"
 
 _RUNTIME_INITIALIZED = False
+# init_runtime이 정한 torch 스레드 수. torch가 아직 import되지 않았으면 apply_torch_threads()가 적용한다.
+_TORCH_THREADS: int | None = None
 
 
 def init_runtime(num_threads: int | None = None) -> None:
-    """CUDA 비활성화·CPU 스레드 수·토크나이저 병렬화를 한 번만 적용한다."""
-    global _RUNTIME_INITIALIZED
+    """CUDA 비활성화·CPU 스레드 수·토크나이저 병렬화를 한 번만 적용한다.
+
+    torch는 여기서 import하지 않는다 (import만 2초 가까이 걸린다). 이미 import돼 있으면 스레드 수를
+    바로 적용하고, 아니면 모델 로더가 torch를 쓰기 직전에 :func:`apply_torch_threads`로 적용한다.
+    """
+    global _RUNTIME_INITIALIZED, _TORCH_THREADS
     if _RUNTIME_INITIALIZED:
         return
 
@@ -50,7 +176,18 @@ def init_runtime(num_threads: int | None = None) -> None:
         os.environ.setdefault(var, str(threads))
     os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
 
+    _TORCH_THREADS = threads
+    _RUNTIME_INITIALIZED = True
+    if "torch" in sys.modules:
+        apply_torch_threads()
+
+
+def apply_torch_threads() -> None:
+    """:func:`init_runtime`의 스레드 수를 torch에 적용한다 (한 번만, 이후 호출은 무시)."""
+    global _TORCH_THREADS
+    if _TORCH_THREADS is None:
+        return
     import torch  # noqa: WPS433  부수효과 격리를 위한 지연 import
 
-    torch.set_num_threads(threads)
-    _RUNTIME_INITIALIZED = True
+    torch.set_num_threads(_TORCH_THREADS)
+    _TORCH_THREADS = None
@@ -1,18 +1,110 @@
+"""PDF → 벡터 저장소(Chroma 또는 FAISS) 인제스트와 저장소 디렉터리 관리.
+
+페이지 파싱(프로세스 풀) → 페이지 단위 토큰 분할(메인 스레드) → 배치 임베딩·저장(writer 스레드)
+세 단계가 겹쳐 돈다. 단계 사이에는 크기 제한이 있는 큐만 두므로 PDF 전체를 메모리에
+올리지 않으며, 진행 상황은 :class:`IngestStats`로 보고한다.
+
+문서 하나의 저장소는 ``VECTOR_DB_PATH/<doc_id>/``에 있다. Chroma 파일은 그 바로 아래,
+FAISS 저장소는 ``faiss/``, BM25 희소 인덱스는 ``sparse/`` 하위 디렉터리에 두므로 두 백엔드가
+한 문서에 공존할 수 있다.
+"""
 import hashlib
+import json
 import logging
+import multiprocessing
 import os
-from typing import List, Tuple
+import queue
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
 
-from llama_modular_rag.config import CHUNK_OVERLAP, CHUNK_SIZE, VECTOR_DB_PATH
+from llama_modular_rag.config import (
+    FAISS_INDEX_TYPE,
+    INGEST_EMBED_BATCH,
+    INGEST_MAX_INFLIGHT_CHUNKS,
+    INGEST_PAGES_PER_TASK,
+    INGEST_WORKERS,
+    VECTOR_BACKEND,
+    VECTOR_DB_PATH,
+)
+from llama_modular_rag.chunking import TokenChunker
+from llama_modular_rag.embedding_cache import CachedEmbeddings, cached_embedding_model
 from llama_modular_rag.embeddings import get_embedding_model
+from llama_modular_rag.llm_setup import get_llama_tokenizer
+from llama_modular_rag.faiss_store import FaissVectorStore, is_faiss_store
+from llama_modular_rag.pdf_parsing import page_count, parse_pages, release
+from llama_modular_rag.sparse_index import SparseIndex, SparseIndexBuilder
 
 logger = logging.getLogger(__name__)
 
+# 인제스트 도중 중단된 저장소 표시. 남아 있으면 다음 로드 때 다시 만든다.
+_INCOMPLETE_MARKER = ".ingesting"
+# 저장소 디렉터리에 함께 두는 문서 메타데이터 (원본 파일 이름 등).
+_META_FILE = "doc.json"
+_CHROMA_DB_FILE = "chroma.sqlite3"
+_FAISS_SUBDIR = "faiss"
+_SPARSE_SUBDIR = "sparse"
+_STOP = object()
+# 희소 인덱스를 저장소에서 다시 만드는 작업이 같은 디렉터리에 겹치지 않게 한다.
+_sparse_build_lock = threading.Lock()
+
+VECTOR_BACKENDS = ("chroma", "faiss")
+
+ProgressCallback = Callable[["IngestStats"], None]
+
+
+@dataclass
+class IngestStats:
+    pages_total: int = 0
+    pages_parsed: int = 0
+    chunks_split: int = 0
+    chunks_embedded: int = 0
+    # 청크 임베딩 캐시: 저장한 청크 중 캐시에서 가져온 수, 새로 임베딩하는 데 든 시간,
+    # 재사용한 청크를 새로 임베딩했다면 들었을 시간(추정).
+    chunks_reused: int = 0
+    embed_s: float = 0.0
+    embed_saved_s: float = 0.0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+
+    @property
+    def elapsed_s(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def pages_per_s(self) -> float:
+        return self.pages_parsed / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    @property
+    def chunks_per_s(self) -> float:
+        return self.chunks_embedded / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    @property
+    def reuse_ratio(self) -> float:
+        return self.chunks_reused / self.chunks_embedded if self.chunks_embedded else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "pages_total": self.pages_total,
+            "pages_parsed": self.pages_parsed,
+            "chunks_split": self.chunks_split,
+            "chunks_embedded": self.chunks_embedded,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "pages_per_s": round(self.pages_per_s, 2),
+            "chunks_per_s": round(self.chunks_per_s, 2),
+            "chunks_reused": self.chunks_reused,
+            "reuse_ratio": round(self.reuse_ratio, 4),
+            "embed_s": round(self.embed_s, 3),
+            "embed_saved_s": round(self.embed_saved_s, 3),
+        }
+
 
 def compute_doc_id(file_path: str) -> str:
     """PDF 내용 기반 안정적인 문서 ID."""
@@ -28,38 +120,411 @@ def _collection_name(doc_id: str) -> str:
     return f"doc_{doc_id[:32]}"
 
 
-def create_vectorstore_from_pdf(pdf_path: str) -> Tuple[Chroma, str]:
-    """PDF 파일을 로드하고 (벡터 저장소, doc_id)를 반환한다."""
-    doc_id = compute_doc_id(pdf_path)
-    persist_dir = os.path.join(VECTOR_DB_PATH, doc_id)
-    embeddings = get_embedding_model()
-    collection = _collection_name(doc_id)
+def _persist_dir(doc_id: str) -> str:
+    return os.path.join(VECTOR_DB_PATH, doc_id)
 
-    if os.path.exists(persist_dir):
-        logger.info("기존 벡터 저장소 로드: %s", persist_dir)
-        vectorstore = Chroma(
-            persist_directory=persist_dir,
-            embedding_function=embeddings,
-            collection_name=collection,
+
+def _store_dir(doc_id: str, backend: str) -> str:
+    persist_dir = _persist_dir(doc_id)
+    return os.path.join(persist_dir, _FAISS_SUBDIR) if backend == "faiss" else persist_dir
+
+
+def _backend_complete(doc_id: str, backend: str) -> bool:
+    store_dir = _store_dir(doc_id, backend)
+    if os.path.exists(os.path.join(store_dir, _INCOMPLETE_MARKER)):
+        return False
+    if backend == "faiss":
+        return is_faiss_store(store_dir)
+    return os.path.exists(os.path.join(store_dir, _CHROMA_DB_FILE))
+
+
+def stored_backends(doc_id: str) -> List[str]:
+    """이 문서에 대해 인제스트가 끝까지 완료된 백엔드 목록."""
+    return [backend for backend in VECTOR_BACKENDS if _backend_complete(doc_id, backend)]
+
+
+def store_backend(vectorstore: VectorStore) -> str:
+    return "faiss" if isinstance(vectorstore, FaissVectorStore) else "chroma"
+
+
+def vectorstore_exists(doc_id: str, backend: Optional[str] = None) -> bool:
+    """인제스트가 끝까지 완료된 저장소가 있는지 (``backend``가 없으면 어느 백엔드든)."""
+    if backend is not None:
+        return _backend_complete(doc_id, backend)
+    return bool(stored_backends(doc_id))
+
+
+def list_doc_ids() -> List[str]:
+    if not os.path.isdir(VECTOR_DB_PATH):
+        return []
+    return sorted(d for d in os.listdir(VECTOR_DB_PATH) if vectorstore_exists(d))
+
+
+def read_doc_meta(doc_id: str) -> Dict[str, Any]:
+    """인제스트 시 기록한 메타데이터. 이전 버전 저장소에는 없으므로 빈 dict일 수 있다."""
+    path = os.path.join(_persist_dir(doc_id), _META_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def vectorstore_nbytes(doc_id: str, backend: str = "chroma") -> int:
+    """백엔드 저장소 파일 크기. 로드된 저장소의 메모리 사용량 근사치로 쓴다."""
+    store_dir = _store_dir(doc_id, backend)
+    total = 0
+    for root, dirs, files in os.walk(store_dir):
+        if root == store_dir:
+            # Chroma 디렉터리 아래의 FAISS 저장소·희소 인덱스는 세지 않는다.
+            dirs[:] = [d for d in dirs if d not in (_FAISS_SUBDIR, _SPARSE_SUBDIR)]
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def _open_backend(doc_id: str, backend: str) -> VectorStore:
+    if backend == "faiss":
+        return FaissVectorStore.load(_store_dir(doc_id, backend), get_embedding_model())
+    from langchain_community.vectorstores import Chroma  # chromadb는 Chroma 저장소를 열 때 import
+
+    return Chroma(
+        persist_directory=_store_dir(doc_id, backend),
+        embedding_function=get_embedding_model(),
+        collection_name=_collection_name(doc_id),
+    )
+
+
+def open_vectorstore(doc_id: str, backend: str = VECTOR_BACKEND) -> VectorStore:
+    """완료된 저장소를 연다. ``backend``가 없으면 있는 쪽을 연다. 아무것도 없으면 ``KeyError``."""
+    available = stored_backends(doc_id)
+    if not available:
+        raise KeyError(doc_id)
+    chosen = backend if backend in available else available[0]
+    if chosen != backend:
+        logger.info(
+            "%s 저장소가 없어 %s 저장소를 연다: %s%s",
+            backend,
+            chosen,
+            doc_id[:12],
+            " (이전: python -m llama_modular_rag.faiss_store)" if backend == "faiss" else "",
         )
-        return vectorstore, doc_id
+    return _open_backend(doc_id, chosen)
+
+
+def close_vectorstore(vectorstore: VectorStore) -> None:
+    """저장소가 잡고 있는 자원을 내린다.
 
-    logger.info("PDF 로딩 및 벡터 저장소 생성: %s", pdf_path)
-    os.makedirs(persist_dir, exist_ok=True)
+    FAISS는 mmap을 놓기만 하면 된다. chromadb는 persist 경로별 시스템(HNSW 인덱스,
+    sqlite 연결)을 프로세스 전역에 캐시하므로 객체 참조를 버리는 것만으로는 메모리가
+    돌아오지 않는다. 내부 API라 실패해도 조용히 넘어간다.
+    """
+    if isinstance(vectorstore, FaissVectorStore):
+        vectorstore.close()
+        return
+    try:
+        from chromadb.api.shared_system_client import SharedSystemClient
 
-    loader = PyPDFLoader(pdf_path)
-    documents: List[Document] = loader.load()
+        identifier = vectorstore._client._identifier
+        system = SharedSystemClient._identifier_to_system.pop(identifier, None)
+        if system is not None:
+            system.stop()
+    except Exception:  # noqa: BLE001
+        logger.debug("Chroma 시스템 해제 실패", exc_info=True)
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
+
+def _sparse_dir(doc_id: str) -> str:
+    return os.path.join(_persist_dir(doc_id), _SPARSE_SUBDIR)
+
+
+def _iter_stored_chunks(
+    vectorstore: VectorStore, batch_size: int = 4096
+) -> Iterator[Tuple[List[str], List[Dict[str, Any]]]]:
+    if isinstance(vectorstore, FaissVectorStore):
+        batch: List[Document] = []
+        for doc in vectorstore.documents():
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield [d.page_content for d in batch], [d.metadata for d in batch]
+                batch = []
+        if batch:
+            yield [d.page_content for d in batch], [d.metadata for d in batch]
+        return
+    collection = vectorstore._collection
+    for offset in range(0, collection.count(), batch_size):
+        rows = collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+        yield rows["documents"], [m or {} for m in rows["metadatas"]]
+
+
+def open_sparse_index(doc_id: str, vectorstore: VectorStore) -> SparseIndex:
+    """문서의 BM25 인덱스를 연다. 이전 버전 저장소처럼 없으면 저장된 청크로 만든다."""
+    directory = _sparse_dir(doc_id)
+    with _sparse_build_lock:
+        if SparseIndex.exists(directory):
+            return SparseIndex(directory)
+        logger.info("희소 인덱스가 없어 저장된 청크로 만든다: %s", doc_id[:12])
+        shutil.rmtree(directory, ignore_errors=True)
+        builder = SparseIndexBuilder(directory)
+        for texts, metadatas in _iter_stored_chunks(vectorstore):
+            builder.add(texts, metadatas)
+        return builder.save()
+
+
+def migrate_to_faiss(
+    doc_id: str,
+    index_type: str = FAISS_INDEX_TYPE,
+    force: bool = False,
+    batch_size: int = 4096,
+) -> Dict[str, Any]:
+    """문서의 Chroma 저장소에 있는 임베딩을 그대로 옮겨 FAISS 저장소를 만든다 (재임베딩 없음).
+
+    Chroma 저장소는 지우지 않는다. 이미 FAISS 저장소가 있으면 ``force``일 때만 다시 만든다.
+    """
+    if not _backend_complete(doc_id, "chroma"):
+        raise KeyError(doc_id)
+    store_dir = _store_dir(doc_id, "faiss")
+    if _backend_complete(doc_id, "faiss") and not force:
+        return {"doc_id": doc_id, "skipped": True}
+
+    started = time.perf_counter()
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.makedirs(store_dir)
+    marker = os.path.join(store_dir, _INCOMPLETE_MARKER)
+    open(marker, "w").close()
+
+    from langchain_community.vectorstores import Chroma
+
+    # 임베딩은 저장된 값을 쓰므로 임베딩 모델을 올리지 않는다.
+    chroma = Chroma(
+        persist_directory=_store_dir(doc_id, "chroma"),
+        collection_name=_collection_name(doc_id),
     )
-    splits: List[Document] = splitter.split_documents(documents)
+    target = FaissVectorStore(store_dir, None, index_type=index_type)
+    try:
+        collection = chroma._collection
+        total = collection.count()
+        for offset in range(0, total, batch_size):
+            rows = collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=batch_size,
+                offset=offset,
+            )
+            target.add_embeddings(rows["documents"], rows["embeddings"], rows["metadatas"])
+        target.save()
+    finally:
+        close_vectorstore(chroma)
+        target.close()
+    os.remove(marker)
+
+    result = {
+        "doc_id": doc_id,
+        "index_type": target.index_type,
+        "chunks": target.count,
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+    logger.info("FAISS 이전 완료: %s", result)
+    return result
+
+
+def _iter_pages(
+    pdf_path: str, num_pages: int, workers: int, pages_per_task: int
+) -> Iterator[Tuple[int, str]]:
+    """페이지 순서대로 ``(page, text)``를 내보낸다. 동시에 떠 있는 파싱 작업은 ``workers * 2``개."""
+    ranges = [
+        (start, min(start + pages_per_task, num_pages))
+        for start in range(0, num_pages, pages_per_task)
+    ]
+    if workers <= 1 or len(ranges) <= 1:
+        for start, stop in ranges:
+            yield from parse_pages(pdf_path, start, stop)
+        return
+
+    # fork는 torch/엔진 스레드가 떠 있는 부모를 복제하므로 spawn으로 띄운다.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=context) as pool:
+        pending: Deque["Future[List[Tuple[int, str]]]"] = deque()
+        remaining = iter(ranges)
+        for start, stop in remaining:
+            pending.append(pool.submit(parse_pages, pdf_path, start, stop))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            pages = pending.popleft().result()
+            nxt = next(remaining, None)
+            if nxt is not None:
+                pending.append(pool.submit(parse_pages, pdf_path, *nxt))
+            yield from pages
+
+
+def ingest_pdf(
+    pdf_path: str,
+    vectorstore: VectorStore,
+    progress: Optional[ProgressCallback] = None,
+    workers: int = INGEST_WORKERS,
+    pages_per_task: int = INGEST_PAGES_PER_TASK,
+    embed_batch: int = INGEST_EMBED_BATCH,
+    max_inflight_chunks: int = INGEST_MAX_INFLIGHT_CHUNKS,
+    sparse_index: Optional[SparseIndexBuilder] = None,
+) -> IngestStats:
+    """PDF를 파싱·분할·임베딩해 ``vectorstore``에 점진적으로 추가한다.
+
+    분할된 청크는 ``embed_batch``개씩 writer 스레드로 넘어가고, 아직 저장되지 않은
+    청크가 ``max_inflight_chunks``를 넘으면 파싱 쪽이 기다린다. ``sparse_index``가 있으면
+    같은 배치를 메인 스레드에서 BM25 인덱스에도 넣는다 (저장은 호출자가 ``save()``).
+    저장소의 임베딩이 :class:`CachedEmbeddings`(인제스트마다 새로 만든 것)면 재사용 수와 아낀
+    시간을 ``stats``에 옮긴다.
+    """
+    stats = IngestStats(pages_total=page_count(pdf_path))
+    embedding = getattr(vectorstore, "embeddings", None)
+    cached = embedding if isinstance(embedding, CachedEmbeddings) else None
+    splitter = TokenChunker(get_llama_tokenizer())
+    embed_batch = max(1, embed_batch)
+    batches: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, max_inflight_chunks // embed_batch))
+    errors: List[BaseException] = []
+
+    def _report() -> None:
+        if progress is not None:
+            progress(stats)
 
-    vectorstore = Chroma.from_documents(
-        documents=splits,
-        embedding=embeddings,
-        persist_directory=persist_dir,
-        collection_name=collection,
+    def _writer() -> None:
+        while True:
+            batch = batches.get()
+            if batch is _STOP:
+                return
+            if errors:
+                continue  # 실패 후에는 남은 배치를 비우기만 한다.
+            try:
+                vectorstore.add_texts(
+                    texts=[d.page_content for d in batch],
+                    metadatas=[d.metadata for d in batch],
+                )
+                stats.chunks_embedded += len(batch)
+                if cached is not None:
+                    stats.chunks_reused = cached.reused
+                    stats.embed_s = cached.embed_s
+                    stats.embed_saved_s = cached.saved_s
+                _report()
+            except BaseException as exc:  # noqa: BLE001  메인 스레드에서 다시 던진다
+                errors.append(exc)
+
+    def _dispatch(batch: List[Document]) -> None:
+        stats.chunks_split += len(batch)
+        if sparse_index is not None:
+            sparse_index.add([d.page_content for d in batch], [d.metadata for d in batch])
+        batches.put(batch)
+
+    writer = threading.Thread(target=_writer, name="ingest-writer", daemon=True)
+    writer.start()
+
+    buffer: List[Document] = []
+    try:
+        for page, text in _iter_pages(pdf_path, stats.pages_total, workers, pages_per_task):
+            if errors:
+                break
+            buffer.extend(
+                splitter.split_documents(
+                    [Document(page_content=text, metadata={"source": pdf_path, "page": page})]
+                )
+            )
+            stats.pages_parsed += 1
+            while len(buffer) >= embed_batch:
+                batch, buffer = buffer[:embed_batch], buffer[embed_batch:]
+                _dispatch(batch)
+            _report()
+        if buffer and not errors:
+            _dispatch(buffer)
+    finally:
+        release()
+        batches.put(_STOP)
+        writer.join()
+
+    if errors:
+        raise errors[0]
+    stats.finished_at = time.perf_counter()
+    _report()
+    logger.info(
+        "인제스트 완료: %d쪽 / %d청크, %.2fs (%.1f쪽/s, %.1f청크/s), "
+        "임베딩 재사용 %d청크 (%.0f%%, 약 %.2fs 절약)",
+        stats.pages_parsed,
+        stats.chunks_embedded,
+        stats.elapsed_s,
+        stats.pages_per_s,
+        stats.chunks_per_s,
+        stats.chunks_reused,
+        stats.reuse_ratio * 100,
+        stats.embed_saved_s,
     )
+    return stats
+
+
+def _discard_incomplete(doc_id: str, backend: str) -> None:
+    """중단된 인제스트 흔적을 지운다. 다른 백엔드의 완료된 저장소는 건드리지 않는다."""
+    store_dir = _store_dir(doc_id, backend)
+    if not os.path.exists(os.path.join(store_dir, _INCOMPLETE_MARKER)):
+        return
+    logger.warning("중단된 인제스트 흔적 삭제 후 재생성: %s", store_dir)
+    if backend == "faiss":
+        shutil.rmtree(store_dir)
+        return
+    for name in os.listdir(store_dir):
+        path = os.path.join(store_dir, name)
+        if name == _FAISS_SUBDIR:
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+
+def create_vectorstore_from_pdf(
+    pdf_path: str, progress: Optional[ProgressCallback] = None
+) -> Tuple[VectorStore, str]:
+    """PDF 파일을 로드하고 (벡터 저장소, doc_id)를 반환한다.
+
+    저장소는 ``VECTOR_BACKEND``로 만든다. 이미 다른 백엔드로 만든 저장소가 있으면
+    다시 임베딩하지 않고 그것을 연다.
+    """
+    backend = VECTOR_BACKEND
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"지원하지 않는 벡터 저장소 백엔드: {backend} (가능: {VECTOR_BACKENDS})")
+    doc_id = compute_doc_id(pdf_path)
+    persist_dir = _persist_dir(doc_id)
+    store_dir = _store_dir(doc_id, backend)
+
+    if vectorstore_exists(doc_id):
+        logger.info("기존 벡터 저장소 로드: %s", persist_dir)
+        return open_vectorstore(doc_id, backend), doc_id
+
+    _discard_incomplete(doc_id, backend)
+
+    logger.info("PDF 로딩 및 벡터 저장소 생성 (%s): %s", backend, pdf_path)
+    os.makedirs(store_dir, exist_ok=True)
+    marker = os.path.join(store_dir, _INCOMPLETE_MARKER)
+    open(marker, "w").close()
+
+    # 청크 임베딩은 임베딩 캐시를 거친다 (질의 임베딩은 그대로 넘어간다).
+    embedding = cached_embedding_model(get_embedding_model())
+    vectorstore: VectorStore
+    if backend == "faiss":
+        vectorstore = FaissVectorStore(store_dir, embedding)
+    else:
+        from langchain_community.vectorstores import Chroma
+
+        vectorstore = Chroma(
+            persist_directory=store_dir,
+            embedding_function=embedding,
+            collection_name=_collection_name(doc_id),
+        )
+    sparse_dir = _sparse_dir(doc_id)
+    shutil.rmtree(sparse_dir, ignore_errors=True)
+    sparse_index = SparseIndexBuilder(sparse_dir)
+    stats = ingest_pdf(pdf_path, vectorstore, progress=progress, sparse_index=sparse_index)
+    if isinstance(vectorstore, FaissVectorStore):
+        vectorstore.save()
+    sparse_index.save()
+    with open(os.path.join(persist_dir, _META_FILE), "w", encoding="utf-8") as f:
+        json.dump(
+            {"doc_name": os.path.basename(pdf_path), "created_at": time.time(), **stats.as_dict()},
+            f,
+            ensure_ascii=False,
+        )
+    os.remove(marker)
     return vectorstore, doc_id
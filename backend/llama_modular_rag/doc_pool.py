@@ -0,0 +1,317 @@
+"""여러 문서를 동시에 서빙하기 위한 벡터스토어·그래프 LRU 풀.
+
+문서마다 벡터 저장소(Chroma 또는 FAISS)·BM25 희소 인덱스와 컴파일된 LangGraph를 한 벌씩
+메모리에 올려 두고, 최근에 쓰인 순서로 개수(``max_docs``)와 대략적인 메모리(``max_bytes``, 저장소 디렉터리 크기로
+근사) 한도를 넘으면 내보낸다. 요청은 :meth:`DocumentPool.lease`로 문서를 빌리고
+끝나면 :meth:`DocumentPool.release`로 돌려준다. 빌려 간 문서는 내보내지 않는다.
+여러 문서를 함께 검색하는 병합 저장소와 그래프도 문서 묶음(:func:`lease_key`)별로 두었다가
+묶음의 문서 하나라도 내려가면 버린다.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from llama_modular_rag.config import DOC_POOL_MAX_DOCS, DOC_POOL_MAX_MB
+from llama_modular_rag.data_loader import (
+    close_vectorstore,
+    open_sparse_index,
+    open_vectorstore,
+    read_doc_meta,
+    store_backend,
+    vectorstore_exists,
+    vectorstore_nbytes,
+)
+from llama_modular_rag.graph_builder import build_rag_graph
+from llama_modular_rag.metrics import DOCUMENT_LEASE_WAIT_SECONDS
+from llama_modular_rag.sparse_index import SparseIndex, with_lexical
+from llama_modular_rag.vector_search import search_by_vectors
+
+logger = logging.getLogger(__name__)
+
+# 메모리에 두는 문서 묶음별 병합 그래프 수 (최근 사용 순).
+MERGED_GRAPHS_MAX = 16
+
+
+@dataclass(frozen=True)
+class LoadedDocument:
+    doc_id: str
+    doc_name: str
+    vectorstore: VectorStore
+    graph: Any
+    nbytes: int = 0
+    sparse: Optional[SparseIndex] = None
+
+
+class MultiDocVectorStore:
+    """여러 컬렉션을 한 번에 검색해 거리 순으로 합친다.
+
+    모든 컬렉션이 같은 임베딩 모델·거리 함수를 쓰므로 점수를 그대로 비교할 수 있다.
+    ``document_retriever``가 쓰는 ``similarity_search``와 배치 경로의 ``similarity_search_batch``만
+    흉내낸다.
+    """
+
+    def __init__(self, documents: Sequence[LoadedDocument]) -> None:
+        self.documents = list(documents)
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        # 쿼리 임베딩은 한 번만 계산한다.
+        embedding = self.documents[0].vectorstore.embeddings.embed_query(query)
+        merged: List[Tuple[Document, float]] = []
+        for doc in self.documents:
+            for hit, score in doc.vectorstore.similarity_search_by_vector_with_relevance_scores(
+                embedding, k=k
+            ):
+                hit.metadata = {**(hit.metadata or {}), "doc_id": doc.doc_id}
+                merged.append((hit, score))
+        merged.sort(key=lambda pair: pair[1])
+        return merged[:k]
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def similarity_search_batch(
+        self, queries: Sequence[str], vectors: np.ndarray, k: int = 4
+    ) -> List[List[Document]]:
+        """미리 계산한 쿼리 임베딩으로 문서마다 한 번씩 묶어 조회한 뒤 쿼리별로 합친다."""
+        merged: List[List[Tuple[Document, float]]] = [[] for _ in queries]
+        for doc in self.documents:
+            for hits, found in zip(merged, search_by_vectors(doc.vectorstore, vectors, k)):
+                for hit, score in found:
+                    hit.metadata = {**(hit.metadata or {}), "doc_id": doc.doc_id}
+                    hits.append((hit, score))
+        return [[hit for hit, _ in sorted(hits, key=lambda p: p[1])[:k]] for hits in merged]
+
+
+@dataclass(frozen=True)
+class DocumentLease:
+    """한 요청이 쓰는 문서 묶음. 문서가 여러 개면 병합 검색 그래프를 쓴다."""
+
+    key: str  # 쿼리 캐시 키 (:func:`lease_key`)
+    documents: Tuple[LoadedDocument, ...]
+    vectorstore: Any
+    graph: Any
+
+
+def lease_key(doc_ids: Sequence[str]) -> str:
+    """문서 묶음의 쿼리 캐시 키. 문서 하나면 doc_id, 여러 개면 정렬된 doc_id를 '+'로 연결한다."""
+    ids = sorted(set(doc_ids))
+    return ids[0] if len(ids) == 1 else "+".join(ids)
+
+
+def load_document(doc_id: str) -> LoadedDocument:
+    """디스크의 저장소를 열고 그래프를 컴파일한다. 없으면 ``KeyError``."""
+    vectorstore = open_vectorstore(doc_id)
+    sparse = open_sparse_index(doc_id, vectorstore)
+    return LoadedDocument(
+        doc_id=doc_id,
+        doc_name=read_doc_meta(doc_id).get("doc_name") or doc_id[:12],
+        vectorstore=vectorstore,
+        graph=build_rag_graph(with_lexical(vectorstore, [(None, sparse)])),
+        nbytes=vectorstore_nbytes(doc_id, store_backend(vectorstore)),
+        sparse=sparse,
+    )
+
+
+class DocumentPool:
+    def __init__(
+        self,
+        max_docs: int = DOC_POOL_MAX_DOCS,
+        max_bytes: int = DOC_POOL_MAX_MB * 1024 * 1024,
+    ) -> None:
+        self.max_docs = max(1, max_docs)
+        self.max_bytes = max_bytes
+        self._docs: "OrderedDict[str, LoadedDocument]" = OrderedDict()
+        self._leases: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # 같은 문서를 동시에 두 번 여는 것만 막는다 (서로 다른 문서는 병렬로 로드).
+        self._loading: Dict[str, threading.Lock] = {}
+        # lease_key → (문서들, 병합 저장소, 그래프). 문서 객체가 바뀌면(재인제스트) 다시 만든다.
+        self._merged: "OrderedDict[str, Tuple[Tuple[LoadedDocument, ...], Any, Any]]" = (
+            OrderedDict()
+        )
+
+        self.hits: int = 0
+        self.loads: int = 0
+        self.evictions: int = 0
+
+    def exists(self, doc_id: str) -> bool:
+        with self._lock:
+            if doc_id in self._docs:
+                return True
+        return vectorstore_exists(doc_id)
+
+    def add(self, document: LoadedDocument) -> None:
+        """새로 인제스트한 문서를 가장 최근 항목으로 넣는다."""
+        # 같은 doc_id의 이전 항목은 닫지 않는다 — Chroma는 같은 persist 경로의 시스템을 공유한다.
+        with self._lock:
+            self._docs.pop(document.doc_id, None)
+            self._docs[document.doc_id] = document
+            self._forget_merged_locked(document.doc_id)
+            evicted = self._evict_locked()
+        self._close(evicted)
+
+    def lease(self, doc_ids: Sequence[str]) -> DocumentLease:
+        """문서를 (필요하면 디스크에서 열어) 빌린다. 없는 문서가 있으면 ``KeyError``.
+
+        디스크 로드가 있을 수 있으므로 이벤트 루프 밖에서 호출하라.
+        """
+        ids = list(dict.fromkeys(doc_ids))
+        documents: List[LoadedDocument] = []
+        started = time.perf_counter()
+        try:
+            for doc_id in ids:
+                documents.append(self._acquire(doc_id))
+        except BaseException:
+            self._release(documents)
+            raise
+        DOCUMENT_LEASE_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+        if len(documents) == 1:
+            only = documents[0]
+            # 그래프와 같은 검색기(hybrid면 BM25 포함)를 SSE·배치 경로에도 준다.
+            return DocumentLease(
+                key=lease_key(ids),
+                documents=(only,),
+                vectorstore=with_lexical(
+                    only.vectorstore, [(None, only.sparse)] if only.sparse is not None else []
+                ),
+                graph=only.graph,
+            )
+        key = lease_key(ids)
+        leased = tuple(documents)
+        with self._lock:
+            cached = self._merged.get(key)
+            if cached is not None and set(map(id, cached[0])) == set(map(id, leased)):
+                self._merged.move_to_end(key)
+                return DocumentLease(
+                    key=key, documents=leased, vectorstore=cached[1], graph=cached[2]
+                )
+        # 컴파일은 락 밖에서 (같은 묶음을 동시에 처음 빌리면 두 번 만들 수 있지만 결과는 같다).
+        merged = with_lexical(
+            MultiDocVectorStore(documents),
+            [(d.doc_id, d.sparse) for d in documents if d.sparse is not None],
+        )
+        graph = build_rag_graph(merged)
+        with self._lock:
+            # 빌려 간 문서는 내려가지 않으므로 지금 넣어도 곧바로 무효가 되지 않는다.
+            self._merged[key] = (leased, merged, graph)
+            self._merged.move_to_end(key)
+            while len(self._merged) > MERGED_GRAPHS_MAX:
+                self._merged.popitem(last=False)
+        return DocumentLease(key=key, documents=leased, vectorstore=merged, graph=graph)
+
+    def release(self, lease: DocumentLease) -> None:
+        self._release(lease.documents)
+
+    def _acquire(self, doc_id: str) -> LoadedDocument:
+        with self._lock:
+            doc = self._docs.get(doc_id)
+            if doc is not None:
+                self._docs.move_to_end(doc_id)
+                self._leases[doc_id] = self._leases.get(doc_id, 0) + 1
+                self.hits += 1
+                return doc
+            loading = self._loading.setdefault(doc_id, threading.Lock())
+
+        with loading:
+            with self._lock:
+                doc = self._docs.get(doc_id)
+            if doc is None:
+                logger.info("문서 로드: %s", doc_id[:12])
+                doc = load_document(doc_id)
+            with self._lock:
+                self._loading.pop(doc_id, None)
+                if doc_id not in self._docs:
+                    self._docs[doc_id] = doc
+                    self.loads += 1
+                else:
+                    self.hits += 1
+                self._docs.move_to_end(doc_id)
+                self._leases[doc_id] = self._leases.get(doc_id, 0) + 1
+                evicted = self._evict_locked()
+        self._close(evicted)
+        return doc
+
+    def _release(self, documents: Sequence[LoadedDocument]) -> None:
+        with self._lock:
+            for doc in documents:
+                remaining = self._leases.get(doc.doc_id, 0) - 1
+                if remaining > 0:
+                    self._leases[doc.doc_id] = remaining
+                else:
+                    self._leases.pop(doc.doc_id, None)
+            evicted = self._evict_locked()
+        self._close(evicted)
+
+    def _evict_locked(self) -> List[LoadedDocument]:
+        """한도를 넘는 동안 빌려 가지 않은 가장 오래된 문서부터 꺼낸다."""
+        evicted: List[LoadedDocument] = []
+        while len(self._docs) > self.max_docs or (
+            len(self._docs) > 1 and self.used_bytes > self.max_bytes
+        ):
+            victim = next((d for d in self._docs if d not in self._leases), None)
+            if victim is None:
+                break  # 전부 사용 중 — 반납될 때 다시 시도한다.
+            evicted.append(self._docs.pop(victim))
+            self._forget_merged_locked(victim)
+            self.evictions += 1
+        return evicted
+
+    def _forget_merged_locked(self, doc_id: str) -> None:
+        stale = [
+            key
+            for key, (documents, _, _) in self._merged.items()
+            if any(d.doc_id == doc_id for d in documents)
+        ]
+        for key in stale:
+            del self._merged[key]
+
+    @staticmethod
+    def _close(documents: Sequence[LoadedDocument]) -> None:
+        for doc in documents:
+            logger.info("문서 내림: %s", doc.doc_id[:12])
+            close_vectorstore(doc.vectorstore)
+            if doc.sparse is not None:
+                doc.sparse.close()
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(d.nbytes for d in self._docs.values())
+
+    def loaded(self) -> List[LoadedDocument]:
+        with self._lock:
+            return list(reversed(self._docs.values()))
+
+    def get_loaded(self, doc_id: str) -> Optional[LoadedDocument]:
+        with self._lock:
+            return self._docs.get(doc_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": len(self._docs),
+                "merged_graphs": len(self._merged),
+                "leased": len(self._leases),
+                "max_docs": self.max_docs,
+                "used_bytes": self.used_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            documents = list(self._docs.values())
+            self._docs.clear()
+            self._merged.clear()
+        self._close(documents)
@@ -0,0 +1,335 @@
+"""청크 임베딩 영속 캐시: ``hash(임베딩 모델 id, 청크 본문)`` → 벡터.
+
+벡터 저장소는 파일 sha256(doc_id)마다 새로 만든다. 한 쪽만 고친 개정판이나 머리말·약관 같은
+공통 문구를 나누는 PDF도 처음부터 다시 임베딩하게 되므로, 임베딩만은 청크 본문 기준으로
+재사용한다. 모델마다 ``EMBEDDING_CACHE_DIR/<모델 키>/``에 다음을 둔다.
+
+* ``vectors.f32`` — float32 행을 이어 붙인 파일. 읽기는 ``np.memmap``.
+* ``keys.bin`` — 행마다 16바이트 키. 열 때 ``{키: 행}`` dict로 읽는다 (100만 청크에 16MB).
+* ``meta.json`` — 모델 이름, 차원, 청크당 임베딩 시간 (재사용으로 아낀 시간 추정용).
+
+덧붙이기는 벡터 → 키 순서이고 열 때 짧은 쪽에 맞춰 자르므로 중간에 죽어도 깨지지 않는다.
+같은 캐시에 여러 프로세스가 쓰면 ``fcntl.flock``으로 덧붙이기를 직렬화하고, 그 사이 다른
+프로세스가 덧붙인 키를 먼저 읽어 온다.
+
+사용법 (backend/ 에서)::
+
+    python -m llama_modular_rag.embedding_cache stats
+    python -m llama_modular_rag.embedding_cache clear
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from llama_modular_rag.config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_MODEL_NAME,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows — 프로세스 하나만 쓴다고 가정
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+_VECTORS_FILE = "vectors.f32"
+_KEYS_FILE = "keys.bin"
+_META_FILE = "meta.json"
+_LOCK_FILE = ".lock"
+_KEY_BYTES = 16
+# 청크당 임베딩 시간 이동 평균의 새 값 가중치.
+_TIMING_WEIGHT = 0.2
+
+
+def embedding_model_id(
+    backend: str = EMBEDDING_BACKEND, model_name: str = EMBEDDING_MODEL_NAME
+) -> str:
+    """캐시 키에 들어가는 임베딩 모델 식별자.
+
+    로컬 디렉터리면 안의 파일 이름·크기·수정 시각까지 넣어, 같은 경로에 다른 가중치를 두면
+    다른 캐시가 된다.
+    """
+    parts = [backend, model_name]
+    if os.path.isdir(model_name):
+        parts[1] = os.path.abspath(model_name)
+        for name in sorted(os.listdir(model_name)):
+            path = os.path.join(model_name, name)
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                parts.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return "|".join(parts)
+
+
+class EmbeddingCache:
+    """한 임베딩 모델의 청크 벡터 저장소. 스레드 안전."""
+
+    def __init__(
+        self, model_id: str, directory: str = EMBEDDING_CACHE_DIR, label: Optional[str] = None
+    ) -> None:
+        self.model_id = model_id
+        self.label = label or model_id
+        self.directory = os.path.join(
+            directory, hashlib.sha256(model_id.encode("utf-8")).hexdigest()[:16]
+        )
+        self.dim: Optional[int] = None
+        self.embed_s_per_chunk: Optional[float] = None
+        self.hits = 0
+        self.misses = 0
+        self._rows: Dict[bytes, int] = {}
+        self._count = 0
+        self._vectors: Optional[np.ndarray] = None  # 마지막으로 매핑한 구간
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, self._file_lock():
+            self._read_meta()
+            self._sync()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def key(self, text: str) -> bytes:
+        digest = hashlib.sha256(f"{self.model_id}\0{text}".encode("utf-8")).digest()
+        return digest[:_KEY_BYTES]
+
+    # ------------------------------------------------------------------ 조회
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """텍스트마다 캐시된 벡터(복사본) 또는 ``None``."""
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            rows = [self._rows.get(key) for key in keys]
+            if None in rows:
+                # 다른 프로세스가 그사이 덧붙였을 수 있다. 파일 잠금 없이 다 쓴 행만 읽는다.
+                self._sync(repair=False)
+                rows = [self._rows.get(key) for key in keys]
+            found = [row for row in rows if row is not None]
+            self.hits += len(found)
+            self.misses += len(rows) - len(found)
+            if not found:
+                return [None] * len(texts)
+            vectors = self._mapped(max(found) + 1)
+            return [None if row is None else np.array(vectors[row]) for row in rows]
+
+    def _mapped(self, rows: int) -> np.ndarray:
+        if self._vectors is None or len(self._vectors) < rows:
+            self._vectors = np.memmap(
+                self._path(_VECTORS_FILE),
+                dtype=np.float32,
+                mode="r",
+                shape=(self._count, self.dim),
+            )
+        return self._vectors
+
+    # ------------------------------------------------------------------ 추가
+    def put_many(self, texts: Sequence[str], vectors: Any, seconds: Optional[float] = None) -> None:
+        """``texts``의 벡터를 덧붙인다. ``seconds``는 이 벡터들을 계산하는 데 든 시간."""
+        if not texts:
+            return
+        array = np.ascontiguousarray(vectors, dtype=np.float32)
+        if array.ndim != 2 or len(array) != len(texts):
+            raise ValueError("texts와 vectors의 개수/모양이 맞지 않습니다.")
+        keys = [self.key(text) for text in texts]
+        with self._lock, self._file_lock():
+            self._sync()
+            # 그사이 다른 프로세스가 넣은 것과 배치 안의 중복은 건너뛴다.
+            fresh: Dict[bytes, int] = {}
+            for index, key in enumerate(keys):
+                if key not in self._rows:
+                    fresh.setdefault(key, index)
+            if not fresh:
+                return
+            keys = list(fresh)
+            array = array[list(fresh.values())]
+            if self.dim is None:
+                # 차원을 먼저 기록해야 덧붙이다 죽어도 다음에 열 때 행 경계를 안다.
+                self.dim = int(array.shape[1])
+                self._write_meta()
+                self._sync()
+            elif array.shape[1] != self.dim:
+                raise ValueError(f"임베딩 차원 불일치: {array.shape[1]} != {self.dim}")
+            with open(self._path(_VECTORS_FILE), "ab") as f:
+                f.write(array.tobytes())
+            with open(self._path(_KEYS_FILE), "ab") as f:
+                f.write(b"".join(keys))
+            for offset, key in enumerate(keys):
+                self._rows[key] = self._count + offset
+            self._count += len(keys)
+            if seconds is not None:
+                per_chunk = seconds / len(texts)
+                self.embed_s_per_chunk = (
+                    per_chunk
+                    if self.embed_s_per_chunk is None
+                    else (1 - _TIMING_WEIGHT) * self.embed_s_per_chunk + _TIMING_WEIGHT * per_chunk
+                )
+            self._write_meta()
+
+    # ------------------------------------------------------------------ 파일
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        os.makedirs(self.directory, exist_ok=True)  # 다른 프로세스가 clear했을 수 있다
+        if fcntl is None:
+            yield
+            return
+        with open(self._path(_LOCK_FILE), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_meta(self) -> None:
+        try:
+            with open(self._path(_META_FILE), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return
+        self.dim = meta.get("dim")
+        self.embed_s_per_chunk = meta.get("embed_s_per_chunk")
+
+    def _write_meta(self) -> None:
+        tmp = self._path(_META_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"model": self.label, "dim": self.dim, "embed_s_per_chunk": self.embed_s_per_chunk},
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp, self._path(_META_FILE))
+
+    def _sync(self, repair: bool = True) -> None:
+        """디스크의 행 수에 맞춘다: 다른 프로세스가 덧붙인 키를 읽는다.
+
+        ``repair``면 반쯤 쓴 꼬리를 자른다. 파일 잠금을 잡고 있을 때만 그래야 한다 — 아니면
+        다른 프로세스가 쓰는 중인 행일 수 있다.
+        """
+        if self.dim is None:
+            self._read_meta()
+            if self.dim is None:
+                return
+        vectors_path, keys_path = self._path(_VECTORS_FILE), self._path(_KEYS_FILE)
+        if not repair and not os.path.exists(keys_path):
+            return
+        open(vectors_path, "ab").close()
+        open(keys_path, "ab").close()
+        row_bytes = self.dim * 4
+        rows = min(
+            os.path.getsize(vectors_path) // row_bytes, os.path.getsize(keys_path) // _KEY_BYTES
+        )
+        for path, size in ((vectors_path, rows * row_bytes), (keys_path, rows * _KEY_BYTES)):
+            if repair and os.path.getsize(path) > size:
+                logger.warning("임베딩 캐시의 끝나지 않은 기록을 잘라냄: %s", path)
+                os.truncate(path, size)
+        if rows < self._count:  # 누가 clear했다
+            self._rows, self._count, self._vectors = {}, 0, None
+        if rows > self._count:
+            with open(keys_path, "rb") as f:
+                f.seek(self._count * _KEY_BYTES)
+                blob = f.read((rows - self._count) * _KEY_BYTES)
+            for offset in range(0, len(blob), _KEY_BYTES):
+                self._rows[blob[offset : offset + _KEY_BYTES]] = self._count + offset // _KEY_BYTES
+            self._count = rows
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "model": self.label,
+                "directory": self.directory,
+                "entries": self._count,
+                "dim": self.dim,
+                "bytes": self._count * ((self.dim or 0) * 4 + _KEY_BYTES),
+                "embed_ms_per_chunk": (
+                    None
+                    if self.embed_s_per_chunk is None
+                    else round(self.embed_s_per_chunk * 1000, 3)
+                ),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """``embed_documents``가 캐시에 없는 청크만 ``base``로 임베딩한다. ``embed_query``는 그대로.
+
+    인스턴스마다 재사용·새로 임베딩한 청크 수와 임베딩 시간을 센다 — 인제스트 한 번에 하나씩 만든다.
+    """
+
+    def __init__(self, base: Embeddings, cache: EmbeddingCache) -> None:
+        self.base = base
+        self.cache = cache
+        self.reused = 0
+        self.embedded = 0
+        self.embed_s = 0.0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached = self.cache.get_many(texts)
+        # 한 배치 안에서 되풀이되는 청크(쪽마다 같은 머리말 등)도 한 번만 임베딩한다.
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        fresh: Dict[str, List[float]] = {}
+        if missing:
+            started = time.perf_counter()
+            vectors = self.base.embed_documents(missing)
+            elapsed = time.perf_counter() - started
+            self.cache.put_many(missing, vectors, elapsed)
+            fresh = dict(zip(missing, vectors))
+            self.embedded += len(missing)
+            self.embed_s += elapsed
+        self.reused += len(texts) - len(missing)
+        return [
+            fresh[text] if vector is None else vector.tolist()
+            for text, vector in zip(texts, cached)
+        ]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.base.embed_query(text)
+
+    @property
+    def saved_s(self) -> float:
+        """재사용한 청크를 새로 임베딩했다면 들었을 시간 (이번 인제스트의 청크당 시간, 없으면 캐시 평균)."""
+        per_chunk = self.embed_s / self.embedded if self.embedded else self.cache.embed_s_per_chunk
+        return self.reused * (per_chunk or 0.0)
+
+
+@lru_cache(maxsize=1)
+def get_embedding_cache() -> EmbeddingCache:
+    """현재 임베딩 모델의 캐시 (프로세스당 하나)."""
+    return EmbeddingCache(
+        embedding_model_id(), label=f"{EMBEDDING_BACKEND}:{os.path.basename(EMBEDDING_MODEL_NAME)}"
+    )
+
+
+def cached_embedding_model(base: Embeddings) -> Embeddings:
+    """인제스트용 임베딩. 캐시가 꺼져 있으면 ``base`` 그대로."""
+    if not EMBEDDING_CACHE_ENABLED:
+        return base
+    return CachedEmbeddings(base, get_embedding_cache())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="청크 임베딩 캐시 관리")
+    parser.add_argument("command", choices=["stats", "clear"])
+    args = parser.parse_args()
+
+    if args.command == "clear":
+        shutil.rmtree(EMBEDDING_CACHE_DIR, ignore_errors=True)
+        print(json.dumps({"cleared": EMBEDDING_CACHE_DIR}, ensure_ascii=False))
+    else:
+        print(json.dumps(get_embedding_cache().stats(), ensure_ascii=False, indent=2))
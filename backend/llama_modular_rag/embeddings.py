@@ -1,22 +1,69 @@
+import logging
+import os
 from functools import lru_cache
 from typing import Any, Dict
 
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 
-from llama_modular_rag.config import EMBEDDING_MODEL_NAME
+from llama_modular_rag.config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_ONNX_DIR,
+    apply_torch_threads,
+)
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def load_embedding_model(
+    backend: str = EMBEDDING_BACKEND,
+    model_name: str = EMBEDDING_MODEL_NAME,
+    onnx_dir: str = EMBEDDING_ONNX_DIR,
+) -> Embeddings:
+    """지정한 백엔드로 임베딩 모델을 새로 로드한다 (캐시 없음).
+
+    모든 백엔드는 같은 pooling과 ``normalize_embeddings=True``를 따르므로
+    어느 쪽으로 만든 Chroma 저장소든 서로 바꿔 조회할 수 있다.
+    """
+    if backend == "torch":
+        # sentence-transformers·torch를 끌어오므로 모델을 실제로 만들 때 import한다.
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        apply_torch_threads()
+        model_kwargs: Dict[str, Any] = {"device": "cpu"}
+        encode_kwargs: Dict[str, Any] = {
+            "normalize_embeddings": True,
+            "batch_size": EMBEDDING_BATCH_SIZE,
+            "device": "cpu",
+        }
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs=model_kwargs,
+            encode_kwargs=encode_kwargs,
+        )
+    if backend in ("onnx", "onnx-int8"):
+        from llama_modular_rag.onnx_embeddings import OnnxEmbeddings, export_onnx
+
+        quantized = backend == "onnx-int8"
+        # 내보낸 모델이 없으면 첫 로드 때 한 번 만든다.
+        export_onnx(model_name, onnx_dir, quantize=quantized)
+        logger.info("ONNX 임베딩 백엔드 사용: %s (int8=%s)", onnx_dir, quantized)
+        return OnnxEmbeddings(
+            onnx_dir,
+            quantized=quantized,
+            normalize_embeddings=True,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            num_threads=int(os.environ.get("RAG_NUM_THREADS", "0")),
+        )
+    raise ValueError(
+        f"지원하지 않는 임베딩 백엔드: {backend!r} (가능: {', '.join(EMBEDDING_BACKENDS)})"
+    )
 
 
 @lru_cache(maxsize=1)
-def get_embedding_model() -> HuggingFaceEmbeddings:
+def get_embedding_model() -> Embeddings:
     """프로세스 수명 동안 한 번만 로드되는 임베딩 모델."""
-    model_kwargs: Dict[str, Any] = {"device": "cpu"}
-    encode_kwargs: Dict[str, Any] = {
-        "normalize_embeddings": True,
-        "batch_size": 8,
-        "device": "cpu",
-    }
-    return HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL_NAME,
-        model_kwargs=model_kwargs,
-        encode_kwargs=encode_kwargs,
-    )
+    return load_embedding_model(EMBEDDING_BACKEND)
@@ -0,0 +1,820 @@
+"""연속 배칭(continuous batching) 생성 엔진.
+
+동시에 들어온 요청들을 하나의 decode 루프로 묶는다. 새 요청은 토큰 경계에서
+prefill 후 배치에 합류하고, EOS나 ``max_new_tokens``에 도달한 요청은 바로 빠진다.
+배치 KV 캐시는 left-padding으로 길이를 맞추고, 각 요청의 디코드 청크는
+요청별 :class:`GenerationHandle` 큐로 전달된다.
+
+``draft_tokens``가 0보다 크면 prompt-lookup 추측 디코딩을 한다. RAG 답변은 컨텍스트의
+구절을 그대로 옮기는 경우가 많으므로, 마지막 n-gram이 프롬프트(또는 지금까지의 생성문)에
+나온 자리의 뒷부분을 초안으로 삼아 ``[다음 토큰] + 초안``을 한 forward로 검증한다. 별도
+초안 모델은 없다. 샘플링할 때는 초안을 확률 ``p(x)``로 받아들이고 거절되면 ``x``를 뺀
+분포에서 다시 뽑으므로 출력 분포는 추측 없이 생성할 때와 같다 (greedy면 출력도 같다).
+"""
+from __future__ import annotations
+
+import atexit
+import itertools
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+import numpy as np
+import torch
+from numpy.lib.stride_tricks import sliding_window_view
+from transformers import PreTrainedModel, PreTrainedTokenizerBase
+
+from llama_modular_rag.config import (
+    GENERATION_MAX_BATCH,
+    GENERATION_TIMEOUT_S,
+    INFERENCE_WORKERS,
+    MAX_NEW_TOKENS,
+    PREFIX_CACHE_BLOCK,
+    PREFIX_CACHE_MB,
+    REPETITION_PENALTY,
+    SPEC_DRAFT_TOKENS,
+    SPEC_NGRAM,
+    TEMPERATURE,
+    TOP_P,
+)
+from llama_modular_rag.llm_setup import get_llama_model, get_llama_tokenizer
+from llama_modular_rag.metrics import (
+    DECODE_TOKENS_PER_SECOND,
+    PREFILL_SECONDS,
+    QUEUE_WAIT_SECONDS,
+    TTFT_SECONDS,
+)
+from llama_modular_rag.prefix_cache import KVCache, PrefixCache
+
+if TYPE_CHECKING:
+    from llama_modular_rag.worker_pool import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+_STOP = object()
+# top-p는 보통 상위 몇 개 토큰에서 끝나므로 먼저 이만큼만 정렬한다 (모자라면 전체 정렬).
+_TOP_P_CANDIDATES = 256
+# 추측 디코딩이 남긴 mask 구멍(거절된 초안 열)이 이만큼 쌓이면 KV 캐시를 다시 모은다.
+_COMPACT_SLACK = 32
+
+
+class GenerationTimeout(TimeoutError):
+    """요청별 deadline을 넘겨 엔진이 생성을 중단했다."""
+
+
+@dataclass(frozen=True)
+class SamplingParams:
+    """요청 단위 샘플링 설정. 기본값은 config 상수를 따른다."""
+
+    max_new_tokens: int = MAX_NEW_TOKENS
+    temperature: float = TEMPERATURE
+    top_p: float = TOP_P
+    repetition_penalty: float = REPETITION_PENALTY
+    do_sample: bool = True
+
+
+class GenerationHandle:
+    """엔진에 제출된 요청 하나. 디코드된 텍스트 청크를 스레드 안전하게 전달한다."""
+
+    def __init__(
+        self,
+        request_id: int,
+        prompt_ids: List[int],
+        params: SamplingParams,
+        deadline: Optional[float] = None,
+    ) -> None:
+        self.request_id = request_id
+        self.prompt_ids = prompt_ids
+        self.params = params
+        # time.monotonic() 기준. 지나면 엔진이 GenerationTimeout으로 끝낸다.
+        self.deadline = deadline
+        self.submitted_at: float = time.monotonic()
+        self.admitted_at: Optional[float] = None  # prefill 시작
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.num_generated: int = 0
+        # 추측 디코딩: 검증한 초안 토큰 수와 그중 받아들인 수.
+        self.num_drafted: int = 0
+        self.num_accepted: int = 0
+        self._chunks: "queue.Queue[Any]" = queue.Queue()
+        self._parts: List[str] = []
+        self._finished = threading.Event()
+        self._cancelled = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._callbacks: List[Callable[["GenerationHandle"], None]] = []
+        # 청크 리스너 목록은 바꿀 때마다 새 리스트로 갈아 끼운다 (_put은 락 밖에서 순회).
+        self._listeners: List[Callable[[str], None]] = []
+        self._callback_lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self._finished.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """생성 중단을 요청한다. 엔진은 다음 decode 스텝 전에 이 시퀀스를 배치에서 뺀다."""
+        self._cancelled.set()
+
+    def _stop_reason(self, now: float) -> Optional[str]:
+        if self._cancelled.is_set():
+            return "cancelled"
+        if self.deadline is not None and now >= self.deadline:
+            return "timeout"
+        return None
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        """끝난 생성의 오류 (정상 종료·진행 중이면 ``None``)."""
+        return self._error
+
+    def _put(self, chunk: str) -> None:
+        with self._callback_lock:
+            self._parts.append(chunk)
+            listeners = self._listeners
+        self._chunks.put(chunk)
+        for fn in listeners:
+            fn(chunk)
+
+    def add_chunk_listener(self, fn: Callable[[str], None]) -> None:
+        """지금까지 나온 청크를 ``fn``으로 재생하고, 이후 청크마다 ``fn(chunk)``을 부른다.
+
+        ``fn``은 청크를 만드는 스레드(엔진 스케줄러·워커 풀 relay)에서 불리므로 가벼워야 한다.
+        끝은 :meth:`add_done_callback`으로 받는다.
+        """
+        with self._callback_lock:
+            # 재생도 락 안에서 — 그 사이 새 청크가 먼저 전달돼 순서가 뒤바뀌지 않게.
+            for chunk in self._parts:
+                fn(chunk)
+            self._listeners = self._listeners + [fn]
+
+    def add_done_callback(self, fn: Callable[["GenerationHandle"], None]) -> None:
+        """생성이 끝나면(정상·오류·취소) ``fn(handle)``을 부른다. 이미 끝났으면 바로 부른다.
+
+        콜백은 엔진 스케줄러 스레드에서 실행되므로 가벼워야 한다 (큐에 넣기 정도).
+        """
+        with self._callback_lock:
+            if not self._finished.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def _finish(self, error: Optional[BaseException] = None) -> None:
+        self.finished_at = time.monotonic()
+        self._error = error
+        with self._callback_lock:
+            self._finished.set()
+            callbacks, self._callbacks = self._callbacks, []
+        self._chunks.put(_DONE)
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception:  # noqa: BLE001
+                logger.exception("request=%d 완료 콜백 실패", self.request_id)
+
+    def __iter__(self) -> Iterator[str]:
+        """블로킹 이터레이터. 엔진 오류는 마지막에 그대로 다시 발생한다."""
+        while True:
+            chunk = self._chunks.get()
+            if chunk is _DONE:
+                break
+            yield chunk
+        if self._error is not None:
+            raise self._error
+
+    def result(self, timeout: Optional[float] = None) -> str:
+        """생성이 끝날 때까지 기다렸다가 전체 텍스트를 반환한다."""
+        if not self._finished.wait(timeout):
+            raise TimeoutError(f"generation {self.request_id} timed out")
+        if self._error is not None:
+            raise self._error
+        return "".join(self._parts)
+
+
+@dataclass
+class _Sequence:
+    handle: GenerationHandle
+    seen_ids: torch.Tensor
+    position: int
+    next_token: int = -1
+    generated: List[int] = field(default_factory=list)
+    printed: int = 0
+
+
+def _to_legacy(past: Any) -> KVCache:
+    # transformers 버전에 따라 DynamicCache가 돌아오므로 튜플 형식으로 통일한다.
+    if hasattr(past, "to_legacy_cache"):
+        return past.to_legacy_cache()
+    return past
+
+
+def _penalize(
+    logits: torch.Tensor, seen: Sequence[torch.Tensor], penalties: Sequence[float]
+) -> None:
+    """행별 repetition penalty를 제자리에서 적용한다."""
+    for row, (ids, penalty) in enumerate(zip(seen, penalties)):
+        if penalty != 1.0:
+            score = logits[row, ids]
+            logits[row, ids] = torch.where(score < 0, score * penalty, score / penalty)
+
+
+def _top_p_probs(scaled: torch.Tensor, top_p: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """행별 top-p로 남긴 후보 토큰과 정규화된 확률 ``(ids, probs)``."""
+    k = min(_TOP_P_CANDIDATES, scaled.shape[-1])
+    values, ids = scaled.topk(k, dim=-1)
+    probs = (values - scaled.logsumexp(dim=-1, keepdim=True)).exp()
+    cumulative = probs.cumsum(dim=-1)
+    if k < scaled.shape[-1] and bool((cumulative[:, -1] < top_p).any()):
+        values, ids = scaled.sort(dim=-1, descending=True)
+        probs = values.softmax(dim=-1)
+        cumulative = probs.cumsum(dim=-1)
+    # 누적 확률이 top_p를 넘기 직전 토큰까지 남긴다 (최소 1개 보장).
+    probs = probs.masked_fill((cumulative - probs) > top_p[:, None], 0.0)
+    return ids, probs / probs.sum(dim=-1, keepdim=True)
+
+
+def _pad_left(t: torch.Tensor, length: int, dim: int) -> torch.Tensor:
+    missing = length - t.shape[dim]
+    if missing <= 0:
+        return t
+    shape = list(t.shape)
+    shape[dim] = missing
+    return torch.cat([t.new_zeros(shape), t], dim=dim)
+
+
+class GenerationEngine:
+    """모델을 소유하고 동시 요청을 하나의 배치 decode 루프로 처리한다.
+
+    스케줄러는 데몬 스레드 하나에서 돈다. 매 반복마다 대기 중인 요청을
+    ``max_batch_size``까지 합류시킨 뒤 활성 시퀀스 전체에 대해 한 스텝을 디코드한다.
+    """
+
+    def __init__(
+        self,
+        model: PreTrainedModel,
+        tokenizer: PreTrainedTokenizerBase,
+        max_batch_size: int = GENERATION_MAX_BATCH,
+        prefix_cache: Optional[PrefixCache] = None,
+        draft_tokens: int = SPEC_DRAFT_TOKENS,
+        ngram: int = SPEC_NGRAM,
+    ) -> None:
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max(1, max_batch_size)
+        self.prefix_cache = prefix_cache
+        self.draft_tokens = max(0, draft_tokens)
+        self.ngram = max(1, ngram)
+        self.eos_token_ids: Set[int] = self._resolve_eos_ids()
+
+        self._pending: "queue.Queue[GenerationHandle]" = queue.Queue()
+        self._active: List[_Sequence] = []
+        self._cache: Optional[KVCache] = None
+        self._mask: Optional[torch.Tensor] = None
+        self._ids = itertools.count(1)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopping = False
+
+        self.submitted: int = 0
+        self.total_tokens: int = 0
+        self.total_steps: int = 0
+        self.cancelled: int = 0
+        self.timed_out: int = 0
+        self.drafted: int = 0
+        self.accepted: int = 0
+
+    def _resolve_eos_ids(self) -> Set[int]:
+        ids: Set[int] = set()
+        for source in (
+            getattr(self.model.generation_config, "eos_token_id", None),
+            self.tokenizer.eos_token_id,
+        ):
+            if source is None:
+                continue
+            ids.update(source if isinstance(source, (list, tuple)) else [source])
+        return ids
+
+    # ------------------------------------------------------------------ 공개 API
+
+    def submit(
+        self,
+        prompt: str,
+        params: Optional[SamplingParams] = None,
+        timeout: Optional[float] = GENERATION_TIMEOUT_S,
+    ) -> GenerationHandle:
+        """프롬프트를 대기열에 넣고 즉시 핸들을 반환한다.
+
+        ``timeout``초(대기열 대기 포함)가 지나면 생성이 중단되고 핸들은
+        :class:`GenerationTimeout`으로 끝난다. ``None``이면 제한 없음.
+        """
+        return self.submit_ids(self.tokenizer(prompt)["input_ids"], params, timeout)
+
+    def submit_ids(
+        self,
+        prompt_ids: List[int],
+        params: Optional[SamplingParams] = None,
+        timeout: Optional[float] = GENERATION_TIMEOUT_S,
+    ) -> GenerationHandle:
+        """이미 토큰화한 프롬프트를 제출한다 (여러 프롬프트를 한 번에 토큰화하는 배치 경로용)."""
+        deadline = time.monotonic() + timeout if timeout else None
+        handle = GenerationHandle(
+            next(self._ids), prompt_ids, params or SamplingParams(), deadline
+        )
+        self._ensure_started()
+        self.submitted += 1
+        self._pending.put(handle)
+        return handle
+
+    def generate(self, prompt: str, params: Optional[SamplingParams] = None) -> str:
+        """블로킹 호출: 다른 요청과 같은 배치에서 생성된 전체 답변을 반환한다."""
+        return self.submit(prompt, params).result()
+
+    def stream(
+        self,
+        prompt: str,
+        params: Optional[SamplingParams] = None,
+        timeout: Optional[float] = GENERATION_TIMEOUT_S,
+    ) -> Iterator[str]:
+        """블로킹 이터레이터: 디코드된 텍스트 청크를 생성되는 대로 yield한다.
+
+        소비자가 도중에 이터레이터를 닫으면(``close()``·GC) 생성을 취소한다. 이벤트 루프에서
+        다른 스레드로 청크를 기다리는 경우처럼 닫는 스레드와 기다리는 스레드가 다를 수 있으면
+        :meth:`submit`의 핸들을 직접 쓰고 :meth:`GenerationHandle.cancel`로 취소한다.
+        """
+        handle = self.submit(prompt, params, timeout)
+        try:
+            yield from handle
+        finally:
+            if not handle.done:
+                handle.cancel()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._pending.qsize()
+
+    @property
+    def active_count(self) -> int:
+        return len(self._active)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth,
+            "active": self.active_count,
+            "submitted": self.submitted,
+            "total_tokens": self.total_tokens,
+            "total_steps": self.total_steps,
+            "cancelled": self.cancelled,
+            "timed_out": self.timed_out,
+            "prefix_cache": self.prefix_cache.stats() if self.prefix_cache else None,
+            "speculative": {
+                "draft_tokens": self.draft_tokens,
+                "ngram": self.ngram,
+                "drafted": self.drafted,
+                "accepted": self.accepted,
+                "acceptance_rate": round(self.accepted / self.drafted, 4) if self.drafted else None,
+            }
+            if self.draft_tokens
+            else None,
+        }
+
+    # --------------------------------------------------------------- 스케줄러
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="generation-engine", daemon=True
+                )
+                self._thread.start()
+                # 인터프리터 종료 시 스케줄러가 torch 연산 도중 강제 종료되지 않도록 먼저 멈춘다.
+                atexit.register(self.shutdown)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """스케줄러 스레드를 멈춘다. 진행 중·대기 중인 요청은 오류로 종료된다."""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._pending.put(_STOP)  # type: ignore[arg-type]
+        thread.join(timeout)
+
+    def _run(self) -> None:
+        with torch.inference_mode():
+            while not self._stopping:
+                try:
+                    self._iterate()
+                except Exception as exc:  # noqa: BLE001
+                    logger.exception("생성 엔진 스텝 실패 — 활성 요청을 모두 실패 처리")
+                    self._fail_active(exc)
+        self._fail_active(RuntimeError("generation engine shut down"))
+        while True:
+            try:
+                handle = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if handle is not _STOP:
+                handle._finish(RuntimeError("generation engine shut down"))
+
+    def _fail_active(self, exc: BaseException) -> None:
+        for seq in self._active:
+            seq.handle._finish(exc)
+        self._active = []
+        self._cache = None
+        self._mask = None
+
+    def _iterate(self) -> None:
+        if not self._active:
+            self._take(self._pending.get())
+        while len(self._active) < self.max_batch_size and not self._stopping:
+            try:
+                handle = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            self._take(handle)
+        if self._active and not self._stopping:
+            self._reap()
+        if self._active and not self._stopping:
+            self._decode_step()
+
+    def _take(self, handle: Any) -> None:
+        if handle is _STOP:
+            self._stopping = True
+        else:
+            self._admit(handle)
+
+    def _admit(self, handle: GenerationHandle) -> None:
+        """새 요청을 단독 prefill한 뒤 배치 KV 캐시에 left-padding으로 합친다.
+
+        prefix 캐시가 있으면 재사용 가능한 앞부분은 건너뛰고 나머지 suffix만 prefill한다.
+        """
+        started = handle.admitted_at = time.monotonic()
+        QUEUE_WAIT_SECONDS.observe(started - handle.submitted_at)
+        if self._stop_if_requested(handle, started):
+            return
+        prompt_ids = handle.prompt_ids
+        input_ids = torch.tensor([prompt_ids], dtype=torch.long)
+        past, reused = (None, 0)
+        if self.prefix_cache is not None:
+            past, reused = self.prefix_cache.lookup(prompt_ids)
+        try:
+            out = self.model(
+                input_ids=input_ids[:, reused:],
+                attention_mask=torch.ones_like(input_ids),
+                position_ids=torch.arange(reused, len(prompt_ids)).unsqueeze(0),
+                past_key_values=past,
+                use_cache=True,
+            )
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("prefill 실패 (request=%d)", handle.request_id)
+            handle._finish(exc)
+            return
+        PREFILL_SECONDS.observe(time.monotonic() - started)
+
+        cache = _to_legacy(out.past_key_values)
+        if self.prefix_cache is not None:
+            self.prefix_cache.insert(prompt_ids, cache)
+            logger.debug(
+                "request=%d prefill %d/%d 토큰 (prefix 재사용 %d)",
+                handle.request_id, len(prompt_ids) - reused, len(prompt_ids), reused,
+            )
+
+        seq = _Sequence(
+            handle=handle,
+            seen_ids=input_ids[0].unique(),
+            position=len(prompt_ids),
+        )
+        token = self._sample(out.logits[:, -1, :], [seq])[0]
+        if self._accept(seq, token):
+            return
+        self._merge(cache, torch.ones_like(input_ids))
+        self._active.append(seq)
+
+    def _merge(self, cache: KVCache, mask: torch.Tensor) -> None:
+        if self._cache is None or self._mask is None:
+            self._cache, self._mask = cache, mask
+            return
+        length = max(self._mask.shape[1], mask.shape[1])
+        self._cache = tuple(
+            (
+                torch.cat([_pad_left(k0, length, 2), _pad_left(k1, length, 2)], dim=0),
+                torch.cat([_pad_left(v0, length, 2), _pad_left(v1, length, 2)], dim=0),
+            )
+            for (k0, v0), (k1, v1) in zip(self._cache, cache)
+        )
+        self._mask = torch.cat(
+            [_pad_left(self._mask, length, 1), _pad_left(mask, length, 1)], dim=0
+        )
+
+    def _stop_if_requested(self, handle: GenerationHandle, now: float) -> bool:
+        """취소·deadline 정지 조건. 걸리면 핸들을 끝내고 True를 반환한다."""
+        reason = handle._stop_reason(now)
+        if reason is None:
+            return False
+        if reason == "cancelled":
+            self.cancelled += 1
+            handle._finish()
+        else:
+            self.timed_out += 1
+            handle._finish(GenerationTimeout(f"generation {handle.request_id} exceeded deadline"))
+        logger.debug("request=%d %s (생성 %d 토큰)", handle.request_id, reason, handle.num_generated)
+        return True
+
+    def _reap(self) -> None:
+        """decode 스텝 직전에 취소·만료된 시퀀스를 배치에서 뺀다."""
+        now = time.monotonic()
+        keep = [
+            row
+            for row, seq in enumerate(self._active)
+            if not self._stop_if_requested(seq.handle, now)
+        ]
+        if len(keep) != len(self._active):
+            self._evict(keep)
+
+    def _decode_step(self) -> None:
+        if self.draft_tokens:
+            drafts = [self._draft(seq) for seq in self._active]
+            if any(drafts):
+                self._speculative_step(drafts)
+                return
+        active = self._active
+        input_ids = torch.tensor([[s.next_token] for s in active], dtype=torch.long)
+        position_ids = torch.tensor([[s.position] for s in active], dtype=torch.long)
+        mask = torch.cat([self._mask, self._mask.new_ones((len(active), 1))], dim=1)
+
+        out = self.model(
+            input_ids=input_ids,
+            attention_mask=mask,
+            position_ids=position_ids,
+            past_key_values=self._cache,
+            use_cache=True,
+        )
+        self._cache = _to_legacy(out.past_key_values)
+        self._mask = mask
+        self.total_steps += 1
+
+        tokens = self._sample(out.logits[:, -1, :], active)
+        keep: List[int] = []
+        for row, (seq, token) in enumerate(zip(active, tokens)):
+            seq.position += 1
+            if not self._accept(seq, token):
+                keep.append(row)
+        if len(keep) != len(active):
+            self._evict(keep)
+
+    # ---------------------------------------------------------- 추측 디코딩
+
+    def _draft(self, seq: _Sequence) -> List[int]:
+        """마지막 n-gram이 앞서 나온 가장 최근 자리의 뒷부분 (n은 ``ngram``부터 1까지)."""
+        limit = min(
+            self.draft_tokens, seq.handle.params.max_new_tokens - len(seq.generated) - 1
+        )
+        if limit <= 0:
+            return []
+        history = np.asarray(seq.handle.prompt_ids + seq.generated)
+        for n in range(min(self.ngram, len(history) - 1), 0, -1):
+            windows = sliding_window_view(history[:-1], n)
+            hits = np.flatnonzero((windows == history[-n:]).all(axis=1))
+            if len(hits):
+                start = int(hits[-1]) + n
+                return history[start:start + limit].tolist()
+        return []
+
+    def _speculative_step(self, drafts: List[List[int]]) -> None:
+        """행마다 ``[다음 토큰] + 초안``을 한 forward로 넣고 앞에서부터 맞는 만큼 받아들인다.
+
+        초안 길이가 행마다 다르므로 짧은 행은 뒤를 채워 넣고, 받아들이지 않은 열은
+        attention mask를 0으로 둔다. 위치는 행별 ``position_ids``로 주므로 구멍이 있어도 된다.
+        """
+        active = self._active
+        width = 1 + max(len(d) for d in drafts)
+        rows = [[seq.next_token] + draft for seq, draft in zip(active, drafts)]
+        input_ids = torch.tensor(
+            [row + [row[-1]] * (width - len(row)) for row in rows], dtype=torch.long
+        )
+        position_ids = torch.tensor(
+            [[seq.position + j for j in range(width)] for seq in active], dtype=torch.long
+        )
+        mask = torch.cat([self._mask, self._mask.new_ones((len(active), width))], dim=1)
+
+        out = self.model(
+            input_ids=input_ids,
+            attention_mask=mask,
+            position_ids=position_ids,
+            past_key_values=self._cache,
+            use_cache=True,
+        )
+        self._cache = _to_legacy(out.past_key_values)
+        self.total_steps += 1
+
+        first = mask.shape[1] - width
+        keep: List[int] = []
+        for row, (seq, draft, tokens) in enumerate(
+            zip(active, drafts, self._verify(out.logits, drafts))
+        ):
+            # 받아들인 초안은 이미 캐시에 들어갔다. 마지막 토큰은 다음 스텝의 입력이 된다.
+            matched = len(tokens) - 1
+            mask[row, first + 1 + matched:] = 0
+            seq.position += 1 + matched
+            seq.handle.num_drafted += len(draft)
+            seq.handle.num_accepted += matched
+            self.drafted += len(draft)
+            self.accepted += matched
+            if not any(self._accept(seq, token) for token in tokens):
+                keep.append(row)
+        self._mask = mask
+        if len(keep) != len(active):
+            self._evict(keep)
+        self._compact()
+
+    def _verify(self, logits: torch.Tensor, drafts: List[List[int]]) -> List[List[int]]:
+        """행마다 받아들일 토큰 목록: 맞은 초안 + (교정 토큰 또는 다음 토큰) 하나."""
+        active = self._active
+        pairs = [(row, j) for row, draft in enumerate(drafts) for j in range(len(draft) + 1)]
+        flat = logits[[r for r, _ in pairs], [j for _, j in pairs]].float()
+        params = [active[r].handle.params for r, _ in pairs]
+        _penalize(
+            flat,
+            [
+                torch.cat([active[r].seen_ids, torch.tensor(drafts[r][:j], dtype=torch.long)])
+                for r, j in pairs
+            ],
+            [p.repetition_penalty for p in params],
+        )
+        argmax = flat.argmax(dim=-1).tolist()
+        greedy = [not p.do_sample or p.temperature <= 0 for p in params]
+        if not all(greedy):
+            temps = torch.tensor([max(p.temperature, 1e-5) for p in params], dtype=flat.dtype)
+            top_p = torch.tensor([p.top_p for p in params], dtype=flat.dtype)
+            ids, probs = _top_p_probs(flat / temps[:, None], top_p)
+
+        results: List[List[int]] = []
+        at = 0
+        for draft in drafts:
+            tokens: List[int] = []
+            for j in range(len(draft) + 1):
+                proposed = draft[j] if j < len(draft) else None
+                if greedy[at + j]:
+                    tokens.append(argmax[at + j])
+                    if tokens[-1] != proposed:
+                        break
+                    continue
+                p = probs[at + j]
+                if proposed is not None:
+                    hit = ids[at + j] == proposed
+                    # 초안은 점질량 분포이므로 p(x)의 확률로 받아들인다.
+                    if float(torch.rand(())) < float(p[hit].sum()):
+                        tokens.append(proposed)
+                        continue
+                    p = p.masked_fill(hit, 0.0)
+                tokens.append(int(ids[at + j][torch.multinomial(p, num_samples=1)]))
+                break
+            results.append(tokens)
+            at += len(draft) + 1
+        return results
+
+    def _compact(self) -> None:
+        """mask 구멍이 ``_COMPACT_SLACK``열 넘게 쌓이면 행마다 유효한 열만 오른쪽으로 모은다."""
+        if self._mask is None:
+            return
+        length = int(self._mask.sum(dim=1).max())
+        total = self._mask.shape[1]
+        if total - length < _COMPACT_SLACK:
+            return
+        # 0/1 mask를 안정 정렬하면 유효한 열이 원래 순서대로 뒤에 모인다.
+        index = torch.argsort(self._mask, dim=1, stable=True)[:, total - length:]
+        self._mask = self._mask.gather(1, index)
+        gather = index[:, None, :, None]
+        self._cache = tuple(
+            (
+                k.gather(2, gather.expand(-1, k.shape[1], -1, k.shape[3])),
+                v.gather(2, gather.expand(-1, v.shape[1], -1, v.shape[3])),
+            )
+            for k, v in self._cache
+        )
+
+    def _evict(self, keep: List[int]) -> None:
+        """끝난 행을 배치에서 제거하고, 남은 행 모두가 패딩인 앞쪽 열을 잘라낸다."""
+        self._active = [self._active[i] for i in keep]
+        if not keep:
+            self._cache = None
+            self._mask = None
+            return
+        index = torch.tensor(keep, dtype=torch.long)
+        mask = self._mask.index_select(0, index)
+        start = int(mask.any(dim=0).nonzero()[0])
+        self._mask = mask[:, start:]
+        self._cache = tuple(
+            (k.index_select(0, index)[:, :, start:], v.index_select(0, index)[:, :, start:])
+            for k, v in self._cache
+        )
+
+    # -------------------------------------------------------------- 토큰 처리
+
+    def _accept(self, seq: _Sequence, token: int) -> bool:
+        """샘플된 토큰을 반영하고 시퀀스가 끝났으면 True를 반환한다."""
+        handle = seq.handle
+        if token in self.eos_token_ids:
+            self._emit(seq, final=True)
+            self._finish(handle)
+            return True
+
+        seq.generated.append(token)
+        seq.next_token = token
+        seq.seen_ids = torch.cat([seq.seen_ids, torch.tensor([token])]).unique()
+        handle.num_generated += 1
+        self.total_tokens += 1
+        if handle.first_token_at is None:
+            handle.first_token_at = time.monotonic()
+            TTFT_SECONDS.observe(handle.first_token_at - handle.submitted_at)
+
+        finished = len(seq.generated) >= handle.params.max_new_tokens
+        self._emit(seq, final=finished)
+        if finished:
+            self._finish(handle)
+        return finished
+
+    @staticmethod
+    def _finish(handle: GenerationHandle) -> None:
+        """정상 종료. 첫 토큰 이후의 decode 속도를 기록한다."""
+        if handle.first_token_at is not None and handle.num_generated > 1:
+            elapsed = time.monotonic() - handle.first_token_at
+            if elapsed > 0:
+                DECODE_TOKENS_PER_SECOND.observe((handle.num_generated - 1) / elapsed)
+        handle._finish()
+
+    def _emit(self, seq: _Sequence, final: bool = False) -> None:
+        text = self.tokenizer.decode(seq.generated, skip_special_tokens=True)
+        # 멀티바이트 문자가 아직 완성되지 않았으면 다음 토큰까지 미룬다 (마지막에는 그대로 내보냄).
+        if (text.endswith("\ufffd") and not final) or len(text) <= seq.printed:
+            return
+        seq.handle._put(text[seq.printed:])
+        seq.printed = len(text)
+
+    @staticmethod
+    def _sample(logits: torch.Tensor, seqs: List[_Sequence]) -> List[int]:
+        """행별 repetition penalty → temperature → top-p 순으로 적용해 토큰을 뽑는다."""
+        logits = logits.float().clone()
+        _penalize(
+            logits, [s.seen_ids for s in seqs], [s.handle.params.repetition_penalty for s in seqs]
+        )
+
+        greedy = [not s.handle.params.do_sample or s.handle.params.temperature <= 0 for s in seqs]
+        if all(greedy):
+            return logits.argmax(dim=-1).tolist()
+
+        temps = torch.tensor(
+            [max(s.handle.params.temperature, 1e-5) for s in seqs], dtype=logits.dtype
+        )
+        top_p = torch.tensor([s.handle.params.top_p for s in seqs], dtype=logits.dtype)
+        ids, probs = _top_p_probs(logits / temps[:, None], top_p)
+        picked = torch.multinomial(probs, num_samples=1)
+        sampled = ids.gather(-1, picked).squeeze(-1)
+
+        argmax = logits.argmax(dim=-1)
+        return [
+            int(argmax[row]) if greedy[row] else int(sampled[row]) for row in range(len(seqs))
+        ]
+
+
+def build_generation_engine(
+    model: PreTrainedModel, tokenizer: PreTrainedTokenizerBase
+) -> GenerationEngine:
+    """config 기본값(배치 크기·prefix 캐시·추측 디코딩)으로 엔진을 만든다. 추론 워커도 이걸 쓴다."""
+    prefix_cache = None
+    if PREFIX_CACHE_MB > 0:
+        prefix_cache = PrefixCache(PREFIX_CACHE_MB * 1024 * 1024, block_size=PREFIX_CACHE_BLOCK)
+    return GenerationEngine(model, tokenizer, prefix_cache=prefix_cache)
+
+
+@lru_cache(maxsize=1)
+def get_generation_engine() -> "GenerationEngine | WorkerPool":
+    """프로세스 수명 동안 하나만 존재하는 생성 엔진.
+
+    ``INFERENCE_WORKERS``가 0이면 raw 모델/토크나이저를 소유한 :class:`GenerationEngine`,
+    아니면 같은 제출 API로 추론 워커 프로세스들에 나눠 주는
+    :class:`~llama_modular_rag.worker_pool.WorkerPool` (이 프로세스는 모델을 로드하지 않는다).
+    """
+    if INFERENCE_WORKERS > 0:
+        from llama_modular_rag.worker_pool import WorkerPool
+
+        return WorkerPool(INFERENCE_WORKERS)
+    return build_generation_engine(get_llama_model(), get_llama_tokenizer())
@@ -0,0 +1,294 @@
+"""FAISS 기반 벡터 저장소 (Chroma 대안).
+
+디렉터리 하나에 다음 파일을 둔다::
+
+    index.faiss          FAISS 인덱스 (flat / ivf / hnsw). 열 때 mmap으로 매핑한다.
+    chunks.bin           청크 본문 사이드카 (:mod:`llama_modular_rag.chunk_sidecar`)
+    chunks.offsets.npy   레코드 경계 오프셋. mmap으로 연다.
+    store.json           인덱스 종류·차원·청크 수
+
+여는 비용은 파일 몇 개를 매핑하는 것뿐이라 sqlite·HNSW를 적재하는 Chroma보다 훨씬
+빠르고, 검색 결과 청크만 그때그때 디코드한다. 거리는 Chroma 기본값과 같은 제곱 L2라서
+두 백엔드의 점수를 섞어 비교해도 된다.
+
+빌드는 ``add_texts``/``add_embeddings``로 임베딩을 임시 파일에 쌓아 두었다가
+:meth:`FaissVectorStore.save`에서 한 번에 인덱스를 만든다 (IVF 학습에 전체 분포가 필요).
+저장 전에는 검색할 수 없다.
+
+``faiss``는 이 백엔드를 쓸 때만 import한다.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from llama_modular_rag.chunk_sidecar import ChunkReader, append_chunks, finalize_chunks
+from llama_modular_rag.config import (
+    FAISS_HNSW_EF_SEARCH,
+    FAISS_HNSW_M,
+    FAISS_INDEX_TYPE,
+    FAISS_IVF_NPROBE,
+)
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+
+_INDEX_FILE = "index.faiss"
+_CONFIG_FILE = "store.json"
+_SPOOL_FILE = "vectors.spool.f32"  # 빌드 중 임베딩 임시 저장 (save 후 삭제)
+
+# IVF는 리스트당 학습 벡터가 충분해야 의미가 있다. 그보다 작으면 flat으로 만든다.
+_IVF_MIN_POINTS_PER_LIST = 39
+_IVF_MIN_LISTS = 16
+_IVF_TRAIN_SAMPLE = 65_536
+_ADD_BATCH = 16_384
+
+
+def is_faiss_store(path: str) -> bool:
+    return os.path.exists(os.path.join(path, _CONFIG_FILE))
+
+
+def _build_index(vectors: np.ndarray, index_type: str) -> Tuple[Any, str]:
+    """``vectors``(n × d, float32)로 인덱스를 만든다. 실제로 만든 종류도 함께 반환."""
+    import faiss
+
+    n, dim = vectors.shape
+    if index_type == "ivf":
+        nlist = min(int(4 * math.sqrt(n)), n // _IVF_MIN_POINTS_PER_LIST)
+        if nlist < _IVF_MIN_LISTS:
+            logger.info("청크 %d개는 IVF 학습에 부족해 flat 인덱스로 만든다", n)
+            index_type = "flat"
+        else:
+            index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist, faiss.METRIC_L2)
+            sample = vectors
+            if n > _IVF_TRAIN_SAMPLE:
+                rows = np.random.default_rng(0).choice(n, _IVF_TRAIN_SAMPLE, replace=False)
+                sample = vectors[np.sort(rows)]
+            index.train(np.ascontiguousarray(sample))
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, FAISS_HNSW_M, faiss.METRIC_L2)
+    elif index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+
+    for start in range(0, n, _ADD_BATCH):
+        index.add(np.ascontiguousarray(vectors[start:start + _ADD_BATCH]))
+    return index, index_type
+
+
+class FaissVectorStore(VectorStore):
+    """LangChain ``VectorStore`` 인터페이스의 FAISS 구현 (``similarity_search`` 계열만)."""
+
+    def __init__(
+        self,
+        persist_dir: str,
+        embedding: Optional[Embeddings],
+        index_type: str = FAISS_INDEX_TYPE,
+    ) -> None:
+        """``embedding``은 이미 계산된 임베딩만 넣어 빌드할 때(이전 도구) ``None``이어도 된다."""
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"지원하지 않는 FAISS 인덱스: {index_type} (가능: {INDEX_TYPES})")
+        self.persist_dir = persist_dir
+        self.embedding = embedding
+        self.index_type = index_type
+        self.dim: Optional[int] = None
+        self.count = 0
+
+        self._index: Any = None
+        self._chunks: Optional[ChunkReader] = None
+
+        if is_faiss_store(persist_dir):
+            self._open()
+
+    # ------------------------------------------------------------------ 열기
+    @classmethod
+    def load(cls, persist_dir: str, embedding: Embeddings) -> "FaissVectorStore":
+        if not is_faiss_store(persist_dir):
+            raise FileNotFoundError(persist_dir)
+        return cls(persist_dir, embedding)
+
+    def _open(self) -> None:
+        import faiss
+
+        with open(os.path.join(self.persist_dir, _CONFIG_FILE), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        self.index_type = config["index_type"]
+        self.dim = config["dim"]
+        self.count = config["count"]
+
+        self._index = faiss.read_index(
+            os.path.join(self.persist_dir, _INDEX_FILE),
+            faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY,
+        )
+        if self.index_type == "ivf":
+            faiss.extract_index_ivf(self._index).nprobe = FAISS_IVF_NPROBE
+        elif self.index_type == "hnsw":
+            self._index.hnsw.efSearch = FAISS_HNSW_EF_SEARCH
+        self._chunks = ChunkReader(self.persist_dir)
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding
+
+    # ------------------------------------------------------------------ 빌드
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas)
+
+    def add_embeddings(
+        self,
+        texts: Sequence[str],
+        embeddings: Any,
+        metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    ) -> List[str]:
+        """미리 계산된 임베딩을 빌드 스풀에 덧붙인다 (Chroma 이전 등 재임베딩 없이)."""
+        if self._index is not None:
+            raise RuntimeError("저장된 FAISS 저장소에는 추가할 수 없습니다 (읽기 전용 mmap).")
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts):
+            raise ValueError("texts와 embeddings의 개수/모양이 맞지 않습니다.")
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"임베딩 차원 불일치: {vectors.shape[1]} != {self.dim}")
+
+        os.makedirs(self.persist_dir, exist_ok=True)
+        with open(os.path.join(self.persist_dir, _SPOOL_FILE), "ab") as spool:
+            spool.write(vectors.tobytes())
+        append_chunks(self.persist_dir, texts, metadatas)
+
+        ids = [str(i) for i in range(self.count, self.count + len(texts))]
+        self.count += len(texts)
+        return ids
+
+    def save(self) -> None:
+        """스풀된 임베딩으로 인덱스를 만들고 읽기 전용(mmap)으로 다시 연다."""
+        if self._index is not None:
+            return
+        os.makedirs(self.persist_dir, exist_ok=True)
+        spool_path = os.path.join(self.persist_dir, _SPOOL_FILE)
+        dim = self.dim or 0
+        if self.count and dim:
+            vectors = np.memmap(spool_path, dtype=np.float32, mode="r", shape=(self.count, dim))
+        else:
+            vectors = np.zeros((0, dim or 1), dtype=np.float32)
+        index, built_type = _build_index(vectors, self.index_type)
+
+        import faiss
+
+        faiss.write_index(index, os.path.join(self.persist_dir, _INDEX_FILE))
+        finalize_chunks(self.persist_dir, self.count)
+        del vectors
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+
+        with open(os.path.join(self.persist_dir, _CONFIG_FILE), "w", encoding="utf-8") as f:
+            json.dump({"index_type": built_type, "dim": dim, "count": self.count}, f)
+        self._open()
+
+    # ------------------------------------------------------------------ 검색
+    def documents(self) -> Iterator[Document]:
+        """저장된 청크를 순서대로 (희소 인덱스 재생성 등)."""
+        if self._chunks is None:
+            raise RuntimeError("FAISS 저장소가 아직 저장되지 않았습니다 (save() 필요).")
+        return self._chunks.documents()
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding: Sequence[float], k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """``(문서, 제곱 L2 거리)`` 목록. 거리가 작을수록 가깝다 (Chroma와 같은 규약)."""
+        if self._index is None:
+            raise RuntimeError("FAISS 저장소가 아직 저장되지 않았습니다 (save() 필요).")
+        if not self.count:
+            return []
+        query = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        distances, ids = self._index.search(query, min(k, self.count))
+        return [
+            (self._chunks.document(int(i)), float(d))
+            for d, i in zip(distances[0], ids[0])
+            if i >= 0
+        ]
+
+    def similarity_search_by_vectors_with_relevance_scores(
+        self, embeddings: Sequence[Sequence[float]], k: int = 4
+    ) -> List[List[Tuple[Document, float]]]:
+        """쿼리 여러 개를 ``index.search`` 한 번으로. 쿼리마다 ``(문서, 제곱 L2 거리)`` 목록."""
+        if self._index is None:
+            raise RuntimeError("FAISS 저장소가 아직 저장되지 않았습니다 (save() 필요).")
+        if not self.count:
+            return [[] for _ in embeddings]
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+        distances, ids = self._index.search(queries, min(k, self.count))
+        return [
+            [(self._chunks.document(int(i)), float(d)) for d, i in zip(row_d, row_i) if i >= 0]
+            for row_d, row_i in zip(distances, ids)
+        ]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k)
+        ]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_relevance_scores(
+            self.embedding.embed_query(query), k
+        )
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        *,
+        persist_dir: str,
+        index_type: str = FAISS_INDEX_TYPE,
+        **kwargs: Any,
+    ) -> "FaissVectorStore":
+        store = cls(persist_dir, embedding, index_type=index_type)
+        store.add_texts(texts, metadatas)
+        store.save()
+        return store
+
+    def close(self) -> None:
+        self._index = None
+        self._chunks = None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from llama_modular_rag.data_loader import list_doc_ids, migrate_to_faiss
+
+    parser = argparse.ArgumentParser(description="Chroma 저장소를 FAISS 저장소로 이전한다 (재임베딩 없음)")
+    parser.add_argument("doc_ids", nargs="*", help="이전할 doc_id (생략하면 전부)")
+    parser.add_argument("--index", choices=INDEX_TYPES, default=FAISS_INDEX_TYPE)
+    parser.add_argument("--force", action="store_true", help="이미 있는 FAISS 저장소도 다시 만든다")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    for doc_id in args.doc_ids or list_doc_ids():
+        try:
+            print(json.dumps(migrate_to_faiss(doc_id, index_type=args.index, force=args.force)))
+        except KeyError:
+            print(json.dumps({"doc_id": doc_id, "error": "Chroma 저장소 없음"}, ensure_ascii=False))
@@ -1,7 +1,5 @@
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import PromptTemplate
+import time
 
-from llama_modular_rag.llm_setup import setup_llama_model
 from llama_modular_rag.state import RAGState
 
 ANSWER_PROMPT_TEXT = """다음 정보를 기반으로 질문에 간결하게 답변해주세요.
@@ -13,13 +11,27 @@ ANSWER_PROMPT_TEXT = """다음 정보를 기반으로 질문에 간결하게 답
 
 답변:"""
 
-_ANSWER_PROMPT = PromptTemplate.from_template(ANSWER_PROMPT_TEXT)
-
 
 def answer_generator(state: RAGState) -> RAGState:
-    """컨텍스트와 쿼리를 사용해 답변을 생성한다."""
-    chain = _ANSWER_PROMPT | setup_llama_model() | StrOutputParser()
-    answer: str = chain.invoke(
-        {"context": state.get("context", ""), "query": state["query"]}
-    )
+    """컨텍스트와 쿼리를 사용해 답변을 생성한다.
+
+    생성은 공유 :class:`~llama_modular_rag.engine.GenerationEngine`에 제출되므로
+    동시에 들어온 다른 요청(스트리밍 포함)과 같은 decode 배치에서 처리된다.
+    """
+    # 엔진 모듈은 torch를 끌어오므로 프롬프트 텍스트만 필요한 쪽(SSE·배치)이 함께 싣지 않게 한다.
+    from llama_modular_rag.engine import get_generation_engine
+
+    prompt = ANSWER_PROMPT_TEXT.format(context=state.get("context", ""), query=state["query"])
+    trace = state.get("trace")
+    if trace is None:
+        answer: str = get_generation_engine().generate(prompt)
+        return {**state, "answer": answer}
+
+    # 추적 중이면 핸들의 타임스탬프로 토큰화·대기열·prefill·decode 구간을 나눠 남긴다.
+    started = time.monotonic()
+    handle = get_generation_engine().submit(prompt)
+    try:
+        answer = handle.result()
+    finally:
+        trace.add_generation(handle, started, time.monotonic())
     return {**state, "answer": answer}
@@ -1,26 +1,42 @@
 from typing import Any
-from langgraph.graph import StateGraph, END
-from langchain_community.vectorstores import Chroma
+from langchain_core.vectorstores import VectorStore
 from llama_modular_rag.state import RAGState
-from llama_modular_rag.retrieval import document_retriever, context_builder
+from llama_modular_rag.config import RERANK_CANDIDATES, RERANK_ENABLED, RETRIEVAL_TOP_K
+from llama_modular_rag.retrieval import context_builder, document_reranker, document_retriever
 from llama_modular_rag.generation import answer_generator
+from llama_modular_rag.tracing import traced
 
 
-def build_rag_graph(vectorstore: Chroma) -> Any:
-    """최소한의 노드만 사용하는 간소화된 RAG 워크플로우"""
+def build_rag_graph(vectorstore: VectorStore, rerank: bool = RERANK_ENABLED) -> Any:
+    """최소한의 노드만 사용하는 간소화된 RAG 워크플로우
+
+    ``rerank``가 켜지면 후보를 ``RERANK_CANDIDATES``개 검색한 뒤 "문서 재순위"에서
+    cross-encoder로 추려 컨텍스트에 넘긴다.
+
+    모든 노드는 :func:`~llama_modular_rag.tracing.traced`로 감싸져 있어, 상태에 ``trace``가
+    있으면 노드 이름으로 span이 기록된다.
+    """
+    from langgraph.graph import StateGraph, END  # 첫 문서를 열 때 import (앱 부팅 경로 밖)
+
     # 상태 그래프 생성
     graph = StateGraph(RAGState)
 
     # 최소한의 노드만 추가 - 노드 이름을 보기 좋게 설정
+    k = RERANK_CANDIDATES if rerank else RETRIEVAL_TOP_K
     graph.add_node(
         "문서 검색",
-        lambda state: document_retriever(state, vectorstore)
+        traced("문서 검색", lambda state: document_retriever(state, vectorstore, k=k)),
     )
-    graph.add_node("컨텍스트 생성", context_builder)
-    graph.add_node("답변 생성", answer_generator)
+    graph.add_node("컨텍스트 생성", traced("컨텍스트 생성", context_builder))
+    graph.add_node("답변 생성", traced("답변 생성", answer_generator))
 
     # 직선형 흐름으로 단순화
-    graph.add_edge("문서 검색", "컨텍스트 생성")
+    if rerank:
+        graph.add_node("문서 재순위", traced("문서 재순위", document_reranker))
+        graph.add_edge("문서 검색", "문서 재순위")
+        graph.add_edge("문서 재순위", "컨텍스트 생성")
+    else:
+        graph.add_edge("문서 검색", "컨텍스트 생성")
     graph.add_edge("컨텍스트 생성", "답변 생성")
     graph.add_edge("답변 생성", END)
 
@@ -1,61 +1,66 @@
+from __future__ import annotations
+
 import logging
 from functools import lru_cache
+from typing import TYPE_CHECKING
 
-import torch
-from langchain_huggingface import HuggingFacePipeline
-from transformers import (
-    AutoModelForCausalLM,
-    AutoTokenizer,
-    PreTrainedModel,
-    PreTrainedTokenizerBase,
-    pipeline,
-)
+from llama_modular_rag.config import LLAMA_MODEL_PATH, LLM_PRECISION, apply_torch_threads
 
-from llama_modular_rag.config import LLAMA_MODEL_PATH, MAX_NEW_TOKENS, TEMPERATURE, TOP_P
+if TYPE_CHECKING:
+    from transformers import PreTrainedModel, PreTrainedTokenizerBase
 
 logger = logging.getLogger(__name__)
 
+PRECISIONS = ("fp32", "bf16", "int8")
+
 
 @lru_cache(maxsize=1)
 def get_llama_tokenizer() -> PreTrainedTokenizerBase:
     """프로세스 수명 동안 한 번만 로드되는 토크나이저."""
+    # torch·transformers는 첫 로드 때 import한다 (앱 import 경로를 가볍게 유지).
+    from transformers import AutoTokenizer
+
     return AutoTokenizer.from_pretrained(LLAMA_MODEL_PATH)
 
 
-@lru_cache(maxsize=1)
-def get_llama_model() -> PreTrainedModel:
-    """프로세스 수명 동안 한 번만 로드되는 raw transformers 모델 (스트리밍용)."""
-    logger.info("Llama 모델을 CPU 모드로 로드 중...")
+def load_llama_model(
+    precision: str = LLM_PRECISION, model_path: str = LLAMA_MODEL_PATH
+) -> PreTrainedModel:
+    """지정한 정밀도로 Llama 모델을 새로 로드한다 (캐시 없음, 벤치마크용으로도 사용).
+
+    - ``fp32``: 기존 동작.
+    - ``bf16``: 가중치를 bfloat16으로 로드 — 메모리·대역폭 절반.
+    - ``int8``: fp32로 로드한 뒤 ``nn.Linear``만 동적 int8 양자화 (임베딩/정규화는 fp32 유지).
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"지원하지 않는 정밀도: {precision!r} (가능: {', '.join(PRECISIONS)})")
+    import torch
+    from transformers import AutoModelForCausalLM
+
+    apply_torch_threads()
+    logger.info("Llama 모델을 CPU 모드로 로드 중... (precision=%s)", precision)
     model = AutoModelForCausalLM.from_pretrained(
-        LLAMA_MODEL_PATH,
-        torch_dtype=torch.float32,
+        model_path,
+        torch_dtype=torch.bfloat16 if precision == "bf16" else torch.float32,
         low_cpu_mem_usage=True,
         device_map={"": "cpu"},
         trust_remote_code=False,
     )
     model.eval()
+    if precision == "int8":
+        # inplace로 바꿔 fp32 사본이 두 벌 잡히는 순간을 피한다.
+        torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
     logger.info("모델이 CPU에 로드되었습니다. device=%s", next(model.parameters()).device)
     return model
 
 
 @lru_cache(maxsize=1)
-def setup_llama_model() -> HuggingFacePipeline:
-    """LangGraph가 사용하는 LangChain 파이프라인. raw 모델/토크나이저를 공유한다."""
-    tokenizer = get_llama_tokenizer()
-    model = get_llama_model()
-
-    # 모델은 device_map={"": "cpu"}로 이미 CPU에 적재돼 있다.
-    # pipeline()에 device 인자를 같이 주면 accelerate와 충돌해 ValueError가 난다.
-    pipe = pipeline(
-        "text-generation",
-        model=model,
-        tokenizer=tokenizer,
-        max_new_tokens=MAX_NEW_TOKENS,
-        do_sample=True,
-        temperature=TEMPERATURE,
-        top_p=TOP_P,
-        repetition_penalty=1.1,
-        batch_size=1,
-        return_full_text=False,
-    )
-    return HuggingFacePipeline(pipeline=pipe)
+def get_llama_model() -> PreTrainedModel:
+    """프로세스 수명 동안 한 번만 로드되는 raw transformers 모델.
+
+    생성은 모두 이 인스턴스를 소유한 :class:`~llama_modular_rag.engine.GenerationEngine`을
+    거치므로 ``LLM_PRECISION``은 블로킹·스트리밍 경로에 똑같이 적용된다.
+    """
+    return load_llama_model(LLM_PRECISION)
@@ -17,8 +17,9 @@ init_runtime()
 import psutil  # noqa: E402
 
 from llama_modular_rag.caching import QueryCache  # noqa: E402
-from llama_modular_rag.data_loader import create_vectorstore_from_pdf  # noqa: E402
+from llama_modular_rag.data_loader import create_vectorstore_from_pdf, open_sparse_index  # noqa: E402
 from llama_modular_rag.graph_builder import build_rag_graph  # noqa: E402
+from llama_modular_rag.sparse_index import with_lexical  # noqa: E402
 
 logger = logging.getLogger(__name__)
 
@@ -73,7 +74,8 @@ def run_optimized_rag(pdf_path: str, query: str, visualize: bool = True) -> Dict
         return cached
 
     logger.info("RAG 그래프 구축")
-    rag_graph = build_rag_graph(vectorstore)
+    sparse = open_sparse_index(doc_id, vectorstore)
+    rag_graph = build_rag_graph(with_lexical(vectorstore, [(None, sparse)]))
 
     if visualize:
         output_dir: str = os.path.join(
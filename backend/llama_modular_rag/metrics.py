@@ -0,0 +1,191 @@
+"""Prometheus 텍스트 형식 지표.
+
+요청 경로에서 부르는 :meth:`Histogram.observe`는 락을 잡지 않는다. 스레드마다 자기 버킷 배열
+(``threading.local``)에만 쓰고, 배열은 그 스레드가 처음 관측할 때 한 번 목록에 붙는다.
+스크레이프(:func:`render`) 때 모든 스레드의 배열을 더한다. 쓰는 쪽이 하나뿐이라 증가가
+유실되지 않고, 읽는 쪽은 진행 중인 관측 하나쯤을 놓칠 수 있을 뿐이다. 끝난 스레드의 배열은
+스크레이프 때 기본 배열에 합치고 목록에서 뺀다 (스레드 풀이 스레드를 계속 바꿔도 배열 수 =
+살아 있는 스레드 수).
+
+캐시 적중 수·대기열 깊이·RSS처럼 다른 객체가 이미 들고 있는 값은 스크레이프 시점에 읽어
+:class:`Sample`로 넘긴다 (요청 경로 비용 0).
+"""
+from __future__ import annotations
+
+import math
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+RATE_BUCKETS: Tuple[float, ...] = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+_registry: List["Histogram"] = []
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels.items()
+    )
+    return "{" + inner + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _HistogramChild:
+    """레이블 값 조합 하나의 히스토그램. 셀 = ``[버킷별 개수..., +Inf 개수, 합]``."""
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self._bounds = bounds
+        self._local = threading.local()
+        # (주인 스레드, 셀). 끝난 스레드의 셀은 스크레이프 때 _base로 옮긴다.
+        self._cells: List[Tuple[threading.Thread, List[float]]] = []
+        self._base: List[float] = self._new_cell()
+        self._fold_lock = threading.Lock()  # 스크레이프끼리만 — observe는 잡지 않는다
+
+    def _new_cell(self) -> List[float]:
+        return [0] * (len(self._bounds) + 1) + [0.0]
+
+    def observe(self, value: float) -> None:
+        cell = getattr(self._local, "cell", None)
+        if cell is None:
+            cell = self._new_cell()
+            self._local.cell = cell
+            # list.append는 GIL 아래에서 원자적
+            self._cells.append((threading.current_thread(), cell))
+        cell[bisect_left(self._bounds, value)] += 1
+        cell[-1] += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._fold_lock:
+            base = self._base
+            for entry in list(self._cells):
+                thread, cell = entry
+                if thread.is_alive():
+                    continue
+                # 끝난 스레드는 더 쓰지 않으므로 합쳐도 유실이 없다. remove도 원자적이라
+                # 그사이 다른 스레드의 append와 부딪히지 않는다.
+                for i in range(len(base)):
+                    base[i] += cell[i]
+                self._cells.remove(entry)
+            counts = list(base[:-1])
+            total = base[-1]
+            for _, cell in list(self._cells):
+                for i in range(len(counts)):
+                    counts[i] += cell[i]
+                total += cell[-1]
+        return counts, total
+
+
+class Histogram:
+    """``le`` 버킷 히스토그램. 레이블이 있으면 :meth:`labels`로 자식을 얻어 관측한다."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.bounds = tuple(sorted(float(b) for b in buckets))
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+        if not self.labelnames:
+            self._children[()] = _HistogramChild(self.bounds)
+        _registry.append(self)
+
+    def labels(self, *values: str) -> _HistogramChild:
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: 레이블 {self.labelnames}에 값 {values}")
+        child = self._children.get(values)
+        if child is None:
+            # 조합마다 처음 한 번만 만든다. 경합해도 setdefault가 하나만 남긴다.
+            child = self._children.setdefault(values, _HistogramChild(self.bounds))
+        return child
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for values, child in sorted(self._children.items()):
+            labels = dict(zip(self.labelnames, values))
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), counts):
+                cumulative += count
+                le = _format_labels({**labels, "le": _format_value(bound)})
+                yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+
+@dataclass
+class Sample:
+    """스크레이프 시점에 읽은 gauge/counter 값 하나 (같은 ``name``끼리 한 묶음으로 출력)."""
+
+    name: str
+    documentation: str
+    kind: str  # "gauge" / "counter"
+    value: float
+    labels: Dict[str, str] = field(default_factory=dict)
+
+
+def render(samples: Iterable[Sample] = ()) -> str:
+    """등록된 히스토그램과 ``samples``를 Prometheus 텍스트 형식으로."""
+    lines: List[str] = []
+    for histogram in list(_registry):
+        lines.extend(histogram.render())
+    families: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        families.setdefault(sample.name, []).append(sample)
+    for name, group in families.items():
+        lines.append(f"# HELP {name} {group[0].documentation}")
+        lines.append(f"# TYPE {name} {group[0].kind}")
+        for sample in group:
+            lines.append(f"{name}{_format_labels(sample.labels)} {_format_value(sample.value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------------------------------------------- 파이프라인 지표
+
+RETRIEVAL_SECONDS = Histogram(
+    "rag_retrieval_seconds", "문서 검색(dense 또는 hybrid) 시간"
+)
+RERANK_SECONDS = Histogram("rag_rerank_seconds", "cross-encoder 재순위 시간")
+CONTEXT_BUILD_SECONDS = Histogram(
+    "rag_context_build_seconds",
+    "context_builder 시간",
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+DOCUMENT_LEASE_WAIT_SECONDS = Histogram(
+    "rag_document_lease_wait_seconds", "문서 풀에서 문서를 빌리기까지 기다린 시간 (디스크 로드 포함)"
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "rag_generation_queue_wait_seconds", "생성 요청이 엔진 대기열에서 prefill 시작까지 기다린 시간"
+)
+PREFILL_SECONDS = Histogram("rag_prefill_seconds", "요청 하나의 prefill forward 시간")
+TTFT_SECONDS = Histogram(
+    "rag_time_to_first_token_seconds", "엔진 제출부터 첫 토큰까지 (대기열 대기 포함)"
+)
+DECODE_TOKENS_PER_SECOND = Histogram(
+    "rag_decode_tokens_per_second", "요청별 첫 토큰 이후 decode 속도", buckets=RATE_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "rag_request_seconds", "API 요청 전체 지연", labelnames=("endpoint", "cached")
+)
@@ -0,0 +1,184 @@
+"""safetensors 가중치를 mmap으로 열어 여러 프로세스가 같은 물리 페이지를 쓰게 한다.
+
+``from_pretrained``는 가중치를 프로세스 메모리로 복사하므로 추론 워커를 N개 띄우면 RAM도
+N배가 된다. 여기서는 safetensors 헤더만 읽고 텐서를 파일 mmap(copy-on-write) 위의
+``torch.frombuffer`` 뷰로 만든 뒤 ``load_state_dict(assign=True)``로 모델 파라미터 자리에
+그대로 끼운다. 쓰지 않는 페이지는 페이지 캐시 한 벌을 모든 워커가 공유한다.
+
+저장된 dtype이 목표 정밀도와 다르면(예: bf16 체크포인트를 fp32로) 변환본을
+``WEIGHTS_CACHE_DIR``에 한 번 써 두고 그 파일을 mmap한다. ``int8``은 ``Linear`` 가중치를
+양자화하며 새로 만들므로 그 부분은 워커마다 따로 잡힌다.
+"""
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+import torch
+from transformers import AutoConfig, AutoModelForCausalLM, PreTrainedModel
+from transformers.modeling_utils import no_init_weights
+
+from llama_modular_rag.config import LLAMA_MODEL_PATH, LLM_PRECISION, WEIGHTS_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+_DTYPES: Dict[str, torch.dtype] = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+_NAMES = {dtype: name for name, dtype in _DTYPES.items()}
+
+
+def read_header(path: str) -> Tuple[Dict[str, Any], int]:
+    """safetensors 헤더(JSON)와 데이터 영역 시작 오프셋."""
+    with open(path, "rb") as f:
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length))
+    header.pop("__metadata__", None)
+    return header, 8 + length
+
+
+def mmap_state_dict(path: str) -> Dict[str, torch.Tensor]:
+    """파일을 mmap하고 텐서마다 그 위의 뷰를 만든다 (복사 없음).
+
+    ``ACCESS_COPY``(MAP_PRIVATE)라 파일은 바뀌지 않고, 쓰지 않는 한 페이지는 다른 프로세스와 공유된다.
+    뷰가 mmap 객체를 참조하므로 텐서가 살아 있는 동안 매핑도 유지된다.
+    """
+    header, start = read_header(path)
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    tensors: Dict[str, torch.Tensor] = {}
+    for name, info in header.items():
+        dtype = _DTYPES[info["dtype"]]
+        begin, end = info["data_offsets"]
+        shape = info["shape"]
+        count = (end - begin) // dtype.itemsize
+        if count == 0:
+            tensors[name] = torch.empty(shape, dtype=dtype)
+            continue
+        tensors[name] = torch.frombuffer(
+            mapped, dtype=dtype, count=count, offset=start + begin
+        ).view(shape)
+    return tensors
+
+
+def _checkpoint_files(model_path: str) -> List[str]:
+    files = sorted(glob.glob(os.path.join(model_path, "*.safetensors")))
+    if not files:
+        raise FileNotFoundError(f"safetensors 가중치가 없습니다: {model_path}")
+    return files
+
+
+def _convert(path: str, dtype: torch.dtype, out_path: str) -> None:
+    """부동소수점 텐서를 ``dtype``으로 바꾼 safetensors를 텐서 하나씩 스트리밍으로 쓴다."""
+    header, _ = read_header(path)
+    source = mmap_state_dict(path)
+    converted: Dict[str, Any] = {}
+    offset = 0
+    for name in sorted(header):
+        tensor = source[name]
+        target = dtype if tensor.is_floating_point() else tensor.dtype
+        nbytes = tensor.numel() * target.itemsize
+        converted[name] = {
+            "dtype": _NAMES[target],
+            "shape": list(tensor.shape),
+            "data_offsets": [offset, offset + nbytes],
+        }
+        offset += nbytes
+    encoded = json.dumps(converted, separators=(",", ":")).encode()
+    encoded += b" " * (-len(encoded) % 8)  # 데이터 영역을 8바이트로 정렬한다
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(out_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(struct.pack("<Q", len(encoded)))
+            out.write(encoded)
+            for name in sorted(header):
+                tensor = source[name]
+                if tensor.is_floating_point():
+                    tensor = tensor.to(dtype)
+                out.write(tensor.contiguous().view(-1).view(torch.uint8).numpy().tobytes())
+        os.replace(tmp, out_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def shared_checkpoint(model_path: str, dtype: torch.dtype) -> List[str]:
+    """모든 부동소수점 텐서가 ``dtype``인 safetensors 파일 목록. 필요하면 변환본을 만든다.
+
+    여러 워커가 동시에 불러도 같은 변환본을 쓰도록 원자적으로(임시 파일 → rename) 쓴다.
+    """
+    files = []
+    for path in _checkpoint_files(model_path):
+        header, _ = read_header(path)
+        stored = {_DTYPES[info["dtype"]] for info in header.values()}
+        if all(not d.is_floating_point or d == dtype for d in stored):
+            files.append(path)
+            continue
+        stat = os.stat(path)
+        digest = hashlib.sha256(
+            f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+        ).hexdigest()[:16]
+        out_path = os.path.join(WEIGHTS_CACHE_DIR, f"{digest}-{_NAMES[dtype].lower()}.safetensors")
+        if not os.path.exists(out_path):
+            os.makedirs(WEIGHTS_CACHE_DIR, exist_ok=True)
+            logger.info("가중치 변환본 생성: %s → %s", os.path.basename(path), out_path)
+            _convert(path, dtype, out_path)
+        files.append(out_path)
+    return files
+
+
+def load_shared_llama_model(
+    precision: str = LLM_PRECISION, model_path: str = LLAMA_MODEL_PATH
+) -> PreTrainedModel:
+    """가중치가 mmap 파일을 가리키는 모델을 만든다. 정밀도 규칙은 ``load_llama_model``과 같다.
+
+    파라미터는 ``no_init_weights``로 초기화 없이 자리만 잡은 뒤(건드리지 않은 페이지는 RSS에 잡히지
+    않는다) mmap 텐서로 바꿔 끼운다. rotary 같은 비영속 버퍼는 평소처럼 생성자에서 계산된다.
+    """
+    from llama_modular_rag.llm_setup import PRECISIONS
+
+    if precision not in PRECISIONS:
+        raise ValueError(f"지원하지 않는 정밀도: {precision!r} (가능: {', '.join(PRECISIONS)})")
+    dtype = torch.bfloat16 if precision == "bf16" else torch.float32
+
+    state: Dict[str, torch.Tensor] = {}
+    for path in shared_checkpoint(model_path, dtype):
+        state.update(mmap_state_dict(path))
+
+    config = AutoConfig.from_pretrained(model_path)
+    with no_init_weights():
+        model = AutoModelForCausalLM.from_config(config, torch_dtype=dtype)
+    missing, unexpected = model.load_state_dict(state, strict=False, assign=True)
+    model.tie_weights()
+    # 묶인 가중치(lm_head ↔ embed_tokens)는 named_parameters()에 한 이름만 남는다.
+    params = {name for name, _ in model.named_parameters()}
+    missing = [name for name in missing if name in params]
+    if missing:
+        raise RuntimeError(f"체크포인트에 없는 파라미터: {', '.join(missing[:5])}")
+    if unexpected:
+        logger.warning("모델에 없는 체크포인트 텐서 %d개 무시: %s", len(unexpected), unexpected[:5])
+    model.eval()
+    if precision == "int8":
+        torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+    logger.info("mmap 가중치로 모델 로드 완료 (precision=%s, 텐서 %d개)", precision, len(state))
+    return model
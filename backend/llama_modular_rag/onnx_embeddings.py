@@ -0,0 +1,187 @@
+"""ONNX Runtime 기반 ko-sroberta 임베딩 백엔드.
+
+sentence-transformers 모델 디렉터리의 트랜스포머 본체를 ONNX로 내보내고(선택적으로
+int8 동적 양자화), pooling·정규화는 sentence-transformers 설정을 그대로 따라 numpy로
+계산한다. LangChain ``Embeddings`` 인터페이스를 구현하므로 기존 ``Chroma`` 저장소와
+그대로 호환된다.
+
+``onnxruntime``은 선택 의존성이다. ``EMBEDDING_BACKEND=onnx``일 때만 import한다.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from transformers import AutoTokenizer
+
+logger = logging.getLogger(__name__)
+
+_MODEL_FILE = "model.onnx"
+_QUANTIZED_MODEL_FILE = "model.int8.onnx"
+
+
+def _read_json(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _pooling_config(model_dir: str) -> Dict[str, Any]:
+    """sentence-transformers ``modules.json``이 가리키는 Pooling 설정 (없으면 mean)."""
+    for module in _read_json(os.path.join(model_dir, "modules.json")) or []:
+        if module.get("type", "").endswith("Pooling"):
+            return _read_json(os.path.join(model_dir, module["path"], "config.json"))
+    return {"pooling_mode_mean_tokens": True}
+
+
+def export_onnx(model_dir: str, output_dir: str, quantize: bool = False) -> str:
+    """트랜스포머 본체를 ONNX로 내보내고 (선택) int8 양자화본도 만든다. 모델 파일 경로를 반환."""
+    import torch
+    from transformers import AutoModel
+
+    os.makedirs(output_dir, exist_ok=True)
+    onnx_path = os.path.join(output_dir, _MODEL_FILE)
+
+    if not os.path.exists(onnx_path):
+        logger.info("임베딩 모델 ONNX 내보내기: %s → %s", model_dir, onnx_path)
+        tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        model = AutoModel.from_pretrained(model_dir)
+        model.eval()
+        sample = tokenizer(["ONNX 내보내기용 예시 문장"], return_tensors="pt")
+        with torch.inference_mode():
+            torch.onnx.export(
+                model,
+                (sample["input_ids"], sample["attention_mask"]),
+                onnx_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "last_hidden_state": {0: "batch", 1: "sequence"},
+                },
+                opset_version=14,
+            )
+        tokenizer.save_pretrained(output_dir)
+        model.config.save_pretrained(output_dir)
+        # pooling/최대 길이 설정을 함께 복사해 ONNX 디렉터리만으로 동작하게 한다.
+        for name in ("modules.json", "sentence_bert_config.json"):
+            blob = _read_json(os.path.join(model_dir, name))
+            if blob:
+                with open(os.path.join(output_dir, name), "w", encoding="utf-8") as f:
+                    json.dump(blob, f)
+        pooling = _pooling_config(model_dir)
+        os.makedirs(os.path.join(output_dir, "1_Pooling"), exist_ok=True)
+        with open(os.path.join(output_dir, "1_Pooling", "config.json"), "w", encoding="utf-8") as f:
+            json.dump(pooling, f)
+
+    if not quantize:
+        return onnx_path
+
+    quantized_path = os.path.join(output_dir, _QUANTIZED_MODEL_FILE)
+    if not os.path.exists(quantized_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info("임베딩 모델 int8 동적 양자화: %s", quantized_path)
+        quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+class OnnxEmbeddings(Embeddings):
+    """``HuggingFaceEmbeddings``와 같은 출력을 내는 ONNX Runtime 구현."""
+
+    def __init__(
+        self,
+        onnx_dir: str,
+        quantized: bool = False,
+        normalize_embeddings: bool = True,
+        batch_size: int = 8,
+        num_threads: int = 0,
+    ) -> None:
+        import onnxruntime as ort
+
+        self.normalize_embeddings = normalize_embeddings
+        self.batch_size = max(1, batch_size)
+        self.tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+        # sentence-transformers와 같은 규칙: 명시 설정 → 없으면 토크나이저/위치 임베딩 한도 중 작은 값.
+        self.max_seq_length: int = _read_json(
+            os.path.join(onnx_dir, "sentence_bert_config.json")
+        ).get(
+            "max_seq_length",
+            min(
+                self.tokenizer.model_max_length,
+                _read_json(os.path.join(onnx_dir, "config.json")).get(
+                    "max_position_embeddings", self.tokenizer.model_max_length
+                ),
+            ),
+        )
+
+        pooling = _pooling_config(onnx_dir)
+        self.pooling = "cls" if pooling.get("pooling_mode_cls_token") else "mean"
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        model_file = _QUANTIZED_MODEL_FILE if quantized else _MODEL_FILE
+        self.session = ort.InferenceSession(
+            os.path.join(onnx_dir, model_file),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        batch = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        mask = batch["attention_mask"].astype(np.int64)
+        (hidden,) = self.session.run(
+            ["last_hidden_state"],
+            {"input_ids": batch["input_ids"].astype(np.int64), "attention_mask": mask},
+        )
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            weights = mask[..., None].astype(hidden.dtype)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        if self.normalize_embeddings:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = [t.replace("\n", " ") for t in texts]
+        # 길이순으로 묶어 패딩 낭비를 줄이고 원래 순서로 되돌린다 (sentence-transformers와 동일).
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        vectors: List[Any] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            for i, vector in zip(idx, self._encode([texts[i] for i in idx])):
+                vectors[i] = vector
+        return np.stack(vectors).tolist() if vectors else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from llama_modular_rag.config import EMBEDDING_MODEL_NAME, EMBEDDING_ONNX_DIR
+
+    parser = argparse.ArgumentParser(description="임베딩 모델을 ONNX로 내보낸다")
+    parser.add_argument("--model-dir", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--output-dir", default=EMBEDDING_ONNX_DIR)
+    parser.add_argument("--int8", action="store_true", help="int8 동적 양자화본도 생성")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(export_onnx(args.model_dir, args.output_dir, quantize=args.int8))
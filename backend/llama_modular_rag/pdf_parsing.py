@@ -0,0 +1,38 @@
+"""PDF 페이지 텍스트 추출.
+
+인제스트 파이프라인의 파싱 워커 프로세스가 import하는 모듈이므로 ``pypdf`` 외의
+무거운 의존성(torch, langchain 등)을 두지 않는다. spawn된 워커의 기동 비용이
+곧 이 모듈의 import 비용이다.
+"""
+import os
+from functools import lru_cache
+from typing import Any, List, Tuple
+
+
+@lru_cache(maxsize=1)
+def _open(pdf_path: str, mtime_ns: int, size: int) -> Any:
+    # PdfReader는 처음 페이지에 접근할 때 페이지 트리 전체를 펼친다. 작업마다 새로 열면
+    # 그 비용을 페이지 범위 수만큼 반복하므로 프로세스당 하나를 재사용한다.
+    from pypdf import PdfReader
+
+    return PdfReader(pdf_path)
+
+
+def _reader(pdf_path: str) -> Any:
+    st = os.stat(pdf_path)
+    return _open(pdf_path, st.st_mtime_ns, st.st_size)
+
+
+def page_count(pdf_path: str) -> int:
+    return len(_reader(pdf_path).pages)
+
+
+def parse_pages(pdf_path: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    """``[start, stop)`` 페이지의 ``(page, text)`` 목록 (``PyPDFLoader``와 같은 추출 방식)."""
+    reader = _reader(pdf_path)
+    return [(i, reader.pages[i].extract_text()) for i in range(start, stop)]
+
+
+def release() -> None:
+    """재사용 중인 리더(파일 전체 바이트를 들고 있음)를 놓는다."""
+    _open.cache_clear()
@@ -0,0 +1,163 @@
+"""프롬프트 prefix의 ``past_key_values`` 재사용 캐시.
+
+모든 답변 프롬프트는 같은 ``ANSWER_PROMPT_TEXT`` 머리말로 시작하고, 같은 청크에 대한
+후속 질문은 ``컨텍스트:`` 블록 전체가 반복된다. 토큰 id를 ``block_size`` 단위로 잘라
+연쇄 해시를 만들고, 저장된 KV 텐서 하나를 그 텐서가 덮는 모든 블록 해시에 색인해
+두면 새 프롬프트는 가장 긴 공통 prefix만큼 prefill을 건너뛸 수 있다.
+
+조회·저장은 스케줄러 스레드 하나에서만 하지만 :meth:`PrefixCache.stats`는 API·지표 스레드가
+읽으므로, dict를 바꾸는 구간과 통계 스냅숏만 작은 락으로 묶는다 (텐서 복사는 락 밖).
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import torch
+
+KVCache = Tuple[Tuple[torch.Tensor, torch.Tensor], ...]
+
+
+def _block_hashes(token_ids: Sequence[int], block_size: int) -> List[str]:
+    """``i``번째 원소 = 처음 ``(i + 1) * block_size`` 토큰의 연쇄 해시."""
+    hashes: List[str] = []
+    prev = b""
+    for end in range(block_size, len(token_ids) + 1, block_size):
+        block = ",".join(map(str, token_ids[end - block_size:end])).encode("ascii")
+        prev = hashlib.blake2b(prev + block, digest_size=16).digest()
+        hashes.append(prev.hex())
+    return hashes
+
+
+def _nbytes(cache: KVCache) -> int:
+    return sum(k.numel() * k.element_size() + v.numel() * v.element_size() for k, v in cache)
+
+
+@dataclass
+class _Entry:
+    cache: KVCache
+    length: int
+    hashes: List[str]
+    nbytes: int
+
+
+class PrefixCache:
+    """토큰 prefix 해시 → KV 텐서. 메모리 예산을 넘으면 LRU로 내보낸다."""
+
+    def __init__(self, max_bytes: int, block_size: int = 16) -> None:
+        self.max_bytes = max_bytes
+        self.block_size = max(1, block_size)
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # 블록 해시 → 그 prefix를 포함하는 (가장 최근) 엔트리 키
+        self._index: Dict[str, str] = {}
+        self.used_bytes: int = 0
+        self._lock = threading.Lock()
+
+        self.lookups: int = 0
+        self.hits: int = 0
+        self.prefill_tokens: int = 0
+        self.saved_tokens: int = 0
+
+    def lookup(self, token_ids: Sequence[int]) -> Tuple[Optional[KVCache], int]:
+        """가장 긴 재사용 가능 prefix의 (KV, 길이)를 반환한다. 미스면 ``(None, 0)``.
+
+        logits를 얻으려면 최소 한 토큰은 새로 prefill해야 하므로 prefix 길이는
+        ``len(token_ids) - 1``을 넘지 않는다.
+        """
+        hashes = _block_hashes(token_ids[: len(token_ids) - 1], self.block_size)
+        with self._lock:
+            self.lookups += 1
+            for i in range(len(hashes) - 1, -1, -1):
+                key = self._index.get(hashes[i])
+                if key is None:
+                    continue
+                entry = self._entries[key]
+                self._entries.move_to_end(key)
+                length = (i + 1) * self.block_size
+                self.hits += 1
+                self.saved_tokens += length
+                self.prefill_tokens += len(token_ids) - length
+                break
+            else:
+                self.prefill_tokens += len(token_ids)
+                return None, 0
+        if length == entry.length:
+            return entry.cache, length
+        return tuple((k[:, :, :length], v[:, :, :length]) for k, v in entry.cache), length
+
+    def insert(self, token_ids: Sequence[int], cache: KVCache) -> None:
+        """단일 시퀀스(batch=1) prefill 결과를 블록 경계까지 잘라 저장한다."""
+        hashes = _block_hashes(token_ids, self.block_size)
+        if not hashes:
+            return
+        key = hashes[-1]
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+
+        length = len(hashes) * self.block_size
+        stored = tuple(
+            (k[:, :, :length].clone(), v[:, :, :length].clone()) for k, v in cache
+        )
+        size = _nbytes(stored)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            while self._entries and self.used_bytes + size > self.max_bytes:
+                self._evict_oldest()
+
+            self._entries[key] = _Entry(cache=stored, length=length, hashes=hashes, nbytes=size)
+            self.used_bytes += size
+            for h in hashes:
+                self._index[h] = key
+
+    def _evict_oldest(self) -> None:
+        """``_lock`` 안에서 부른다."""
+        key, entry = self._entries.popitem(last=False)
+        self.used_bytes -= entry.nbytes
+        for i, h in enumerate(entry.hashes):
+            if self._index.get(h) != key:
+                continue
+            # 같은 prefix(예: 프롬프트 머리말)를 가진 다른 엔트리가 남아 있으면 그쪽으로 옮긴다.
+            successor = next(
+                (
+                    other_key
+                    for other_key, other in reversed(self._entries.items())
+                    if len(other.hashes) > i and other.hashes[i] == h
+                ),
+                None,
+            )
+            if successor is None:
+                del self._index[h]
+            else:
+                self._index[h] = successor
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            self.used_bytes = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """다른 스레드에서 불러도 된다 — 한 시점의 값으로 읽는다."""
+        with self._lock:
+            total = self.prefill_tokens + self.saved_tokens
+            return {
+                "entries": len(self._entries),
+                "used_bytes": self.used_bytes,
+                "max_bytes": self.max_bytes,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_ratio": round(self.hit_ratio, 4),
+                "prefill_tokens": self.prefill_tokens,
+                "saved_tokens": self.saved_tokens,
+                "saved_ratio": round(self.saved_tokens / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,119 @@
+"""cross-encoder 재순위.
+
+dense/hybrid 검색은 쿼리와 청크를 따로 임베딩하므로 순위가 거칠다. 후보를 넉넉히 뽑은 뒤
+(쿼리, 청크) 쌍을 cross-encoder에 한 번의 배치로 넣어 관련도를 다시 매기고, 좋은 청크 몇 개만
+프롬프트에 넣는다. 프롬프트가 짧아지는 만큼 LLM prefill이 줄어든다.
+
+같은 쿼리가 반복되거나 후속 질문이 같은 청크를 다시 가져오는 경우가 많아 점수는
+``(쿼리, sha256(청크))``별로 LRU에 캐시한다. 캐시에 없는 쌍만 모델에 넣는다.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import torch
+from langchain_core.documents import Document
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+from llama_modular_rag.config import (
+    RERANK_CACHE_ENTRIES,
+    RERANK_MAX_LENGTH,
+    RERANKER_MODEL_NAME,
+    apply_torch_threads,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CrossEncoderReranker:
+    """``AutoModelForSequenceClassification`` cross-encoder와 점수 캐시."""
+
+    def __init__(
+        self,
+        model_name: str = RERANKER_MODEL_NAME,
+        max_length: int = RERANK_MAX_LENGTH,
+        cache_entries: int = RERANK_CACHE_ENTRIES,
+    ) -> None:
+        logger.info("재순위 모델 로드 중: %s", model_name)
+        apply_torch_threads()
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        self.model.eval()
+        self.max_length = max_length
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _forward(self, query: str, texts: Sequence[str]) -> List[float]:
+        batch = self.tokenizer(
+            [query] * len(texts),
+            list(texts),
+            padding=True,
+            truncation="only_second",
+            max_length=self.max_length,
+            return_tensors="pt",
+        )
+        with torch.inference_mode():
+            logits = self.model(**batch).logits.float()
+        # 출력이 하나면 관련도 로짓, 둘 이상이면 마지막 클래스(관련 있음)의 로그 확률.
+        if logits.shape[-1] == 1:
+            scores = logits[:, 0]
+        else:
+            scores = torch.log_softmax(logits, dim=-1)[:, -1]
+        return scores.tolist()
+
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        """각 청크의 관련도 점수 (클수록 관련). 캐시에 없는 청크만 한 배치로 채점한다."""
+        keys = [(query, _chunk_hash(t)) for t in texts]
+        scores: List[Optional[float]] = [None] * len(texts)
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    scores[i] = cached
+        missing = [i for i, s in enumerate(scores) if s is None]
+        if missing:
+            # 같은 청크가 두 번 들어와도 한 번만 채점한다.
+            unique = list(dict.fromkeys(keys[i] for i in missing))
+            texts_by_key = {keys[i]: texts[i] for i in missing}
+            fresh = dict(zip(unique, self._forward(query, [texts_by_key[k] for k in unique])))
+            for i in missing:
+                scores[i] = fresh[keys[i]]
+            with self._lock:
+                for key, value in fresh.items():
+                    self._cache[key] = value
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_entries:
+                    self._cache.popitem(last=False)
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return [float(s) for s in scores]
+
+    def rerank(
+        self, query: str, documents: Sequence[Document], top_n: int
+    ) -> List[Tuple[Document, float]]:
+        """``(문서, 점수)``를 점수 내림차순으로 최대 ``top_n``개."""
+        if not documents:
+            return []
+        scores = self.score(query, [d.page_content for d in documents])
+        ranked = sorted(zip(documents, scores), key=lambda pair: -pair[1])
+        return ranked[:top_n]
+
+
+@lru_cache(maxsize=1)
+def get_reranker() -> CrossEncoderReranker:
+    """프로세스 수명 동안 한 번만 로드되는 재순위 모델."""
+    return CrossEncoderReranker()
@@ -1,38 +1,127 @@
-from typing import List
+import time
+from functools import lru_cache
+from typing import List, Optional, Sequence
 
-from langchain_community.vectorstores import Chroma
+import numpy as np
+from langchain_core.vectorstores import VectorStore
 from langchain_core.documents import Document
 
-from llama_modular_rag.config import CONTEXT_MAX_TOKENS, RETRIEVAL_TOP_K
+from llama_modular_rag.chunking import TOKEN_COUNT_KEY
+from llama_modular_rag.config import (
+    CONTEXT_MAX_TOKENS,
+    RERANK_CANDIDATES,
+    RERANK_ENABLED,
+    RERANK_TOP_N,
+    RETRIEVAL_TOP_K,
+)
 from llama_modular_rag.llm_setup import get_llama_tokenizer
+from llama_modular_rag.metrics import CONTEXT_BUILD_SECONDS, RERANK_SECONDS, RETRIEVAL_SECONDS
 from llama_modular_rag.state import RAGState
+from llama_modular_rag.vector_search import similarity_search_batch
 
 
-def document_retriever(state: RAGState, vectorstore: Chroma) -> RAGState:
-    """벡터 유사도 검색으로 상위 K개 문서를 가져온다."""
-    documents: List[Document] = vectorstore.similarity_search(
-        state["query"], k=RETRIEVAL_TOP_K
-    )
+def document_retriever(
+    state: RAGState, vectorstore: VectorStore, k: int = RETRIEVAL_TOP_K
+) -> RAGState:
+    """상위 K개 문서를 가져온다 (``RETRIEVAL_MODE``에 따라 dense 또는 dense + BM25 RRF)."""
+    started = time.perf_counter()
+    documents: List[Document] = vectorstore.similarity_search(state["query"], k=k)
+    RETRIEVAL_SECONDS.observe(time.perf_counter() - started)
     return {**state, "documents": documents}
 
 
-def context_builder(state: RAGState) -> RAGState:
-    """LLM 토크나이저로 실제 토큰 수를 측정해 컨텍스트를 구성한다."""
-    documents = state.get("documents")
-    if not documents:
-        return {**state, "context": ""}
+def document_reranker(state: RAGState, top_n: int = RERANK_TOP_N) -> RAGState:
+    """검색된 후보를 cross-encoder로 다시 매겨 상위 ``top_n``개만 남긴다."""
+    from llama_modular_rag.rerank import get_reranker  # 재순위를 켰을 때만 torch 모델을 올린다
+
+    documents = state.get("documents") or []
+    started = time.perf_counter()
+    ranked = get_reranker().rerank(state["query"], documents, top_n)
+    RERANK_SECONDS.observe(time.perf_counter() - started)
+    return {**state, "documents": [doc for doc, _ in ranked]}
+
+
+def retrieve_documents(
+    vectorstore: VectorStore, query: str, rerank: bool = RERANK_ENABLED
+) -> List[Document]:
+    """그래프의 "문서 검색"(+ "문서 재순위")과 같은 결과. 스트리밍 경로가 쓴다."""
+    if not rerank:
+        return document_retriever({"query": query}, vectorstore)["documents"]
+    state = document_retriever({"query": query}, vectorstore, k=RERANK_CANDIDATES)
+    return document_reranker(state)["documents"]
+
+
+def retrieve_documents_batch(
+    vectorstore: VectorStore,
+    queries: Sequence[str],
+    vectors: Optional[np.ndarray] = None,
+    rerank: bool = RERANK_ENABLED,
+) -> List[List[Document]]:
+    """:func:`retrieve_documents`를 쿼리 여러 개에 대해 한꺼번에.
+
+    ``vectors``(쿼리 임베딩)가 없으면 ``embed_documents`` 한 번으로 계산하고, dense 검색은
+    저장소별로 묶어 조회한다 (:mod:`~llama_modular_rag.vector_search`). 재순위는 쿼리마다 한다.
+    """
+    if not queries:
+        return []
+    started = time.perf_counter()
+    if vectors is None:
+        from llama_modular_rag.embeddings import get_embedding_model
+
+        vectors = np.asarray(get_embedding_model().embed_documents(list(queries)), dtype=np.float32)
+    k = RERANK_CANDIDATES if rerank else RETRIEVAL_TOP_K
+    results = similarity_search_batch(vectorstore, queries, vectors, k)
+    # 히스토그램은 요청(쿼리)별 분포이므로 쿼리당 평균 시간으로 기록한다.
+    per_query = (time.perf_counter() - started) / len(queries)
+    for _ in queries:
+        RETRIEVAL_SECONDS.observe(per_query)
+    if rerank:
+        results = [
+            document_reranker({"query": query, "documents": documents})["documents"]
+            for query, documents in zip(queries, results)
+        ]
+    return results
+
 
+@lru_cache(maxsize=64)
+def _chunk_overhead_tokens(index: int) -> int:
+    """``"문서 {index}:\n"`` 머리말과 청크 뒤 줄바꿈의 토큰 수."""
     tokenizer = get_llama_tokenizer()
+    return len(tokenizer.encode(f"문서 {index}:\n", add_special_tokens=False)) + len(
+        tokenizer.encode("\n", add_special_tokens=False)
+    )
+
+
+def _token_count(doc: Document) -> int:
+    count = (doc.metadata or {}).get(TOKEN_COUNT_KEY)
+    if count is None:
+        # 토큰 수가 없는 예전 저장소의 청크만 다시 토큰화한다.
+        count = len(get_llama_tokenizer().encode(doc.page_content, add_special_tokens=False))
+    return int(count)
+
+
+def context_builder(state: RAGState) -> RAGState:
+    """인제스트 때 저장한 청크별 토큰 수로 ``CONTEXT_MAX_TOKENS`` 안에 컨텍스트를 채운다.
+
+    앞 순위부터 넣되 예산을 넘는 청크는 건너뛰고 다음 청크를 계속 본다.
+    """
+    started = time.perf_counter()
+    context = _pack_context(state.get("documents") or [])
+    CONTEXT_BUILD_SECONDS.observe(time.perf_counter() - started)
+    return {**state, "context": context}
+
+
+def _pack_context(documents: List[Document]) -> str:
     max_tokens: int = CONTEXT_MAX_TOKENS
     context_parts: List[str] = []
     used_tokens: int = 0
 
-    for i, doc in enumerate(documents):
-        chunk: str = f"문서 {i + 1}:\n{doc.page_content}\n"
-        chunk_tokens: int = len(tokenizer.encode(chunk, add_special_tokens=False))
+    for doc in documents:
+        index = len(context_parts) + 1
+        chunk_tokens = _chunk_overhead_tokens(index) + _token_count(doc)
         if used_tokens + chunk_tokens > max_tokens:
-            break
-        context_parts.append(chunk)
+            continue
+        context_parts.append(f"문서 {index}:\n{doc.page_content}\n")
         used_tokens += chunk_tokens
 
-    return {**state, "context": "\n".join(context_parts)}
+    return "\n".join(context_parts)
@@ -0,0 +1,300 @@
+"""문자 n-gram BM25 희소 인덱스와 dense 검색 결과의 RRF 결합.
+
+한국어는 조사가 붙고 띄어쓰기가 들쭉날쭉해서 단어 단위 매칭이 잘 안 되므로, 단어를
+문자 n-gram(기본 bigram)으로 잘라 색인한다 ("중구청에서" → 중구, 구청, 청에, 에서).
+형태소 분석기 없이도 지명·고유명사가 부분 일치로 잡힌다.
+
+인덱스는 인제스트 때 한 번 만들어 벡터 저장소 옆에 둔다::
+
+    terms.npy      정렬된 term 해시 (uint32, crc32)
+    indptr.npy     term별 posting 구간 (CSR, int64)
+    postings.npy   청크 번호 (int32, term 안에서 오름차순)
+    weights.npy    BM25 가중치 idf · tf(k1+1) / (tf + k1(1 - b + b·dl/avgdl)) (float32)
+    bounds.npy     term별 최대 가중치 (점수 상한, float32)
+    bm25.json      청크 수·n-gram 길이 등 (마지막에 써서 완료 표시를 겸한다)
+    chunks.*       청크 본문 사이드카
+
+가중치를 미리 계산해 두었으므로 쿼리 점수는 posting 구간을 점수 배열에 더하기만 하면 된다.
+흔한 n-gram은 posting이 길지만 idf가 작으므로 MaxScore 방식으로 건너뛴다: 상한이 큰(드문)
+term부터 더하다가, 남은 term 상한의 합이 현재 k번째 점수 이하가 되면 남은 term은 후보 청크에
+대해서만 ``searchsorted``로 가중치를 찾아 더한다. 결과는 전부 더한 것과 같은 정확한 BM25다.
+흔한 n-gram만으로 된 쿼리는 가지치기가 안 되어 전 청크를 훑는다.
+배열은 모두 mmap으로 연다.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import unicodedata
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from llama_modular_rag.chunk_sidecar import ChunkReader, append_chunks, finalize_chunks
+from llama_modular_rag.config import (
+    BM25_B,
+    BM25_K1,
+    HYBRID_CANDIDATES,
+    RETRIEVAL_MODE,
+    RRF_K,
+    SPARSE_NGRAM,
+)
+from llama_modular_rag.vector_search import similarity_search_batch
+
+_META_FILE = "bm25.json"
+# 읽은 posting이 이보다 적을 때만 남은 term을 건너뛸 수 있는지 확인한다 (확인 비용이 읽은 양에 비례).
+_PRUNE_MAX_POSTINGS = 16_384
+_WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str, n: int = SPARSE_NGRAM) -> List[str]:
+    """정규화(NFKC, 소문자) 후 단어마다 문자 n-gram. n자 이하 단어는 그대로."""
+    terms: List[str] = []
+    for word in _WORD_RE.findall(unicodedata.normalize("NFKC", text).lower()):
+        if len(word) <= n:
+            terms.append(word)
+        else:
+            terms.extend(word[i:i + n] for i in range(len(word) - n + 1))
+    return terms
+
+
+def _hash_terms(terms: Sequence[str]) -> np.ndarray:
+    return np.fromiter(
+        (zlib.crc32(t.encode("utf-8")) for t in terms), dtype=np.uint32, count=len(terms)
+    )
+
+
+class SparseIndexBuilder:
+    """청크를 받아 두었다가 :meth:`save`에서 CSR posting 배열을 만든다."""
+
+    def __init__(self, directory: str, ngram: int = SPARSE_NGRAM) -> None:
+        self.directory = directory
+        self.ngram = ngram
+        self._terms: List[np.ndarray] = []
+        self._tfs: List[np.ndarray] = []
+        self._lengths: List[int] = []
+
+    def add(
+        self,
+        texts: Sequence[str],
+        metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    ) -> None:
+        for text in texts:
+            hashed = _hash_terms(tokenize(text, self.ngram))
+            terms, counts = np.unique(hashed, return_counts=True)
+            self._terms.append(terms)
+            self._tfs.append(counts.astype(np.float32))
+            self._lengths.append(len(hashed))
+        append_chunks(self.directory, texts, metadatas)
+
+    def save(self, k1: float = BM25_K1, b: float = BM25_B) -> "SparseIndex":
+        n = len(self._lengths)
+        if n:
+            terms = np.concatenate(self._terms)
+            tfs = np.concatenate(self._tfs)
+            docs = np.repeat(
+                np.arange(n, dtype=np.int32), [len(t) for t in self._terms]
+            )
+        else:
+            terms = np.zeros(0, dtype=np.uint32)
+            tfs = np.zeros(0, dtype=np.float32)
+            docs = np.zeros(0, dtype=np.int32)
+
+        order = np.lexsort((docs, terms))
+        terms, docs, tfs = terms[order], docs[order], tfs[order]
+        unique_terms, starts, df = np.unique(terms, return_index=True, return_counts=True)
+        indptr = np.append(starts, len(terms)).astype(np.int64)
+
+        lengths = np.asarray(self._lengths, dtype=np.float32)
+        avgdl = float(lengths.mean()) if n else 0.0
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1.0 - b + b * lengths[docs] / max(avgdl, 1e-6))
+        weights = (np.repeat(idf, df) * tfs * (k1 + 1.0) / (tfs + norm)).astype(np.float32)
+        bounds = (
+            np.maximum.reduceat(weights, starts) if len(weights) else np.zeros(0, np.float32)
+        )
+
+        os.makedirs(self.directory, exist_ok=True)
+        np.save(os.path.join(self.directory, "terms.npy"), unique_terms.astype(np.uint32))
+        np.save(os.path.join(self.directory, "indptr.npy"), indptr)
+        np.save(os.path.join(self.directory, "postings.npy"), docs.astype(np.int32))
+        np.save(os.path.join(self.directory, "weights.npy"), weights)
+        np.save(os.path.join(self.directory, "bounds.npy"), bounds.astype(np.float32))
+        finalize_chunks(self.directory, n)
+        with open(os.path.join(self.directory, _META_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {"count": n, "ngram": self.ngram, "k1": k1, "b": b, "avgdl": avgdl}, f
+            )
+
+        self._terms, self._tfs, self._lengths = [], [], []
+        return SparseIndex(self.directory)
+
+
+class SparseIndex:
+    """저장된 BM25 인덱스 (읽기 전용, mmap)."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        with open(os.path.join(directory, _META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.count: int = meta["count"]
+        self.ngram: int = meta["ngram"]
+        self._terms = np.load(os.path.join(directory, "terms.npy"), mmap_mode="r")
+        self._indptr = np.load(os.path.join(directory, "indptr.npy"), mmap_mode="r")
+        self._postings = np.load(os.path.join(directory, "postings.npy"), mmap_mode="r")
+        self._weights = np.load(os.path.join(directory, "weights.npy"), mmap_mode="r")
+        self._bounds = np.load(os.path.join(directory, "bounds.npy"), mmap_mode="r")
+        self._chunks = ChunkReader(directory)
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, _META_FILE))
+
+    def _query_terms(self, query: str) -> np.ndarray:
+        """쿼리 term 중 색인에 있는 것들의 위치 (``terms`` 배열 인덱스)."""
+        if not self.count or not len(self._terms):
+            return np.zeros(0, dtype=np.int64)
+        query_terms = np.unique(_hash_terms(tokenize(query, self.ngram)))
+        pos = np.searchsorted(self._terms, query_terms)
+        valid = pos < len(self._terms)
+        pos, query_terms = pos[valid], query_terms[valid]
+        return pos[self._terms[pos] == query_terms]
+
+    def top_k(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """``(청크 번호, BM25 점수)``를 점수 내림차순으로. 일치하는 term이 없으면 빈 배열."""
+        pos = self._query_terms(query)
+        if not len(pos) or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        bounds = np.asarray(self._bounds[pos], dtype=np.float64)
+        order = np.argsort(-bounds, kind="stable")
+        starts, ends = self._indptr[pos].tolist(), self._indptr[pos + 1].tolist()
+        scores = np.zeros(self.count, dtype=np.float32)
+        rest = float(bounds.sum())
+        read: List[np.ndarray] = []
+        read_total = 0
+        candidates: Optional[np.ndarray] = None
+
+        for step, i in enumerate(order):
+            a, b = starts[i], ends[i]
+            docs = self._postings[a:b]
+            # 한 term 안에서 청크 번호는 겹치지 않으므로 fancy index 덧셈이 안전하다.
+            scores[docs] += self._weights[a:b]
+            rest -= bounds[i]
+            read.append(docs)
+            read_total += b - a
+            if step + 1 == len(order) or read_total > _PRUNE_MAX_POSTINGS:
+                continue
+            touched = np.unique(np.concatenate(read))
+            if len(touched) < k:
+                continue
+            theta = float(np.partition(scores[touched], len(touched) - k)[len(touched) - k])
+            if rest > theta:
+                continue
+            # 지금까지 안 나온 청크는 남은 term을 다 더해도 rest ≤ theta라 상위 k에 들 수 없다.
+            candidates = touched[scores[touched] + rest >= theta]
+            for j in order[step + 1:]:
+                a, b = starts[j], ends[j]
+                plist = self._postings[a:b]
+                at = np.minimum(np.searchsorted(plist, candidates), len(plist) - 1)
+                hit = plist[at] == candidates
+                scores[candidates[hit]] += self._weights[a:b][at[hit]]
+            break
+
+        if candidates is None:
+            candidates = (
+                np.unique(np.concatenate(read))
+                if read_total <= _PRUNE_MAX_POSTINGS
+                else np.flatnonzero(scores)
+            )
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return candidates, scores[candidates]
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        ids, scores = self.top_k(query, k)
+        return [(self._chunks.document(int(i)), float(s)) for i, s in zip(ids, scores)]
+
+    def close(self) -> None:
+        self._terms = self._indptr = self._postings = self._weights = self._bounds = None
+        self._chunks = None
+
+
+def _fusion_key(doc: Document) -> Tuple[Any, Any, str]:
+    metadata = doc.metadata or {}
+    return metadata.get("doc_id"), metadata.get("page"), doc.page_content
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Sequence[Sequence[Document]], rrf_k: int = RRF_K
+) -> List[Tuple[Document, float]]:
+    """여러 순위 목록을 ``Σ 1 / (rrf_k + rank)``로 합친다. 같은 청크는 하나로 센다."""
+    fused: Dict[Tuple[Any, Any, str], List[Any]] = {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked, start=1):
+            entry = fused.setdefault(_fusion_key(doc), [doc, 0.0])
+            entry[1] += 1.0 / (rrf_k + rank)
+    return sorted(((doc, score) for doc, score in fused.values()), key=lambda p: -p[1])
+
+
+class HybridSearch:
+    """dense 검색과 BM25 검색을 각각 ``candidates``개씩 뽑아 RRF로 합친다.
+
+    ``sparse``는 ``(doc_id, 인덱스)`` 목록이다. 문서가 여러 개면 doc_id를 메타데이터에
+    붙여 :class:`~llama_modular_rag.doc_pool.MultiDocVectorStore`의 dense 결과와 같은 청크로
+    맞춘다. ``document_retriever``가 쓰는 ``similarity_search``와 배치 경로의
+    ``similarity_search_batch``만 흉내낸다.
+    """
+
+    def __init__(
+        self,
+        dense: Any,
+        sparse: Sequence[Tuple[Optional[str], SparseIndex]],
+        candidates: int = HYBRID_CANDIDATES,
+        rrf_k: int = RRF_K,
+    ) -> None:
+        self.dense = dense
+        self.sparse = list(sparse)
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+
+    def _lexical(self, query: str, k: int) -> List[Document]:
+        hits: List[Tuple[Document, float]] = []
+        for doc_id, index in self.sparse:
+            for doc, score in index.search(query, k):
+                if doc_id is not None:
+                    doc.metadata = {**(doc.metadata or {}), "doc_id": doc_id}
+                hits.append((doc, score))
+        hits.sort(key=lambda pair: -pair[1])
+        return [doc for doc, _ in hits[:k]]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """``(문서, RRF 점수)``. 점수가 클수록 앞선다."""
+        n = max(k, self.candidates)
+        dense = self.dense.similarity_search(query, k=n)
+        return reciprocal_rank_fusion([dense, self._lexical(query, n)], self.rrf_k)[:k]
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def similarity_search_batch(
+        self, queries: Sequence[str], vectors: np.ndarray, k: int = 4
+    ) -> List[List[Document]]:
+        """dense 쪽은 미리 계산한 임베딩으로 한꺼번에, BM25는 쿼리마다 조회해 RRF로 합친다."""
+        n = max(k, self.candidates)
+        dense = similarity_search_batch(self.dense, queries, vectors, n)
+        return [
+            [doc for doc, _ in reciprocal_rank_fusion([hits, self._lexical(query, n)], self.rrf_k)[:k]]
+            for query, hits in zip(queries, dense)
+        ]
+
+
+def with_lexical(dense: Any, sparse: Sequence[Tuple[Optional[str], SparseIndex]]) -> Any:
+    """``RETRIEVAL_MODE``가 hybrid이고 희소 인덱스가 있으면 :class:`HybridSearch`로 감싼다."""
+    if RETRIEVAL_MODE != "hybrid" or not sparse:
+        return dense
+    return HybridSearch(dense, sparse)
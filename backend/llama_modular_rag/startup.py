@@ -0,0 +1,224 @@
+"""부팅 워밍업과 시작 시간 프로파일러.
+
+앱 import 경로에서는 torch·transformers·langgraph·chromadb를 import하지 않는다 (각 모듈이 처음 쓸
+때 import한다). 그 대신 lifespan이 :func:`warmup`을 백그라운드 스레드로 돌려 무거운 모듈을
+import하고, 임베딩·토크나이저·LLM을 올린 뒤 임베딩 한 번과 짧은 생성 한 번(prefill + decode)을
+실행한다. 첫 사용자 요청이 모델 로드를 떠안지 않도록 그동안 ``/api/health``는 ``warming``이다.
+
+단계별 시간은 :class:`StartupProfiler`에 쌓인다. import 시간을 모듈별로 보려면::
+
+    python -m llama_modular_rag.startup                # app.main import 시간 + 워밍업 단계별 시간
+    python -m llama_modular_rag.startup --no-warmup --top 30
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import json
+import logging
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from llama_modular_rag.config import EMBEDDING_BACKEND, INFERENCE_WORKERS, RERANK_ENABLED
+
+logger = logging.getLogger(__name__)
+
+# 워밍업이 먼저 import해 두는 무거운 모듈 (앱 import 경로에서 뺀 것들).
+HEAVY_MODULES: Tuple[str, ...] = (
+    "torch",
+    "transformers",
+    "langgraph.graph",
+    "langchain_community.vectorstores",
+    "llama_modular_rag.engine",
+)
+# ``generate`` 안쪽을 다시 나눈 단계 — 합계에서는 빼야 한다.
+SUB_PHASES = ("prefill", "decode")
+
+
+class StartupProfiler:
+    """``(단계 이름, 초)``를 끝난 순서대로 기록한다. 워밍업 스레드와 health 요청이 함께 읽는다."""
+
+    def __init__(self) -> None:
+        self._phases: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._phases.append((name, seconds))
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def phases_ms(self) -> Dict[str, float]:
+        with self._lock:
+            return {name: round(seconds * 1000, 1) for name, seconds in self._phases}
+
+    def phases(self) -> List[Tuple[str, float]]:
+        with self._lock:
+            return list(self._phases)
+
+
+def warmup(profiler: Optional[StartupProfiler] = None) -> StartupProfiler:
+    """무거운 모듈 import → 임베딩·토크나이저·LLM 로드 → 임베딩 1회, 짧은 생성 1회.
+
+    생성은 ``ANSWER_PROMPT_TEXT`` 머리말로 하므로 prefix KV 캐시에 공통 머리말이 미리 들어간다.
+    추론 워커 풀이면 워커마다 한 번씩 생성해 모든 워커가 모델을 연 뒤에 끝난다.
+    """
+    profiler = profiler or StartupProfiler()
+
+    for module in HEAVY_MODULES:
+        with profiler.phase(f"import:{module}"):
+            importlib.import_module(module)
+    if EMBEDDING_BACKEND == "torch":
+        with profiler.phase("import:langchain_huggingface"):
+            importlib.import_module("langchain_huggingface")
+
+    from llama_modular_rag.embeddings import get_embedding_model
+    from llama_modular_rag.engine import SamplingParams, get_generation_engine
+    from llama_modular_rag.generation import ANSWER_PROMPT_TEXT
+    from llama_modular_rag.llm_setup import get_llama_tokenizer
+
+    with profiler.phase("load:embeddings"):
+        embeddings = get_embedding_model()
+    with profiler.phase("embed"):
+        embeddings.embed_query("워밍업")
+    with profiler.phase("load:tokenizer"):
+        get_llama_tokenizer()
+    # 풀 모드에서는 워커를 띄우기만 하고 바로 돌아온다 — 모델 로드 시간은 generate 단계에 잡힌다.
+    with profiler.phase("load:llm"):
+        engine = get_generation_engine()
+
+    prompt = ANSWER_PROMPT_TEXT.format(context="", query="워밍업")
+    params = SamplingParams(max_new_tokens=2, do_sample=False)
+    with profiler.phase("generate"):
+        handles = [
+            engine.submit(prompt, params, timeout=None) for _ in range(max(1, INFERENCE_WORKERS))
+        ]
+        for handle in handles:
+            handle.result()
+    first = handles[0]
+    if first.admitted_at is not None and first.first_token_at is not None:
+        profiler.record("prefill", first.first_token_at - first.admitted_at)
+        if first.finished_at is not None:
+            profiler.record("decode", first.finished_at - first.first_token_at)
+
+    if RERANK_ENABLED:
+        from llama_modular_rag.rerank import get_reranker
+
+        with profiler.phase("load:reranker"):
+            reranker = get_reranker()
+        with profiler.phase("rerank"):
+            reranker.score("워밍업", ["워밍업"])
+    return profiler
+
+
+def import_times(module: str = "app.main") -> List[Dict[str, Any]]:
+    """새 인터프리터에서 ``module``을 import하며 ``-X importtime`` 결과를 모은다.
+
+    모듈마다 ``{"module", "self_ms", "cumulative_ms", "depth"}``. 이미 import된 모듈은 다시 재지
+    않도록 별도 프로세스에서 잰다.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows: List[Dict[str, Any]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <들여쓴 모듈 이름>"
+        head, cumulative_us, name = line.split("|", 2)
+        try:
+            self_ms = int(head.split(":", 1)[1]) / 1000
+            cumulative_ms = int(cumulative_us) / 1000
+        except ValueError:  # 머리글 줄
+            continue
+        name = name.rstrip()[1:]  # 구분자 뒤 공백 한 칸
+        rows.append(
+            {
+                "module": name.strip(),
+                "self_ms": round(self_ms, 1),
+                "cumulative_ms": round(cumulative_ms, 1),
+                "depth": (len(name) - len(name.lstrip())) // 2,
+            }
+        )
+    return rows
+
+
+def _by_package(rows: List[Dict[str, Any]]) -> List[Tuple[str, float]]:
+    """최상위 패키지별 self 시간 합 (큰 순)."""
+    totals: Dict[str, float] = {}
+    for row in rows:
+        package = row["module"].split(".", 1)[0]
+        totals[package] = totals.get(package, 0.0) + row["self_ms"]
+    return sorted(totals.items(), key=lambda item: -item[1])
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="모듈별 import 시간과 워밍업 단계별 시간을 보고한다.")
+    parser.add_argument("--module", default="app.main", help="import 시간을 잴 모듈")
+    parser.add_argument("--top", type=int, default=15, help="패키지·모듈 상위 몇 개를 보일지")
+    parser.add_argument("--no-warmup", action="store_true", help="import 시간만 잰다")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args(argv)
+
+    rows = import_times(args.module)
+    total = next((r["cumulative_ms"] for r in reversed(rows) if r["module"] == args.module), 0.0)
+    packages = _by_package(rows)[: args.top]
+    first_party = sorted(
+        (r for r in rows if r["module"].split(".", 1)[0] in ("app", "llama_modular_rag")),
+        key=lambda r: -r["cumulative_ms"],
+    )[: args.top]
+
+    phases: List[Tuple[str, float]] = []
+    if not args.no_warmup:
+        from llama_modular_rag.config import init_runtime
+
+        init_runtime()
+        phases = warmup().phases()
+
+    if args.json:
+        print(
+            json.dumps(
+                {
+                    "module": args.module,
+                    "import_ms": total,
+                    "packages": [{"package": p, "self_ms": round(ms, 1)} for p, ms in packages],
+                    "modules": first_party,
+                    "warmup": [{"phase": n, "ms": round(s * 1000, 1)} for n, s in phases],
+                },
+                ensure_ascii=False,
+                indent=2,
+            )
+        )
+        return
+
+    print(f"import {args.module}: {total:.1f} ms")
+    print(f"\n{'package':<32} {'self_ms':>9}")
+    for package, ms in packages:
+        print(f"{package:<32} {ms:>9.1f}")
+    print(f"\n{'module':<40} {'cumulative_ms':>14}")
+    for row in first_party:
+        print(f"{row['module']:<40} {row['cumulative_ms']:>14.1f}")
+    if phases:
+        print(f"\n{'warmup phase':<40} {'ms':>9}")
+        for name, seconds in phases:
+            print(f"{name:<40} {seconds * 1000:>9.1f}")
+        total_s = sum(s for name, s in phases if name not in SUB_PHASES)
+        print(f"{'total':<40} {total_s * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -2,6 +2,8 @@ from typing import Dict, List, Optional, TypedDict
 
 from langchain_core.documents import Document
 
+from llama_modular_rag.tracing import Trace
+
 
 class RAGState(TypedDict, total=False):
     """RAG 파이프라인의 상태를 나타내는 클래스."""
@@ -11,3 +13,5 @@ class RAGState(TypedDict, total=False):
     context: Optional[str]
     answer: Optional[str]
     feedback: Optional[Dict]
+    # 샘플된 요청에만 있다 (tracing.start_trace). 노드별 span이 여기에 쌓인다.
+    trace: Optional[Trace]
@@ -0,0 +1,132 @@
+"""요청별 단계 타이밍 추적.
+
+샘플된 요청만 상태(``RAGState["trace"]``)에 :class:`Trace`를 들고 다닌다. 그래프 노드는
+:func:`traced`로 감싸 ``time.monotonic()`` 기준 시작·끝을 span으로 남기고, 샘플되지 않은
+요청은 ``trace``가 없으므로 노드마다 ``dict.get`` 한 번이 추가 비용의 전부다.
+
+끝난 trace(:meth:`Trace.finish`)는 응답(``QueryResponse.spans``, SSE ``done``)에 실리고,
+``TRACE_LOG_PATH``가 있으면 JSONL 한 줄로 덧붙는다.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from llama_modular_rag.config import TRACE_LOG_PATH, TRACE_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+_log_lock = threading.Lock()
+
+
+@dataclass
+class Span:
+    name: str
+    start: float  # time.monotonic()
+    end: float
+
+
+@dataclass
+class Trace:
+    """요청 하나의 span 목록. 노드 스레드와 이벤트 루프가 함께 써도 되도록 append만 한다."""
+
+    trace_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    started: float = field(default_factory=time.monotonic)
+    spans: List[Span] = field(default_factory=list)
+
+    def add(self, name: str, start: float, end: float) -> None:
+        self.spans.append(Span(name, start, end))
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.monotonic())
+
+    def add_generation(self, handle: Any, start: float, end: float) -> None:
+        """엔진 핸들의 타임스탬프로 생성 구간을 토큰화 / 대기열 / prefill / decode로 나눈다.
+
+        ``start``는 ``submit`` 호출 직전(프롬프트 토큰화 시작) 시각이다. 취소·타임아웃으로
+        도달하지 못한 구간은 빠진다.
+        """
+        marks = [
+            start,
+            handle.submitted_at,
+            handle.admitted_at,
+            handle.first_token_at,
+            handle.finished_at or end,
+        ]
+        names = ("토큰화", "대기열", "prefill", "decode")
+        for name, begin, finish in zip(names, marks, marks[1:]):
+            if begin is None or finish is None:
+                break
+            self.add(f"답변 생성.{name}", begin, finish)
+
+    def finish(self, **fields: Any) -> Dict[str, Any]:
+        """trace를 닫고 응답용 dict를 만든다. ``TRACE_LOG_PATH``가 있으면 JSONL로도 남긴다.
+
+        파일 쓰기가 있으므로 이벤트 루프에서는 ``run_in_threadpool``로 부른다.
+        """
+        record: Dict[str, Any] = {
+            "trace_id": self.trace_id,
+            "ts": time.time(),
+            **fields,
+            "total_ms": round((time.monotonic() - self.started) * 1000, 3),
+            "spans": [
+                {
+                    "name": s.name,
+                    "start_ms": round((s.start - self.started) * 1000, 3),
+                    "end_ms": round((s.end - self.started) * 1000, 3),
+                }
+                for s in sorted(self.spans, key=lambda s: s.start)
+            ],
+        }
+        if TRACE_LOG_PATH:
+            _append(TRACE_LOG_PATH, record)
+        return record
+
+
+def _append(path: str, record: Dict[str, Any]) -> None:
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    try:
+        with _log_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError:
+        logger.warning("trace 로그 기록 실패: %s", path, exc_info=True)
+
+
+def start_trace(force: Optional[bool] = None) -> Optional[Trace]:
+    """샘플되면 새 :class:`Trace`, 아니면 None. ``force``가 주어지면 샘플링 대신 따른다."""
+    if force is None:
+        force = TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+    return Trace() if force else None
+
+
+def optional_span(trace: Optional[Trace], name: str) -> AbstractContextManager:
+    """``trace``가 있으면 ``trace.span(name)``, 없으면 아무것도 하지 않는 컨텍스트."""
+    return nullcontext() if trace is None else trace.span(name)
+
+
+def traced(name: str, node: Callable[[Dict[str, Any]], Any]) -> Callable[[Dict[str, Any]], Any]:
+    """그래프 노드를 감싸 상태에 trace가 있을 때만 ``name`` span을 기록한다."""
+
+    def run(state: Dict[str, Any]) -> Any:
+        trace = state.get("trace")
+        if trace is None:
+            return node(state)
+        start = time.monotonic()
+        try:
+            return node(state)
+        finally:
+            trace.add(name, start, time.monotonic())
+
+    return run
@@ -0,0 +1,61 @@
+"""쿼리 여러 개를 한 번에 검색하는 배치 검색.
+
+쿼리 임베딩은 호출하는 쪽이 ``embed_documents`` 한 번으로 계산해 넘긴다. 저장소별로
+가능한 가장 큰 단위로 묶어 조회한다:
+
+- FAISS: 쿼리 행렬 하나로 ``index.search`` 한 번.
+- Chroma: ``collection.query(query_embeddings=[...])`` 한 번.
+- :class:`~llama_modular_rag.doc_pool.MultiDocVectorStore`·
+  :class:`~llama_modular_rag.sparse_index.HybridSearch`: ``similarity_search_batch``를 구현해
+  안쪽 저장소에 다시 위임한다.
+
+거리 규약은 단건 검색과 같다 (제곱 L2, 작을수록 가깝다).
+"""
+from __future__ import annotations
+
+from typing import Any, List, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+def search_by_vectors(
+    store: Any, vectors: np.ndarray, k: int
+) -> List[List[Tuple[Document, float]]]:
+    """dense 저장소 하나에서 벡터별 ``(문서, 거리)`` 상위 ``k``개."""
+    if len(vectors) == 0:
+        return []
+    bulk = getattr(store, "similarity_search_by_vectors_with_relevance_scores", None)
+    if bulk is not None:
+        return bulk(vectors, k)
+    collection = getattr(store, "_collection", None)
+    if collection is not None:
+        # langchain Chroma는 단건 조회만 노출하므로 컬렉션에 직접 묻는다.
+        count = collection.count()
+        if not count:
+            return [[] for _ in vectors]
+        found = collection.query(
+            query_embeddings=np.asarray(vectors, dtype=np.float32).tolist(),
+            n_results=min(k, count),
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            [
+                (Document(page_content=text or "", metadata=meta or {}), float(distance))
+                for text, meta, distance in zip(texts, metas, distances)
+            ]
+            for texts, metas, distances in zip(
+                found["documents"], found["metadatas"], found["distances"]
+            )
+        ]
+    return [store.similarity_search_by_vector_with_relevance_scores(list(v), k=k) for v in vectors]
+
+
+def similarity_search_batch(
+    store: Any, queries: Sequence[str], vectors: np.ndarray, k: int
+) -> List[List[Document]]:
+    """``store.similarity_search(query, k)``를 쿼리마다 부른 것과 같은 결과를 한꺼번에."""
+    batch = getattr(store, "similarity_search_batch", None)
+    if batch is not None:
+        return batch(queries, vectors, k)
+    return [[doc for doc, _ in hits] for hits in search_by_vectors(store, vectors, k)]
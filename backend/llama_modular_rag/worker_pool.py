@@ -0,0 +1,540 @@
+"""여러 추론 프로세스에 생성을 나눠 주는 워커 풀 (``RAG_INFERENCE_WORKERS`` > 0).
+
+1B 모델의 배치 1 decode는 한 프로세스 안에서 intra-op 스레드를 몇 개 넘게 늘려도 잘 빨라지지
+않는다. 풀 모드에서는 쓸 수 있는 코어를 워커 수만큼 연속 묶음으로 나눠 워커 프로세스를 하나씩
+고정(``sched_setaffinity``)하고, 워커마다 자기 :class:`~llama_modular_rag.engine.GenerationEngine`
+(연속 배칭·prefix 캐시·추측 디코딩 그대로)을 돌린다. 가중치는
+:func:`~llama_modular_rag.mmap_weights.load_shared_llama_model`로 같은 safetensors 파일을 mmap하므로
+RAM이 워커 수만큼 늘지 않는다.
+
+API 프로세스의 :class:`WorkerPool`은 엔진과 같은 제출 API(``submit``·``submit_ids``·``generate``·
+``stream``·``stats``)를 낸다. 요청은 진행 중인 요청이 가장 적은 워커의 입력 큐로 가고, 워커가 자기
+이벤트 파이프로 돌려보내는 토큰 청크·타임스탬프·종료 신호를 relay 스레드가 요청별
+:class:`~llama_modular_rag.engine.GenerationHandle`로 옮긴다. 그래서 SSE·배치·추적 경로는 풀인지
+모른다. 취소는 워커로 전달되고 deadline은 워커 엔진이 그대로 검사한다 (``time.monotonic()``은 같은
+호스트의 프로세스끼리 같은 시계다).
+
+워커가 죽으면 그 워커에 있던 요청을 오류로 끝내고 새 워커를 띄운다. 이벤트 채널을 워커마다
+따로 두는 이유다 — 여러 프로세스가 쓰는 ``multiprocessing.Queue``는 쓰기 락을 쥔 채 죽은 워커가
+있으면 나머지 워커의 이벤트까지 막힌다.
+"""
+from __future__ import annotations
+
+import atexit
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import signal
+import threading
+import time
+from multiprocessing.connection import Connection, wait
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import torch
+from transformers import AutoTokenizer, PreTrainedTokenizerBase
+
+from llama_modular_rag.config import (
+    GENERATION_MAX_BATCH,
+    GENERATION_TIMEOUT_S,
+    LLAMA_MODEL_PATH,
+    LLM_PRECISION,
+    WORKER_MAX_RESTARTS,
+    WORKER_RESTART_WINDOW_S,
+    WORKER_THREADS,
+)
+from llama_modular_rag.engine import (
+    GenerationHandle,
+    GenerationTimeout,
+    SamplingParams,
+    build_generation_engine,
+)
+from llama_modular_rag.llm_setup import get_llama_tokenizer
+
+logger = logging.getLogger(__name__)
+
+# 워커 → API 프로세스 이벤트: (request id, kind, payload)
+_READY = "ready"
+_FAILED = "failed"
+_FIRST = "first"
+_TOKEN = "token"
+_DONE = "done"
+# API 프로세스 → 워커 명령
+_SUBMIT = "submit"
+_CANCEL = "cancel"
+
+
+def core_groups(workers: int) -> List[List[int]]:
+    """이 프로세스가 쓸 수 있는 코어를 ``workers``개 연속 묶음으로 나눈다.
+
+    코어가 워커보다 적으면 워커마다 코어 하나씩 돌아가며 배정한다.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    if len(cores) < workers:
+        return [[cores[i % len(cores)]] for i in range(workers)]
+    return [
+        cores[i * len(cores) // workers : (i + 1) * len(cores) // workers] for i in range(workers)
+    ]
+
+
+def _error_payload(error: Optional[BaseException]) -> Optional[Tuple[str, str]]:
+    # 임의의 예외는 pickle되지 않을 수 있으므로 이름과 메시지만 보낸다.
+    return None if error is None else (type(error).__name__, str(error))
+
+
+def _rebuild_error(payload: Optional[Tuple[str, str]]) -> Optional[BaseException]:
+    if payload is None:
+        return None
+    name, message = payload
+    if name == GenerationTimeout.__name__:
+        return GenerationTimeout(message)
+    return RuntimeError(f"{name}: {message}")
+
+
+def _worker_main(
+    index: int,
+    cpus: Sequence[int],
+    threads: int,
+    model_path: str,
+    precision: str,
+    inbox: "mp.Queue[Any]",
+    events: Connection,
+) -> None:
+    """워커 프로세스 진입점: 모델을 mmap으로 열고 ``inbox`` 명령을 엔진에 넘긴다."""
+    send_lock = threading.Lock()
+
+    def send(request_id: int, kind: str, payload: Any) -> None:
+        # 요청마다 relay 스레드가 있으므로 파이프 쓰기를 직렬화한다.
+        with send_lock:
+            events.send((request_id, kind, payload))
+
+    # Ctrl+C는 API 프로세스가 받아 풀을 정리한다.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(threads)
+
+    from llama_modular_rag.mmap_weights import load_shared_llama_model
+
+    try:
+        model = load_shared_llama_model(precision, model_path)
+        engine = build_generation_engine(model, AutoTokenizer.from_pretrained(model_path))
+    except BaseException as exc:  # noqa: BLE001
+        logger.exception("추론 워커 %d 모델 로드 실패", index)
+        send(0, _FAILED, _error_payload(exc))
+        return
+    send(0, _READY, os.getpid())
+
+    handles: Dict[int, GenerationHandle] = {}
+
+    def relay(request_id: int, handle: GenerationHandle) -> None:
+        error: Optional[BaseException] = None
+        first = True
+        try:
+            for chunk in handle:
+                if first:
+                    first = False
+                    send(request_id, _FIRST, (handle.admitted_at, handle.first_token_at))
+                send(request_id, _TOKEN, chunk)
+        except BaseException as exc:  # noqa: BLE001
+            error = exc
+        finally:
+            handles.pop(request_id, None)
+        send(
+            request_id,
+            _DONE,
+            {
+                "admitted_at": handle.admitted_at,
+                "first_token_at": handle.first_token_at,
+                "num_generated": handle.num_generated,
+                "num_drafted": handle.num_drafted,
+                "num_accepted": handle.num_accepted,
+                "error": _error_payload(error),
+                "stats": engine.stats(),
+            },
+        )
+
+    while True:
+        message = inbox.get()
+        if message is None:
+            break
+        kind, request_id, *rest = message
+        if kind == _SUBMIT:
+            prompt_ids, params, deadline = rest
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 1e-3)
+            handle = engine.submit_ids(prompt_ids, params, timeout)
+            handles[request_id] = handle
+            threading.Thread(
+                target=relay, args=(request_id, handle), name=f"relay-{request_id}", daemon=True
+            ).start()
+        elif kind == _CANCEL:
+            handle = handles.get(request_id)
+            if handle is not None:
+                handle.cancel()
+    engine.shutdown()
+
+
+class _RemoteHandle(GenerationHandle):
+    """워커에서 생성 중인 요청의 API 프로세스 쪽 핸들. 취소를 워커로 전달한다."""
+
+    def __init__(self, pool: "WorkerPool", *args: Any) -> None:
+        super().__init__(*args)
+        self._pool = pool
+
+    def cancel(self) -> None:
+        first = not self.cancelled
+        super().cancel()
+        if first and not self.done:
+            self._pool._cancel(self.request_id)
+
+
+class _Worker:
+    def __init__(
+        self,
+        index: int,
+        process: Any,
+        inbox: "mp.Queue[Any]",
+        events: Connection,
+        cpus: List[int],
+        threads: int,
+    ) -> None:
+        self.index = index
+        self.process = process
+        self.inbox = inbox
+        self.events = events  # 이 워커가 보내는 이벤트를 읽는 쪽
+        self.cpus = cpus
+        self.threads = threads
+        self.ready = False
+        self.failed = False
+        self.inflight: Set[int] = set()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "pid": self.process.pid,
+            "ready": self.ready,
+            "failed": self.failed,
+            "cpus": self.cpus,
+            "threads": self.threads,
+            "inflight": len(self.inflight),
+        }
+
+
+def _merge_stats(snapshots: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """워커별 엔진 ``stats()``의 누적 카운터를 더하고 비율은 합계로 다시 계산한다."""
+    merged: Dict[str, Any] = {
+        key: sum(s.get(key, 0) for s in snapshots)
+        for key in ("total_tokens", "total_steps", "cancelled", "timed_out")
+    }
+    prefix = [s["prefix_cache"] for s in snapshots if s.get("prefix_cache")]
+    merged["prefix_cache"] = None
+    if prefix:
+        total = {
+            key: sum(p[key] for p in prefix)
+            for key in (
+                "entries",
+                "used_bytes",
+                "max_bytes",
+                "lookups",
+                "hits",
+                "prefill_tokens",
+                "saved_tokens",
+            )
+        }
+        seen = total["prefill_tokens"] + total["saved_tokens"]
+        total["hit_ratio"] = round(total["hits"] / total["lookups"], 4) if total["lookups"] else 0.0
+        total["saved_ratio"] = round(total["saved_tokens"] / seen, 4) if seen else 0.0
+        merged["prefix_cache"] = total
+    speculative = [s["speculative"] for s in snapshots if s.get("speculative")]
+    merged["speculative"] = None
+    if speculative:
+        drafted = sum(s["drafted"] for s in speculative)
+        accepted = sum(s["accepted"] for s in speculative)
+        merged["speculative"] = {
+            "draft_tokens": speculative[0]["draft_tokens"],
+            "ngram": speculative[0]["ngram"],
+            "drafted": drafted,
+            "accepted": accepted,
+            "acceptance_rate": round(accepted / drafted, 4) if drafted else None,
+        }
+    return merged
+
+
+class WorkerPool:
+    """:class:`~llama_modular_rag.engine.GenerationEngine`과 같은 제출 API로 추론 워커 프로세스를 쓴다.
+
+    워커는 만들 때 바로 띄우지만 기다리지 않는다. 모델을 여는 동안 온 요청은 워커 입력 큐에서
+    기다린다.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        threads: int = WORKER_THREADS,
+        model_path: str = LLAMA_MODEL_PATH,
+        precision: str = LLM_PRECISION,
+        max_batch_size: int = GENERATION_MAX_BATCH,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers는 1 이상이어야 합니다.")
+        self.model_path = model_path
+        self.precision = precision
+        self.tokenizer: PreTrainedTokenizerBase = (
+            get_llama_tokenizer()
+            if model_path == LLAMA_MODEL_PATH
+            else AutoTokenizer.from_pretrained(model_path)
+        )
+        # 워커마다 decode 배치가 하나씩 있다.
+        self.max_batch_size = max(1, max_batch_size) * workers
+        self.submitted = 0
+        self.restarts = 0
+        # 워커별 최근 재시작 시각 (WORKER_RESTART_WINDOW_S 안의 것만 센다)
+        self._restart_times: Dict[int, List[float]] = {}
+
+        self._threads = threads
+        self._groups = core_groups(workers)
+        self._ctx = mp.get_context("spawn")  # torch 스레드가 있는 프로세스는 fork하지 않는다
+        # shutdown이 relay 스레드의 wait()를 깨우는 파이프
+        self._wakeup_reader, self._wakeup = self._ctx.Pipe(duplex=False)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._handles: Dict[int, Tuple[_RemoteHandle, int]] = {}
+        self._stats: List[Dict[str, Any]] = [{} for _ in range(workers)]
+        self._closed = False
+        self._workers = [self._spawn(i) for i in range(workers)]
+        self._relay = threading.Thread(target=self._relay_loop, name="worker-pool-relay", daemon=True)
+        self._relay.start()
+        atexit.register(self.shutdown)
+
+    # ------------------------------------------------------------------ 공개 API
+
+    def submit(
+        self,
+        prompt: str,
+        params: Optional[SamplingParams] = None,
+        timeout: Optional[float] = GENERATION_TIMEOUT_S,
+    ) -> GenerationHandle:
+        """:meth:`GenerationEngine.submit <llama_modular_rag.engine.GenerationEngine.submit>`과 같다."""
+        return self.submit_ids(self.tokenizer(prompt)["input_ids"], params, timeout)
+
+    def submit_ids(
+        self,
+        prompt_ids: List[int],
+        params: Optional[SamplingParams] = None,
+        timeout: Optional[float] = GENERATION_TIMEOUT_S,
+    ) -> GenerationHandle:
+        """진행 중인 요청이 가장 적은 워커에 제출하고 바로 핸들을 반환한다."""
+        deadline = time.monotonic() + timeout if timeout else None
+        params = params or SamplingParams()
+        with self._lock:
+            request_id = next(self._ids)
+            handle = _RemoteHandle(self, request_id, list(prompt_ids), params, deadline)
+            candidates = [w for w in self._workers if not w.failed]
+            if self._closed or not candidates:
+                handle._finish(RuntimeError("추론 워커 풀을 쓸 수 없습니다."))
+                return handle
+            worker = min(candidates, key=lambda w: len(w.inflight))
+            worker.inflight.add(request_id)
+            self._handles[request_id] = (handle, worker.index)
+            self.submitted += 1
+        worker.inbox.put((_SUBMIT, request_id, handle.prompt_ids, params, deadline))
+        return handle
+
+    def generate(self, prompt: str, params: Optional[SamplingParams] = None) -> str:
+        """블로킹 호출: 워커에서 생성된 전체 답변을 반환한다."""
+        return self.submit(prompt, params).result()
+
+    def stream(
+        self,
+        prompt: str,
+        params: Optional[SamplingParams] = None,
+        timeout: Optional[float] = GENERATION_TIMEOUT_S,
+    ) -> Iterator[str]:
+        """블로킹 이터레이터. 도중에 닫으면 워커의 생성을 취소한다."""
+        handle = self.submit(prompt, params, timeout)
+        try:
+            yield from handle
+        finally:
+            if not handle.done:
+                handle.cancel()
+
+    @property
+    def queue_depth(self) -> int:
+        with self._lock:
+            return sum(1 for h, _ in self._handles.values() if h.admitted_at is None)
+
+    @property
+    def active_count(self) -> int:
+        with self._lock:
+            return sum(1 for h, _ in self._handles.values() if h.admitted_at is not None)
+
+    def stats(self) -> Dict[str, Any]:
+        """엔진 ``stats()``와 같은 키 + 워커별 상태. 누적 카운터는 워커가 마지막으로 알린 값의 합."""
+        with self._lock:
+            workers = [w.describe() for w in self._workers]
+            snapshots = [s for s in self._stats if s]
+        return {
+            "queue_depth": self.queue_depth,
+            "active": self.active_count,
+            "submitted": self.submitted,
+            **_merge_stats(snapshots),
+            "workers": workers,
+            "restarts": self.restarts,
+        }
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """워커를 멈추고 남은 요청을 오류로 끝낸다."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers = list(self._workers)
+        for worker in workers:
+            worker.inbox.put(None)
+        for worker in workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join(timeout)
+        self._wakeup.send(None)
+        self._relay.join(timeout)
+        with self._lock:
+            leftover = [handle for handle, _ in self._handles.values()]
+            self._handles.clear()
+        for handle in leftover:
+            handle._finish(RuntimeError("generation engine shut down"))
+
+    # ------------------------------------------------------------------ 내부
+
+    def _spawn(self, index: int) -> _Worker:
+        cpus = self._groups[index]
+        threads = self._threads or max(1, len(cpus))
+        inbox: "mp.Queue[Any]" = self._ctx.Queue()
+        reader, writer = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(index, cpus, threads, self.model_path, self.precision, inbox, writer),
+            name=f"inference-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        writer.close()  # 쓰는 쪽은 워커만 갖는다
+        logger.info(
+            "추론 워커 %d 시작 (pid=%d, cpus=%s, threads=%d)", index, process.pid, cpus, threads
+        )
+        return _Worker(index, process, inbox, reader, cpus, threads)
+
+    def _cancel(self, request_id: int) -> None:
+        with self._lock:
+            entry = self._handles.get(request_id)
+            if entry is None:
+                return
+            worker = self._workers[entry[1]]
+        worker.inbox.put((_CANCEL, request_id))
+
+    def _relay_loop(self) -> None:
+        """워커 이벤트 파이프와 프로세스 sentinel을 함께 기다린다. 종료는 sentinel로 바로 안다."""
+        while True:
+            with self._lock:
+                workers = [w for w in self._workers if not w.failed]
+            sources: Dict[Any, Tuple[_Worker, bool]] = {}
+            for worker in workers:
+                sources[worker.events] = (worker, False)
+                sources[worker.process.sentinel] = (worker, True)
+            for ready in wait([self._wakeup_reader, *sources]):
+                if ready is self._wakeup_reader:
+                    return
+                worker, exited = sources[ready]
+                if self._workers[worker.index] is not worker:
+                    continue  # 이번 차례에 이미 재시작했다
+                if not exited:
+                    self._drain(worker, block=True)
+                    continue
+                # 죽기 전에 보낸 이벤트(완료 신호 등)를 먼저 처리한다.
+                self._drain(worker, block=False)
+                if self._closed:
+                    worker.failed = True  # 종료 중 — 다시 기다리지 않는다
+                if worker.failed:
+                    continue
+                worker.process.join(1.0)  # sentinel은 회수 전에 깨어날 수 있다
+                logger.error(
+                    "추론 워커 %d(pid=%s)가 종료됨 (exitcode=%s)",
+                    worker.index,
+                    worker.process.pid,
+                    worker.process.exitcode,
+                )
+                self._fail_worker(worker.index, RuntimeError("추론 워커가 종료되었습니다."), restart=True)
+
+    def _drain(self, worker: _Worker, block: bool) -> None:
+        """``worker`` 파이프에 쌓인 이벤트를 처리한다. ``block``이면 최소 하나는 읽는다."""
+        try:
+            while block or worker.events.poll():
+                block = False
+                self._dispatch(worker.index, *worker.events.recv())
+        except (EOFError, OSError):
+            pass  # 워커가 끝났다 — sentinel 쪽에서 처리한다
+
+    def _dispatch(self, index: int, request_id: int, kind: str, payload: Any) -> None:
+        if kind == _READY:
+            self._workers[index].ready = True
+            logger.info("추론 워커 %d 준비 완료 (pid=%d)", index, payload)
+            return
+        if kind == _FAILED:
+            self._fail_worker(index, _rebuild_error(payload), restart=False)
+            return
+        with self._lock:
+            entry = self._handles.get(request_id)
+        if entry is None:  # 죽은 워커가 남긴 이벤트
+            return
+        handle = entry[0]
+        if kind == _FIRST:
+            handle.admitted_at, handle.first_token_at = payload
+        elif kind == _TOKEN:
+            handle._put(payload)
+        elif kind == _DONE:
+            handle.admitted_at = payload["admitted_at"]
+            handle.first_token_at = payload["first_token_at"]
+            handle.num_generated = payload["num_generated"]
+            handle.num_drafted = payload["num_drafted"]
+            handle.num_accepted = payload["num_accepted"]
+            with self._lock:
+                self._handles.pop(request_id, None)
+                self._workers[index].inflight.discard(request_id)
+                self._stats[index] = payload["stats"]
+            handle._finish(_rebuild_error(payload["error"]))
+
+    def _fail_worker(self, index: int, error: Optional[BaseException], restart: bool) -> None:
+        with self._lock:
+            worker = self._workers[index]
+            lost = [self._handles.pop(rid)[0] for rid in worker.inflight if rid in self._handles]
+            worker.inflight.clear()
+            worker.events.close()
+            if restart and not self._closed and self._may_restart(index):
+                self._workers[index] = self._spawn(index)
+                self.restarts += 1
+            else:
+                worker.failed = True
+                logger.error("추론 워커 %d를 쓸 수 없습니다: %s", index, error)
+        for handle in lost:
+            handle._finish(error)
+
+    def _may_restart(self, index: int) -> bool:
+        """창 안의 재시작이 한도 미만이면 이번 재시작을 기록하고 True. ``_lock`` 안에서 부른다."""
+        now = time.monotonic()
+        recent = [
+            t for t in self._restart_times.get(index, []) if now - t < WORKER_RESTART_WINDOW_S
+        ]
+        if len(recent) >= WORKER_MAX_RESTARTS:
+            logger.error(
+                "추론 워커 %d가 %.0f초 안에 %d번 재시작됐는데도 죽음 — 더 재시작하지 않습니다",
+                index,
+                WORKER_RESTART_WINDOW_S,
+                len(recent),
+            )
+            return False
+        recent.append(now)
+        self._restart_times[index] = recent
+        return True
@@ -0,0 +1,16 @@
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+# 다국어(한국어 포함) MS MARCO cross-encoder — RAG_RERANK=1 일 때 재순위에 사용
+model_name = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+# 모델과 토크나이저 다운로드
+model = AutoModelForSequenceClassification.from_pretrained(model_name)
+tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+# 로컬에 모델 저장
+model_save_path = "./models/mmarco-mMiniLMv2-L12-H384-v1"
+
+model.save_pretrained(model_save_path)
+tokenizer.save_pretrained(model_save_path)
+
+print(f"모델과 토크나이저가 {model_save_path}에 저장되었습니다.")
@@ -1,15 +1,20 @@
 import { ChangeEvent, useRef, useState } from 'react';
-import { uploadPdf } from '../lib/api';
-import type { HealthResponse } from '../types';
+import { getJob, uploadPdf } from '../lib/api';
+import type { HealthResponse, JobResponse } from '../types';
+
+const JOB_POLL_MS = 1000;
 
 interface Props {
   health: HealthResponse | null;
   onUploaded: () => void;
 }
 
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
 export function DocumentPanel({ health, onUploaded }: Props) {
   const inputRef = useRef<HTMLInputElement | null>(null);
   const [uploading, setUploading] = useState(false);
+  const [job, setJob] = useState<JobResponse | null>(null);
   const [error, setError] = useState<string | null>(null);
 
   const onChange = async (e: ChangeEvent<HTMLInputElement>) => {
@@ -18,16 +23,33 @@ export function DocumentPanel({ health, onUploaded }: Props) {
     setError(null);
     setUploading(true);
     try {
-      await uploadPdf(file);
+      const { job_id } = await uploadPdf(file);
+      // 인덱싱은 백그라운드 작업 — 끝날 때까지 진행 상황을 폴링한다 (그동안 기존 문서로 질의 가능).
+      for (;;) {
+        const current = await getJob(job_id);
+        setJob(current);
+        if (current.status === 'succeeded') break;
+        if (current.status === 'failed') throw new Error(current.error ?? '인덱싱 실패');
+        await sleep(JOB_POLL_MS);
+      }
       onUploaded();
     } catch (err) {
       setError(err instanceof Error ? err.message : '업로드 실패');
     } finally {
       setUploading(false);
+      setJob(null);
       if (inputRef.current) inputRef.current.value = '';
     }
   };
 
+  const progressLabel = () => {
+    if (!job) return '업로드 중…';
+    if (job.status === 'queued') return '인덱싱 대기 중…';
+    const pages = job.pages_total ? `${job.pages_parsed}/${job.pages_total}쪽` : '';
+    const reused = job.chunks_reused ? ` (재사용 ${Math.round(job.reuse_ratio * 100)}%)` : '';
+    return `인덱싱 중… ${pages} · ${job.chunks_embedded}청크${reused}`;
+  };
+
   return (
     <aside className="flex w-72 flex-col gap-3 border-r border-ink-100 bg-white p-4">
       <div>
@@ -48,7 +70,7 @@ export function DocumentPanel({ health, onUploaded }: Props) {
             uploading ? 'opacity-50' : 'hover:bg-ink-50'
           }`}
         >
-          {uploading ? '업로드 중…' : 'PDF 선택'}
+          {uploading ? progressLabel() : 'PDF 선택'}
           <input
             ref={inputRef}
             type="file"
@@ -62,7 +84,11 @@ export function DocumentPanel({ health, onUploaded }: Props) {
       </div>
 
       <div className="mt-auto text-[11px] text-ink-800/50">
-        <div>상태: {health?.ready ? '준비됨' : '대기'}</div>
+        <div>
+          상태:{' '}
+          {health?.status === 'warming' ? '워밍업 중' : health?.ready ? '준비됨' : '대기'}
+          {health?.indexing && ' · 인덱싱 중'}
+        </div>
       </div>
     </aside>
   );
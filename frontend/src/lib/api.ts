@@ -1,6 +1,7 @@
 import type {
   DocumentRef,
   HealthResponse,
+  JobResponse,
   QueryResponse,
   UploadResponse,
 } from '../types';
@@ -54,6 +55,11 @@ export async function uploadPdf(
   return parseJson<UploadResponse>(res);
 }
 
+export async function getJob(jobId: string, signal?: AbortSignal): Promise<JobResponse> {
+  const res = await fetch(`${BASE}/jobs/${encodeURIComponent(jobId)}`, { signal });
+  return parseJson<JobResponse>(res);
+}
+
 export interface StreamHandlers {
   onDocs?: (docs: DocumentRef[]) => void;
   onToken?: (text: string) => void;
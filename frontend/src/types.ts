@@ -9,19 +9,46 @@ export interface QueryResponse {
   documents: DocumentRef[];
   cached: boolean;
   elapsed_ms: number;
+  doc_ids: string[];
 }
 
 export interface HealthResponse {
-  status: string;
+  /** warming = 모델 워밍업 중, ready = 준비됨, degraded = 워밍업 실패(첫 요청이 모델을 올린다) */
+  status: 'warming' | 'ready' | 'degraded';
   ready: boolean;
   doc_id: string | null;
   doc_name: string | null;
+  indexing: boolean;
+  /** 부팅 단계별 소요 시간 (ms) */
+  startup_ms: Record<string, number>;
+  warmup_error: string | null;
 }
 
+export type JobStatus = 'queued' | 'running' | 'succeeded' | 'failed';
+
 export interface UploadResponse {
-  doc_id: string;
+  job_id: string;
   doc_name: string;
-  chunks_indexed: boolean;
+  status: JobStatus;
+}
+
+export interface JobResponse {
+  job_id: string;
+  doc_name: string;
+  status: JobStatus;
+  doc_id: string | null;
+  pages_total: number;
+  pages_parsed: number;
+  chunks_embedded: number;
+  pages_per_s: number;
+  chunks_per_s: number;
+  /** 청크 임베딩 캐시에서 가져온 청크 수와 비율, 그 덕에 아낀 임베딩 시간(초, 추정) */
+  chunks_reused: number;
+  reuse_ratio: number;
+  embed_saved_s: number;
+  error: string | null;
+  created_at: number;
+  finished_at: number | null;
 }
 
 export interface ChatMessage {